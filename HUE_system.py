@@ -4,7 +4,10 @@
 @author: TSP
 """
 
+import numpy as np
+
 import TSP_SMARTX_CONFIG_simple as config
+import TSP_SMARTX_REGISTRY as registry
 
 ###############################################################################
 #                                    CONSTANTS                                #
@@ -49,7 +52,7 @@ LIFETIME_LED =                      25e3  # units hours
 LIFETIME_CFL =                      10e3  # units hours
 LIFETIME_INC =                      1e3  # units hours
 
-G_START_FSOLVE =                   0.234
+BULBS_PER_HUB =                     50    # units : [/] maximum number of bulbs connected to a HUE hub
 
 ###############################################################################
 #                                    FUNCTIONS                                #
@@ -145,7 +148,7 @@ def get_E_Maintenance(T_replacement, ARGS, scenario):
     
     Em = Em*1 # energy "equivalent" over one year
     
-    if (T_replacement < 0): Em = 0
+    Em = np.where(np.asarray(T_replacement) < 0, 0, Em)
     
     return Em*1e6 # units : J
 
@@ -164,4 +167,54 @@ def get_E_EoL(scenario):
     else:
         raise NameError
         
-    return Er*1e6 # units : J
\ No newline at end of file
+    return Er*1e6 # units : J
+
+###############################################################################
+
+def get_coeff_table():
+    "Output = (scenario x cost-term x component) coefficient table, compiled once from the constants above \
+     - scenarios = config.SCENARIOS, cost terms = config.COST_TERMS \
+     - components = [os, bulbs, hubs, 1], the last column holds the terms that do not scale with ARGS \
+     - units = [J, J, J, W.years per replacement, W] per component \
+     - compiled and kept by the SystemModel : see registry.set_constants"
+
+    table = np.zeros((len(config.SCENARIOS), len(config.COST_TERMS), 4))
+    
+    for ind, scenario in enumerate(config.SCENARIOS):
+        for comp in range(3):
+            unit_ARGS = [0, 0, 0]
+            unit_ARGS[comp] = 1
+            
+            table[ind, 1, comp] = get_E_Embodied(unit_ARGS, scenario)
+            table[ind, 3, comp] = get_E_Maintenance(1, unit_ARGS, scenario)/config.CONVERSION_YEAR_to_SEC
+            table[ind, 4, comp] = get_E_Operation(unit_ARGS, scenario)/config.CONVERSION_YEAR_to_SEC
+            
+        table[ind, 0, 3] = get_E_RawMaterials(scenario)
+        table[ind, 2, 3] = get_E_EoL(scenario)
+    
+    return table
+
+def get_T_replacement(alpha0, beta):
+    "Output = time between two replacements of the bulbs in years, < 0 if the bulbs are not replaced"
+    
+    # bulbs replacement is not accounted for : T_replacement = LIFETIME_xxx/(beta*config.CONVERSION_YEAR_to_HOURS*(1-alpha0))
+    return -1
+
+def get_baseline_power_system(baseline_power, ARGS):
+    "Output = baseline power PER BULB times the number of bulbs in the system, units : W"
+    
+    return baseline_power*np.asarray(ARGS)[..., 1]
+
+def get_setup_name(ARGS):
+    
+    return '{}#OS {}#BULBS {}#HUBS'.format(ARGS[0], ARGS[1], ARGS[2])
+
+###############################################################################
+#                                    REGISTRY                                 #
+###############################################################################
+
+for system_ID in ['PHILIPS-HUE-LED', 'PHILIPS-HUE-CFL', 'PHILIPS-HUE-INC']:
+    
+    registry.register_system(registry.SystemModel(system_ID, get_coeff_table, get_T_replacement, get_baseline_power_system, get_setup_name,
+                                                  ARGS_names = ['os', 'bulbs', 'hubs'],
+                                                  hub_capacity = {'bulbs': ('hubs', BULBS_PER_HUB)}))
\ No newline at end of file
@@ -4,7 +4,10 @@
 @author: TSP
 """
 
+import numpy as np
+
 import TSP_SMARTX_CONFIG_simple as config
+import TSP_SMARTX_REGISTRY as registry
 
 ###############################################################################
 #                                    CONSTANTS                                #
@@ -18,6 +21,8 @@ POWER_HUB_MEAN = 2.5
 POWER_NODE_MEAN =     0.025
 POWER_SENSOR_MEAN =     0.25
 
+NODES_PER_HUB =                     50   # units : [/] maximum number of nodes connected to a hub
+
 E_EM_OS_LOW =    7.092 # units : MJ
 E_EM_OS_TYPICAL = 9.59
 E_EM_OS_HIGH = 11.61
@@ -36,8 +41,6 @@ E_RECYCLING = 0
 
 E_RAW_MATERIALS = 0
 
-G_START_FSOLVE =                   0.234
-
 ###############################################################################
 #                                    FUNCTIONS                                #
 ###############################################################################
@@ -133,7 +136,7 @@ def get_E_Maintenance(T_replacement, ARGS, scenario):
     
     Em = Em*1 # energy "equivalent" over one year
     
-    if (T_replacement < 0): Em = 0
+    Em = np.where(np.asarray(T_replacement) < 0, 0, Em)
         
     return Em*1e6 # units : J
 
@@ -151,4 +154,56 @@ def get_E_EoL(scenario):
     else:
         raise NameError
         
-    return Er*1e6 # units : J
\ No newline at end of file
+    return Er*1e6 # units : J
+
+###############################################################################
+
+def get_coeff_table():
+    "Output = (scenario x cost-term x component) coefficient table, compiled once from the constants above \
+     - scenarios = config.SCENARIOS, cost terms = config.COST_TERMS \
+     - components = [sensors, nodes, hubs, 1], the last column holds the terms that do not scale with ARGS \
+     - units = [J, J, J, W.years per replacement, W] per component \
+     - compiled and kept by the SystemModel : see registry.set_constants"
+
+    table = np.zeros((len(config.SCENARIOS), len(config.COST_TERMS), 4))
+    
+    for ind, scenario in enumerate(config.SCENARIOS):
+        for comp in range(3):
+            unit_ARGS = [0, 0, 0]
+            unit_ARGS[comp] = 1
+            
+            table[ind, 1, comp] = get_E_Embodied(unit_ARGS, scenario)
+            table[ind, 3, comp] = get_E_Maintenance(1, unit_ARGS, scenario)/config.CONVERSION_YEAR_to_SEC
+            table[ind, 4, comp] = get_E_Operation(unit_ARGS, scenario)/config.CONVERSION_YEAR_to_SEC
+            
+        table[ind, 0, 3] = get_E_RawMaterials(scenario)
+        table[ind, 2, 3] = get_E_EoL(scenario)
+    
+    return table
+
+def get_T_replacement(alpha0, beta):
+    "Output = time between two replacements of the lights in years, infinite for alpha0 >= 1 (the lights are never on)"
+    
+    alpha0 = np.asarray(alpha0, dtype=float)
+    
+    with np.errstate(divide='ignore'):
+        T_replacement = LIFETIME_LIGHT/(beta*config.CONVERSION_YEAR_to_HOURS*(1-alpha0))
+    
+    return np.where(alpha0 >= 1, np.inf, T_replacement)[()]
+
+def get_baseline_power_system(baseline_power, ARGS):
+    "Output = baseline power of the lighting, units : W"
+    
+    return baseline_power
+
+def get_setup_name(ARGS):
+    
+    return '{}#SENSOR {}#NODES {}#HUBS MODULE'.format(ARGS[0], ARGS[1], ARGS[2])
+
+###############################################################################
+#                                    REGISTRY                                 #
+###############################################################################
+
+registry.register_system(registry.SystemModel('OFFICE-LIGHTNING', get_coeff_table, get_T_replacement, get_baseline_power_system, get_setup_name,
+                                              ARGS_names = ['sensors', 'nodes', 'hubs'],
+                                              hub_capacity = {'nodes': ('hubs', NODES_PER_HUB)}))
\ No newline at end of file
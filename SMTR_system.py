@@ -4,7 +4,10 @@
 @author: TSP
 """
 
+import numpy as np
+
 import TSP_SMARTX_CONFIG_simple as config
+import TSP_SMARTX_REGISTRY as registry
 
 ###############################################################################
 #                                    CONSTANTS                                #
@@ -27,7 +30,7 @@ E_MAINT =               0 # units : MJ
 E_RECYCLING =               0 # units : MJ
 RAW_MAT_ENERGY_SMTR =              0#135 # units : MJ
 
-G_START_FSOLVE =                   0.234
+T_REPLACEMENT_SMTR =               1e6 # units : years
 
 ###############################################################################
 #                                    FUNCTIONS                                #
@@ -105,7 +108,7 @@ def get_E_Maintenance(T_replacement, ARGS, scenario):
         
     Em = Em*1 # energy "equivalent" over one year
     
-    if (T_replacement < 0): Em = 0
+    Em = np.where(np.asarray(T_replacement) < 0, 0, Em)
     
     return Em*1e6 # units : J
 
@@ -123,4 +126,45 @@ def get_E_EoL(scenario):
     else:
         raise NameError
         
-    return Er*1e6 # units : J
\ No newline at end of file
+    return Er*1e6 # units : J
+
+###############################################################################
+
+def get_coeff_table():
+    "Output = (scenario x cost-term x component) coefficient table, compiled once from the constants above \
+     - scenarios = config.SCENARIOS, cost terms = config.COST_TERMS \
+     - components = [1], the last column holds the terms that do not scale with ARGS \
+     - units = [J, J, J, W.years per replacement, W] per component \
+     - compiled and kept by the SystemModel : see registry.set_constants"
+
+    table = np.zeros((len(config.SCENARIOS), len(config.COST_TERMS), 1))
+    
+    for ind, scenario in enumerate(config.SCENARIOS):
+        table[ind, 0, 0] = get_E_RawMaterials(scenario)
+        table[ind, 1, 0] = get_E_Embodied(scenario)
+        table[ind, 2, 0] = get_E_EoL(scenario)
+        table[ind, 3, 0] = get_E_Maintenance(1, None, scenario)/config.CONVERSION_YEAR_to_SEC
+        table[ind, 4, 0] = get_E_Operation(scenario)/config.CONVERSION_YEAR_to_SEC
+    
+    return table
+
+def get_T_replacement(alpha0, beta):
+    "Output = time between two replacements of the meter in years"
+    
+    return T_REPLACEMENT_SMTR
+
+def get_baseline_power_system(baseline_power, ARGS):
+    "Output = baseline power of the household, units : W"
+    
+    return baseline_power
+
+def get_setup_name(ARGS):
+    
+    return '{}#LINKY'.format(1)
+
+###############################################################################
+#                                    REGISTRY                                 #
+###############################################################################
+
+registry.register_system(registry.SystemModel('SMART-METER', get_coeff_table, get_T_replacement, get_baseline_power_system, get_setup_name,
+                                              ARGS_names = None))
\ No newline at end of file
@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+@author: TSP
+
+Benchmarks of the payback engine : throughput (evaluations per second) and peak memory at increasing input sizes.
+
+    python TSP_SMARTX_BENCHMARK.py                          # compare with BENCHMARK_BASELINE.json, exit code 1 on regression
+    python TSP_SMARTX_BENCHMARK.py --output results.json
+    python TSP_SMARTX_BENCHMARK.py --update-baseline        # after an intended change of performance
+"""
+###############################################################################
+#                                      IMPORT                                 #
+###############################################################################
+
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import timeit
+import tracemalloc
+
+import numpy as np
+
+import TSP_SMARTX_CONFIG_simple as config
+import TSP_SMARTX_REGISTRY as registry
+import TSP_SMARTX_SYSTEMS as systems
+
+###############################################################################
+#                                    CONSTANTS                                #
+###############################################################################
+
+BENCHMARK_BASELINE =                os.path.join(os.path.dirname(os.path.abspath(__file__)), 'BENCHMARK_BASELINE.json')
+BENCHMARK_SIZES =                   [10**3, 10**4, 10**5, 10**6]                      # units : evaluations per call
+BENCHMARK_SIZES_GET_TPB =           [10, 100, 1000]                                   # units : scalar calls of get_TPB
+BENCHMARK_REPEAT =                  5                                                 # the median of the repeats is kept, each repeat runs >= 0.2 s (timeit autorange)
+BENCHMARK_TOLERANCE =               0.3                                               # units : / accepted loss of throughput or gain of memory
+
+BENCHMARK_PTT =                     [[1, 2], [0.5, 3], [0.2, -1]]
+
+###############################################################################
+#                                    FUNCTIONS                                #
+###############################################################################
+
+def get_cases(size):
+    "Output = {name : function evaluating size points}, the inputs are built outside the timed function"
+
+    System_sel = systems.get_default_system('SMART-METER')
+    bps, beta = System_sel.baseline_power_system, System_sel.beta
+
+    E, _ = registry.get_system_model(System_sel.system_ID).get_energies(None, 0, beta)
+    Erm, Eem, Er, Pm, Pop = E[config.SCENARIOS.index('BENCHMARK')]
+
+    time_grid = np.linspace(0, config.TIME_HORIZON, size)
+    alpha0 = np.linspace(0, 0.99, size)
+
+    cases = {'E_saved_f': lambda: config.E_saved_f(BENCHMARK_PTT, time_grid, 0.1, beta, bps),
+             'alpha_t': lambda: config.alpha_t(time_grid, 0.1, BENCHMARK_PTT),
+             'G': lambda: config.G(time_grid, Erm, Eem, Er, beta, 0.1, bps, Pm, Pop, BENCHMARK_PTT),
+             'TPB': lambda: config.TPB(Erm, Eem, Er, bps*alpha0*beta, Pm, Pop)}
+
+    for system_ID in systems.DEFAULT_SYSTEMS:
+        System_sweep = systems.get_default_system(system_ID)
+        cases['sweep ' + system_ID] = lambda System_sweep=System_sweep: config.get_TPB_batch(System_sweep, alpha0)
+
+    return cases
+
+###############################################################################
+
+def get_TPB_case(size):
+    "Output = function calling get_TPB size times, as the plots do"
+
+    System_sel = systems.get_default_system('OFFICE-LIGHTNING')
+    alpha0 = np.linspace(0, 0.99, size)
+
+    def case():
+        for value in alpha0:
+            config.get_TPB(System_sel, value, False)
+
+    return case
+
+###############################################################################
+
+def measure(function, size, repeat=BENCHMARK_REPEAT):
+    "Output = {seconds, evals_per_sec, peak_bytes}, memory = one run under tracemalloc. \
+     time = median over repeat runs of one call ; a run loops over the calls for at least 0.2 s (timeit autorange), \
+     so the microsecond cases are not dominated by the timer and the scheduler noise"
+
+    timer = timeit.Timer(function)
+    number, _ = timer.autorange()
+    seconds = np.median(timer.repeat(repeat, number))/number
+
+    tracemalloc.start()
+    function()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {'seconds': seconds, 'evals_per_sec': size/seconds, 'peak_bytes': peak}
+
+###############################################################################
+
+def run_benchmarks(sizes=BENCHMARK_SIZES, sizes_get_TPB=BENCHMARK_SIZES_GET_TPB, repeat=BENCHMARK_REPEAT, stream=sys.stderr):
+    "Output = {meta, results}, results = list of {name, size, seconds, evals_per_sec, peak_bytes}"
+
+    results = []
+
+    def record(name, size, function):
+        result = dict(name=name, size=size, **measure(function, size, repeat))
+        results.append(result)
+        if (stream is not None): print('{:<30} {:>9} {:>14.4g} eval/s {:>10.1f} MB'.format(name, size, result['evals_per_sec'], result['peak_bytes']/1e6), file=stream)
+
+    for size in sizes:
+        for name, function in get_cases(size).items():
+            record(name, size, function)
+
+    for size in sizes_get_TPB:
+        record('get_TPB', size, get_TPB_case(size))
+
+    meta = {'date': time.strftime('%Y-%m-%d %H:%M:%S'),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'machine': platform.machine(),
+            'processor': platform.processor()}
+
+    return {'meta': meta, 'results': results}
+
+###############################################################################
+
+def find_regressions(results, baseline, tolerance=BENCHMARK_TOLERANCE):
+    "Output = list of messages, one per benchmark slower or more memory hungry than the baseline beyond tolerance"
+
+    reference = {(result['name'], result['size']): result for result in baseline['results']}
+    regressions = []
+
+    for result in results['results']:
+        base = reference.get((result['name'], result['size']))
+        if (base is None): continue
+
+        if (result['evals_per_sec'] < base['evals_per_sec']*(1 - tolerance)):
+            regressions.append('{} (size {}) : {:.4g} eval/s instead of {:.4g}'.format(result['name'], result['size'], result['evals_per_sec'], base['evals_per_sec']))
+
+        if (result['peak_bytes'] > base['peak_bytes']*(1 + tolerance) and result['peak_bytes'] - base['peak_bytes'] > 2**20):
+            regressions.append('{} (size {}) : {:.1f} MB instead of {:.1f} MB'.format(result['name'], result['size'], result['peak_bytes']/1e6, base['peak_bytes']/1e6))
+
+    return regressions
+
+###############################################################################
+
+def parse_arguments(argv=None):
+
+    parser = argparse.ArgumentParser(description='Benchmarks of the payback engine.')
+
+    parser.add_argument('--sizes', type=int, nargs='+', default=BENCHMARK_SIZES, help='input sizes of the vectorized functions')
+    parser.add_argument('--sizes-get-tpb', type=int, nargs='+', default=BENCHMARK_SIZES_GET_TPB, help='number of get_TPB calls')
+    parser.add_argument('--repeat', type=int, default=BENCHMARK_REPEAT, help='repeats per benchmark, the median is kept')
+    parser.add_argument('--output', default=None, help='JSON file receiving the results')
+    parser.add_argument('--baseline', default=BENCHMARK_BASELINE, help='JSON file of the reference results')
+    parser.add_argument('--tolerance', type=float, default=BENCHMARK_TOLERANCE, help='accepted loss of throughput or gain of memory')
+    parser.add_argument('--update-baseline', action='store_true', help='write the results as the new baseline')
+
+    return parser.parse_args(argv)
+
+###############################################################################
+
+def main(argv=None):
+
+    arguments = parse_arguments(argv)
+
+    results = run_benchmarks(arguments.sizes, arguments.sizes_get_tpb, arguments.repeat)
+
+    if (arguments.output is not None):
+        with open(arguments.output, 'w') as file:
+            json.dump(results, file, indent=1)
+
+    if arguments.update_baseline:
+        with open(arguments.baseline, 'w') as file:
+            json.dump(results, file, indent=1)
+        return 0
+
+    if (not os.path.exists(arguments.baseline)):
+        print('No baseline {} : run with --update-baseline'.format(arguments.baseline), file=sys.stderr)
+        return 0
+
+    with open(arguments.baseline) as file:
+        regressions = find_regressions(results, json.load(file), arguments.tolerance)
+
+    for message in regressions:
+        print('REGRESSION ' + message, file=sys.stderr)
+
+    return 1 if regressions else 0
+
+###############################################################################
+
+if __name__ == '__main__':
+    sys.exit(main())
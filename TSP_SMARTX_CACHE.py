@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+@author: TSP
+"""
+###############################################################################
+#                                      IMPORT                                 #
+###############################################################################
+
+import hashlib
+import json
+import os
+import sys
+
+import numpy as np
+
+import TSP_SMARTX_CONFIG_simple as config
+import TSP_SMARTX_REGISTRY as registry
+
+###############################################################################
+#                                    CONSTANTS                                #
+###############################################################################
+
+CACHE_VERSION =                     1                                                 # increase when the model equations change
+CACHE_MAX_BYTES =                   2**30                                             # units : bytes
+CACHE_DIR =                         os.environ.get('TSP_SMARTX_CACHE_DIR', os.path.join(os.path.expanduser('~'), '.cache', 'tsp_smartx'))
+
+###############################################################################
+#                                    FUNCTIONS                                #
+###############################################################################
+
+def get_cache_key(System_sel, alpha0, scenario='BENCHMARK'):
+    "This function returns the content hash of a get_TPB_batch evaluation. \
+     It covers the system parameters, the alpha0 grid and the constants of config and of the system file, \
+     so any change of a constant gives a new key."
+
+    model = registry.get_system_model(System_sel.system_ID)
+    system_module = sys.modules[model.coeff_table.__module__]
+
+    alpha0 = np.ascontiguousarray(alpha0, dtype=float)
+
+    content = {'version': CACHE_VERSION,
+               'system_ID': System_sel.system_ID,
+               'baseline_power_system': System_sel.baseline_power_system,
+               'PTT': System_sel.PTT,
+               'beta': System_sel.beta,
+               'lifetime_system': System_sel.lifetime_system,
+               'ARGS': System_sel.args,
+               'profile': None if (System_sel.profile is None) else repr(System_sel.profile),
+               'scenario': scenario,
+               'alpha0': [alpha0.shape, hashlib.sha256(alpha0.tobytes()).hexdigest()],
+               'constants': [config.get_module_constants(config), config.get_module_constants(system_module)]}
+
+    encoded = json.dumps(content, sort_keys=True, default=lambda x: np.asarray(x).tolist() if isinstance(x, np.ndarray) else repr(x))
+
+    return hashlib.sha256(encoded.encode()).hexdigest()
+
+###############################################################################
+
+def evict(cache_dir=CACHE_DIR, max_bytes=CACHE_MAX_BYTES):
+    "Remove the least recently used entries until the cache holds at most max_bytes."
+
+    entries = []
+    for name in os.listdir(cache_dir):
+        if name.endswith('.npy'):
+            stat = os.stat(os.path.join(cache_dir, name))
+            entries.append((stat.st_mtime, stat.st_size, name))
+
+    total = sum(size for _, size, _ in entries)
+
+    for _, size, name in sorted(entries):
+        if (total <= max_bytes): break
+        try:
+            os.remove(os.path.join(cache_dir, name))
+        except FileNotFoundError:
+            pass
+        total -= size
+
+###############################################################################
+
+def clear_cache(cache_dir=CACHE_DIR):
+    "Remove every entry of the cache."
+
+    evict(cache_dir, 0)
+
+###############################################################################
+
+def cached_get_TPB_batch(System_sel, alpha0, scenario='BENCHMARK', cache_dir=CACHE_DIR, max_bytes=CACHE_MAX_BYTES):
+    "This function returns get_TPB_batch(System_sel, alpha0, scenario=scenario), from the on-disk cache when possible. \
+      - entries are .npy files named by get_cache_key, loaded memory-mapped (read only) \
+      - a hit refreshes the entry, the least recently used entries are evicted above max_bytes"
+
+    os.makedirs(cache_dir, exist_ok=True)
+
+    key = get_cache_key(System_sel, alpha0, scenario)
+    path = os.path.join(cache_dir, key + '.npy')
+
+    try:
+        results = np.load(path, mmap_mode='r')
+        os.utime(path)
+        return results
+
+    except (FileNotFoundError, ValueError):
+        pass
+
+    results = config.get_TPB_batch(System_sel, alpha0, scenario=scenario)
+
+    # write then rename, so that a concurrent reader never sees a partial file
+    path_tmp = '{}.{}.tmp'.format(path, os.getpid())
+    with open(path_tmp, 'wb') as file:
+        np.save(file, results)
+    os.replace(path_tmp, path)
+
+    evict(cache_dir, max_bytes)
+
+    return np.load(path, mmap_mode='r')
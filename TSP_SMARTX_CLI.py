@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+@author: TSP
+
+Headless batch entry point : computes the payback times of one system for a range of alpha0
+and streams them to stdout, without importing matplotlib.
+
+    python TSP_SMARTX_CLI.py --system PHILIPS-HUE-LED --args 2 8 1 --alpha0 0 1 0.001 --format csv > hue.csv
+"""
+###############################################################################
+#                                      IMPORT                                 #
+###############################################################################
+
+import argparse
+import io
+import json
+import sys
+
+import numpy as np
+
+import TSP_SMARTX_CONFIG_simple as config
+import TSP_SMARTX_PERSISTENCE as persistence
+import TSP_SMARTX_REGISTRY as registry
+import TSP_SMARTX_SYSTEMS as systems
+import TSP_SMARTX_TIMING as timing
+
+###############################################################################
+#                                    CONSTANTS                                #
+###############################################################################
+
+CLI_CHUNK_SIZE =                    2**16                                             # units : alpha0 values evaluated and written at once
+
+###############################################################################
+#                                    FUNCTIONS                                #
+###############################################################################
+
+def parse_arguments(argv=None):
+
+    parser = argparse.ArgumentParser(description='Payback time of a smart system for a range of alpha0, written to stdout.')
+
+    parser.add_argument('--system', required=True, choices=sorted(registry.SYSTEM_MODELS), help='system_ID')
+    parser.add_argument('--args', type=int, nargs='+', default=None, help='component counts (ARGS), default = system definition')
+    parser.add_argument('--alpha0', type=float, nargs=3, default=[0, 1, 0.001], metavar=('START', 'STOP', 'STEP'), help='alpha0 range [START, STOP[')
+    parser.add_argument('--scenario', default='BENCHMARK', choices=config.SCENARIOS, help='scenario of the typical case')
+
+    parser.add_argument('--baseline-power', type=float, default=None, help='baseline power per unit [W], default = system definition')
+    parser.add_argument('--beta', type=float, default=None, help='share of the day the system is used [/], default = system definition')
+    parser.add_argument('--lifetime', type=float, default=None, help='lifetime of the system [years], default = system definition')
+    parser.add_argument('--ptt', type=json.loads, default=None, help='PTT as JSON, steps e.g. "[[1, 0.5], [0, -1]]" or a persistence model e.g. \'{"model": "exponential", "phi": 0.5, "theta": 0.5, "tau": 2}\', default = system definition')
+
+    parser.add_argument('--format', default='csv', choices=['csv', 'jsonl', 'npz'], help='output format')
+    parser.add_argument('--chunk-size', type=int, default=CLI_CHUNK_SIZE, help='alpha0 values per chunk')
+
+    arguments = parser.parse_args(argv)
+
+    ARGS_names = registry.get_system_model(arguments.system).ARGS_names
+    if (arguments.args is not None):
+        if (ARGS_names is None): parser.error('--args : {} has no component counts'.format(arguments.system))
+        if (len(arguments.args) != len(ARGS_names)): parser.error('--args : {} expects {} counts {}'.format(arguments.system, len(ARGS_names), ARGS_names))
+        if (min(arguments.args) < 0): parser.error('--args : the counts must be >= 0')
+
+    return arguments
+
+###############################################################################
+
+def get_system(arguments):
+    "Build the SmartSystem described by the command line."
+
+    system_ID = arguments.system
+    default_ID = system_ID if (system_ID in systems.DEFAULT_SYSTEMS) else None
+
+    # the other HUE lamps share the definition of the LED one
+    if (default_ID is None and system_ID.startswith('PHILIPS-HUE')): default_ID = 'PHILIPS-HUE-LED'
+
+    System_sel = systems.get_default_system(default_ID)
+    System_sel.system_ID = system_ID
+
+    if (arguments.args is not None): System_sel.args = arguments.args
+    if (arguments.baseline_power is not None): System_sel.baseline_power = arguments.baseline_power
+    if (arguments.beta is not None): System_sel.beta = arguments.beta
+    if (arguments.lifetime is not None): System_sel.lifetime_system = arguments.lifetime
+    if (arguments.ptt is not None): System_sel.PTT = persistence.get_persistence_model(arguments.ptt) if isinstance(arguments.ptt, dict) else arguments.ptt
+
+    return config.configure_system(System_sel)
+
+###############################################################################
+
+def write_chunk(stream, output_format, alpha0, results, header):
+    "Write one chunk of results as CSV or JSON lines."
+
+    columns = [alpha0] + [results[field] for field in results.dtype.names]
+
+    if (output_format == 'csv'):
+        np.savetxt(stream, np.column_stack(columns), delimiter=',', fmt='%.10g',
+                   header=','.join(('alpha0',) + results.dtype.names) if header else '', comments='')
+
+    elif (output_format == 'jsonl'):
+        names = ('alpha0',) + results.dtype.names
+        for row in zip(*[column.tolist() for column in columns]):
+            stream.write(json.dumps(dict(zip(names, row))) + '\n')
+
+###############################################################################
+
+def main(argv=None):
+
+    arguments = parse_arguments(argv)
+
+    timing.enable_from_environment()
+    System_sel = get_system(arguments)
+
+    start, stop, step = arguments.alpha0
+    alpha0 = np.arange(start, stop, step)
+
+    chunks = []
+
+    for ind in range(0, len(alpha0), arguments.chunk_size):
+
+        alpha0_chunk = alpha0[ind:ind + arguments.chunk_size]
+        results = config.get_TPB_batch(System_sel, alpha0_chunk, scenario=arguments.scenario)
+
+        if (arguments.format == 'npz'):
+            chunks.append(results)
+        else:
+            write_chunk(sys.stdout, arguments.format, alpha0_chunk, results, header=(ind == 0))
+            sys.stdout.flush()
+
+    # a zip archive cannot be streamed chunk by chunk : it is written once complete
+    if (arguments.format == 'npz'):
+        results = np.concatenate(chunks) if chunks else np.empty(0, dtype=config.TPB_BATCH_DTYPE)
+
+        buffer = io.BytesIO()
+        np.savez(buffer, alpha0=alpha0, **{field: results[field] for field in results.dtype.names})
+        sys.stdout.buffer.write(buffer.getvalue())
+        sys.stdout.buffer.flush()
+
+    return 0
+
+###############################################################################
+
+if __name__ == '__main__':
+    sys.exit(main())
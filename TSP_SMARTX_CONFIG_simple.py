@@ -7,12 +7,13 @@
 #                                      IMPORT                                 #
 ###############################################################################
 
-import matplotlib.pyplot as plt
 import numpy as np
-import scipy.optimize as opt
-import sys
-from tqdm import tqdm
+from collections import namedtuple
+from functools import cached_property
        
+import TSP_SMARTX_REGISTRY as registry
+
+# the system files register their SystemModel when imported
 import HUE_system as HUE
 import SMTR_system as SMTR
 import OFFICE_system as OFFICE
@@ -37,11 +38,31 @@ CONVERSION_YEAR_to_SEC =            CONVERSION_YEAR_to_DAYS*CONVERSION_DAY_to_SE
 ### CONSTANTS
 ELEC_TO_PRIMARY_ENERGY =            3                                                 # units : /
 
+### METRICS : indicative factors, to be replaced by the values of the project
+ELEC_CO2_INTENSITY =                0.3/CONVERSION_kWh_to_J                           # units : kgCO2/J of electricity
+EMBODIED_CO2_INTENSITY =            0.07/1e6                                          # units : kgCO2/J of primary energy
+ELEC_PRICE =                        0.2/CONVERSION_kWh_to_J                           # units : EUR/J of electricity
+EMBODIED_PRICE =                    1/1e6                                             # units : EUR/J of primary energy
+
+# metric : (electricity factor, embodied intensity of [Erm, Eem, Er, Pm] or one for all, unit)
+METRICS =                           {'PRIMARY_ENERGY': (ELEC_TO_PRIMARY_ENERGY, 1, 'J'),
+                                     'CO2': (ELEC_CO2_INTENSITY, EMBODIED_CO2_INTENSITY, 'kgCO2'),
+                                     'COST': (ELEC_PRICE, EMBODIED_PRICE, 'EUR')}
+
 T_PB_INFINITY =                     1e3                                              # units : years
 
 ### PARAMETERS
 TIME_HORIZON =                      50                                                # units : years
 
+PLOT_DECIMATION_BINS =              2000                                              # units : / min/max pairs kept per plotted curve, 0 = all points
+
+SCENARIOS =                         ['LOW', 'BENCHMARK', 'HIGH']
+COST_TERMS =                        ['RAW_MATERIALS', 'EMBODIED', 'EOL', 'MAINTENANCE', 'OPERATION']     # units : [J, J, J, W, W]
+
+TPB_BATCH_DTYPE =                   np.dtype([('t_pb', float), ('t_pb_DN', float), ('t_pb_UP', float), ('t_pb_solved', float),
+                                              ('bsavings', float), ('wsavings', float), ('E_smart_atLT', float), ('G', float)])
+METRICS_CHUNK_SIZE =                2**14                                             # units : elements evaluated at once by get_TPB_metrics
+
 ###############################################################################
 #                                    FUNCTIONS                                #
 ###############################################################################
@@ -64,18 +85,70 @@ class SmartSystem:
          self.baseline_power_system = -1
          self.setup = 'empty'
          
+         self.profile = None
+         
      def setBaselinePowerSystem(self, bps):
          self.baseline_power_system =  bps
          
      def setSetupNameDetails(self, name_str):
          self.setup = name_str
          
+     def setLoadProfile(self, profile):
+         self.profile = profile
+         
+
+###############################################################################
+
+# immutable, hashable counterpart of a configured SmartSystem, with the same attributes : 
+# accepted wherever a SmartSystem is read, variants are made with spec._replace(beta=...)
+SystemSpec = namedtuple('SystemSpec', ['system_ID', 'baseline_power', 'alpha0', 'PTT', 'beta', 'lifetime_system',
+                                       'color_all', 'args', 'baseline_power_system', 'setup', 'profile'])
+
+def get_system_spec(System_sel):
+    "This function returns the SystemSpec of a SmartSystem, configured following its SystemModel. \
+     The lists (alpha0, PTT, color, args) become tuples."
+    
+    model = registry.get_system_model(System_sel.system_ID)
+    
+    as_tuple = lambda x: x if (x is None) else tuple(as_tuple(y) if isinstance(y, list) else y for y in x)
+    PTT = System_sel.PTT if is_persistence_model(System_sel.PTT) else as_tuple(System_sel.PTT)
+    
+    return SystemSpec(System_sel.system_ID, System_sel.baseline_power, as_tuple(System_sel.alpha0), PTT, System_sel.beta, System_sel.lifetime_system,
+                      as_tuple(System_sel.color_all), as_tuple(System_sel.args),
+                      float(model.get_baseline_power_system(System_sel.baseline_power, System_sel.args)), model.get_setup_name(System_sel.args),
+                      System_sel.profile)
+
+###############################################################################
+
+def configure_system(System_sel):
+    "This function sets the baseline power of the whole system and its setup name, following its SystemModel."
+    
+    model = registry.get_system_model(System_sel.system_ID)
+    model.check_ARGS(System_sel.args)
+    
+    System_sel.setBaselinePowerSystem(model.get_baseline_power_system(System_sel.baseline_power, System_sel.args))
+    System_sel.setSetupNameDetails(model.get_setup_name(System_sel.args))
+    
+    return System_sel
+
+###############################################################################
+
+def get_module_constants(module):
+    "This function returns the numerical constants (UPPER CASE names) of a module as a sorted tuple of (name, value). \
+     It is part of the key of the result cache (TSP_SMARTX_CACHE) and lists the constants that can be varied \
+     (sensitivities, incremental models) ; the coefficient tables are not keyed on it, they are compiled again \
+     after registry.set_constants or an explicit registry.invalidate_coeff_tables."
+    
+    return tuple(sorted((name, value) for name, value in vars(module).items() 
+                        if name[0].isupper() and isinstance(value, (int, float)) and not isinstance(value, bool)))
 
 ###############################################################################
 
 def plotSpecificAlpha(System_sel):
     "PLOT TPB for specific cases of alpha0"
     
+    import matplotlib.pyplot as plt
+    
     number_of_coeff = len(System_sel.alpha0)
     
     sys_coeff_ID = []
@@ -122,28 +195,18 @@ def plotSpecificAlpha(System_sel):
 def plotBulbsImpactHUE(System_sel):
     "PLOT the evolution of TPB depending on the number of bulbs in the system"
     
-    memory_bps = System_sel.baseline_power_system
-    memory_args = System_sel.args
-    
-    bulbs_range = [1, 51] #maximum 50 nodes connected to a HUE hub
-    bulbs = range(bulbs_range[0], bulbs_range[1])
+    import matplotlib.pyplot as plt
     
-    t_pb_usual = []
-    t_pb_up = []
-    t_pb_dn = []
+    bulbs_range = [1, 51]
+    bulbs = np.arange(bulbs_range[0], bulbs_range[1])
     
     coeff_index = 1
     
-    for bulb in bulbs:   
-        
-        System_sel.setBaselinePowerSystem(System_sel.baseline_power*bulb)
-        System_sel.args = [System_sel.args[0], bulb, System_sel.args[2]]
+    _, results = get_TPB_components(System_sel, 'bulbs', bulbs, System_sel.alpha0[coeff_index])
     
-        t_pb, uncert, _ , _, _ = get_TPB(System_sel, System_sel.alpha0[coeff_index], False)
-        
-        t_pb_usual.append(t_pb)
-        t_pb_up.append(uncert[1])
-        t_pb_dn.append(uncert[0])
+    t_pb_usual = results['t_pb']
+    t_pb_up = results['t_pb_UP']
+    t_pb_dn = results['t_pb_DN']
     
     plt.figure()
     
@@ -163,50 +226,34 @@ def plotBulbsImpactHUE(System_sel):
     
     plt.grid(alpha=0.2)
     plt.legend()
-    
-    # restore default parameters
-    System_sel.setBaselinePowerSystem(memory_bps)
-    System_sel.args = memory_args
 
 ###############################################################################
 
 def plotTPB_AlphaRange(System_sel):
     "PLOT TPB for a range of alpha0 \
-     PLOT potential savingsfor a range of alpha0 \
-     CHECK if fsolve did its job properly"
+     PLOT potential savingsfor a range of alpha0"
+    
+    import matplotlib.pyplot as plt
+    import TSP_SMARTX_INVERSE as inverse
      
     ### PLOT TPB for a range of alpha0
 
     alpha0_range = [0, 1]
     alpha0 = np.arange(alpha0_range[0], alpha0_range[1], 0.001) #0.0001
     
-    t_pb_usual = []
-    t_pb_up = []
-    t_pb_dn = []
-    
-    t_pb_solved_all = []
+    results = get_TPB_batch(System_sel, alpha0)
+
+    t_pb_usual = results['t_pb']
+    t_pb_up = results['t_pb_UP']
+    t_pb_dn = results['t_pb_DN']
     
-    savings_b = []
-    savings_w = []
-    Esmart_atLT = []
+    t_pb_solved_all = results['t_pb_solved']
     
-    G_all = []
+    savings_b = results['bsavings']
+    savings_w = results['wsavings']
+    Esmart_atLT = results['E_smart_atLT']
     
-    for current_alpha0 in tqdm(range(len(alpha0))):    
-
-            t_pb, uncert, t_pb_solved, savings, G = get_TPB(System_sel, alpha0[current_alpha0], False)
-
-            t_pb_usual.append(t_pb)
-            t_pb_up.append(uncert[1])
-            t_pb_dn.append(uncert[0])
-            
-            t_pb_solved_all.append(t_pb_solved)
-            
-            savings_b.append(savings[0])
-            savings_w.append(savings[1])
-            Esmart_atLT.append(savings[2])
-            
-            G_all.append(G)
+    G_all = results['G']
             
     plt.figure()
     
@@ -218,7 +265,9 @@ def plotTPB_AlphaRange(System_sel):
 
     plt.hlines(System_sel.lifetime_system, alpha0[0]*100, alpha0[-1]*100, colors='magenta', linestyles='dashed', label='System\'s lifetime (= {} years)'.format(System_sel.lifetime_system), alpha=0.2)
 
-    alpha0_wsavings  = alpha0[np.where(np.asarray(savings_w)>=0)[0][0]]*100 if len(np.where(np.asarray(savings_w)>=0)[0]) != 0 else alpha0[-1]*100
+    # break-even of the w-savings, solved to full precision instead of read on the alpha0 grid
+    alpha0_wsavings = inverse.solve_break_even(System_sel, 'alpha0', 'wsavings', alpha0=0, bracket=alpha0_range)*100
+    if np.isnan(alpha0_wsavings): alpha0_wsavings = alpha0[-1]*100
     plt.vlines(alpha0_wsavings, 0, TIME_HORIZON, colors='black', linestyles='dashed', label='W-savings boundary', alpha=0.2)
 
     plt.fill_between(alpha0*100, t_pb_dn, t_pb_up, alpha=0.1, facecolor='grey', antialiased=True)
@@ -265,15 +314,7 @@ def plotTPB_AlphaRange(System_sel):
 #    plt.figure()
 #    plt.plot(alpha0*100, np.asarray(G_all)/1e6, 'x')
 #    plt.plot(alpha0*100, np.asarray(savings_w)/100*Esmart_atLT[0]/1e6, '--', color='blue', alpha=0.5, label='Worst case savings (Benchmarck, \u03B1 varying. (\u03C4={} years))'.format(System_sel.PTT[1]))
-        
-    ### Check FSOLVE results on the range of alpha0
-    if (1):
-        diff_solved = np.diff(t_pb_solved_all)
-        monotone_decr = max(diff_solved) > 0.0
-        
-        if (monotone_decr):
-            raise ValueError("[CRITICAL ERROR] : please enter another value for G_START_FSOLVE ... \n")
-        
+
     #    plt.figure()
     #    plt.title('Influence of a varying \u03B1 \non the payback time, typical scenario')
     #    plt.ylabel('T_PB [years]')
@@ -284,83 +325,196 @@ def plotTPB_AlphaRange(System_sel):
     
 ###############################################################################
          
-def TPB(Erm, Eem, Er, P_saved, Pm, Pop):
+def TPB(Erm, Eem, Er, P_saved, Pm, Pop, elec_factor=None):
     "This function returns the payback time. \
      - units output = years \
-     - Exxx units = Joules whereas Pxxx units = Watts"
+     - Exxx units = Joules whereas Pxxx units = Watts \
+     - inputs can be arrays, they are broadcast together \
+     - elec_factor = conversion of the electricity into the metric of Exxx and Pm, None = ELEC_TO_PRIMARY_ENERGY, \
+       or a FactorSeries (TSP_SMARTX_FACTORS) : first crossing of G(t) with alpha constant, not limited to TIME_HORIZON"
     
+    if (elec_factor is None): elec_factor = ELEC_TO_PRIMARY_ENERGY
+
+    if is_factor_series(elec_factor):
+        return elec_factor.first_crossing(CONVERSION_YEAR_to_SEC*P_saved, Erm + Eem + Er, CONVERSION_YEAR_to_SEC*Pm, CONVERSION_YEAR_to_SEC*Pop, [[1, -1]], np.inf)
+
     num = Erm + Eem + Er
-    denom = ELEC_TO_PRIMARY_ENERGY*CONVERSION_YEAR_to_SEC*P_saved - ELEC_TO_PRIMARY_ENERGY*CONVERSION_YEAR_to_SEC*Pop - CONVERSION_YEAR_to_SEC*Pm
+    denom = elec_factor*CONVERSION_YEAR_to_SEC*P_saved - elec_factor*CONVERSION_YEAR_to_SEC*Pop - CONVERSION_YEAR_to_SEC*Pm
     
-    if (denom <= 0):
-        t_pb = T_PB_INFINITY
+    with np.errstate(divide='ignore', invalid='ignore'):
+        t_pb = np.where(denom <= 0, T_PB_INFINITY, np.divide(num, denom))
 
-    else:
-        t_pb = num/denom
+    return t_pb[()]
 
-    return t_pb
+###############################################################################
+
+def TPB_PTT(Erm, Eem, Er, beta, alpha0, baseline_power_system, Pm, Pop, PTT, profile=None, elec_factor=None):
+    "This function returns the payback time when alpha follows the PTT, i.e. the first zero crossing of G(t). \
+     - G is linear on each PTT segment : the crossing is solved exactly, segment by segment \
+     - PTT can also be a persistence model (TSP_SMARTX_PERSISTENCE), solved by its first_crossing \
+     - Exxx, Pxxx, beta, alpha0 and baseline_power_system can be arrays, they are broadcast together \
+     - profile = LoadProfile : the savings follow the measured profile, beta and baseline_power_system are not used \
+     - returns T_PB_INFINITY if there is no payback within TIME_HORIZON \
+     - elec_factor = conversion of the electricity into the metric of Exxx and Pm, None = ELEC_TO_PRIMARY_ENERGY, \
+       or a FactorSeries (TSP_SMARTX_FACTORS) : G is linear between the changes of the factor or of the PTT, solved by its first_crossing \
+     - units output = years"
+
+    if (elec_factor is None): elec_factor = ELEC_TO_PRIMARY_ENERGY
+
+    if is_factor_series(elec_factor):
+        if (profile is not None): raise TypeError('a factor series cannot be combined with a load profile')
+
+        return elec_factor.first_crossing(CONVERSION_YEAR_to_SEC*beta*baseline_power_system*alpha0, Erm + Eem + Er, CONVERSION_YEAR_to_SEC*Pm, CONVERSION_YEAR_to_SEC*Pop, PTT)
+
+    if (profile is not None):
+        return profile.first_crossing(elec_factor*alpha0, Erm + Eem + Er, (elec_factor*Pop + Pm)*CONVERSION_YEAR_to_SEC, PTT)
+
+    if is_persistence_model(PTT):
+        return PTT.first_crossing(elec_factor*CONVERSION_YEAR_to_SEC*beta*baseline_power_system*alpha0, Erm + Eem + Er, (elec_factor*Pop + Pm)*CONVERSION_YEAR_to_SEC)
+
+    limit, coef_lookup, start_lookup, cumul_lookup = get_PTT_segments(PTT)
+
+    # segments within the time horizon
+    start = np.minimum(limit[0:-1], TIME_HORIZON)
+    end = np.minimum(limit[1:], TIME_HORIZON)
+    coef = coef_lookup[1:-1]
+    cumul = cumul_lookup[1:-1]
+
+    return first_crossing_steps(elec_factor*CONVERSION_YEAR_to_SEC*beta*baseline_power_system*alpha0, Erm + Eem + Er,
+                                (elec_factor*Pop + Pm)*CONVERSION_YEAR_to_SEC, start, end, coef, cumul)
+
+###############################################################################
+
+def first_crossing_steps(gain_rate, E_init, loss_rate, start, end, coef, cumul):
+    "This function returns the first t at which gain_rate*W(t) - E_init - loss_rate*t >= 0, W = integral of a step function. \
+     - start, end, coef = segments of the steps within TIME_HORIZON, cumul = W(start), along the last axis \
+       (one set of segments for all, or one per element) \
+     - returns T_PB_INFINITY if there is no crossing \
+     - units : gain_rate and loss_rate [J/year], E_init [J], output [years]"
+
+    gain_rate = np.asarray(gain_rate, dtype=float)[..., np.newaxis]
+    loss_rate = np.asarray(loss_rate, dtype=float)[..., np.newaxis]
+    E_init = np.asarray(E_init, dtype=float)[..., np.newaxis]
+
+    # G at the beginning of each segment and its slope along the segment
+    G_start = gain_rate*cumul - E_init - loss_rate*start
+    slope = gain_rate*coef - loss_rate
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        t_cross = np.where(G_start >= 0, start, start - G_start/slope)
+
+    crossed = (G_start >= 0) | ((slope > 0) & (t_cross <= end))
+    first = np.argmax(crossed, axis=-1)[..., np.newaxis]
+
+    t_pb = np.take_along_axis(t_cross, first, axis=-1)[..., 0]
+    t_pb = np.where(np.any(crossed, axis=-1), t_pb, T_PB_INFINITY)
+
+    return t_pb[()]
 
 ###############################################################################
     
-def G(t, Erm, Eem, Er, beta, alpha0, baseline_power_system, Pm, Pop, PTT):
+def G(t, Erm, Eem, Er, beta, alpha0, baseline_power_system, Pm, Pop, PTT, profile=None, elec_factor=None):
     "This function returns the NET gains a time t. \
-      - units output = Joules, Primary Energy \
+      - units output = Joules, Primary Energy (units of Exxx with elec_factor) \
       - t and tau have to be given in the same units \
       - Exxx units = Joules whereas Pxxx units = Watts "
     
-    #g = ELEC_TO_PRIMARY_ENERGY*CONVERSION_YEAR_to_SEC*baseline_power_system*beta*alpha0*(phi*t + tau*theta*(1-np.exp(-t/tau))) - ELEC_TO_PRIMARY_ENERGY*CONVERSION_YEAR_to_SEC*Pop*t - CONVERSION_YEAR_to_SEC*Pm*t - Eem - Erm - Er
+    # exponential decay of alpha : PTT = TSP_SMARTX_PERSISTENCE.ExponentialDecay(phi, theta, tau)
 
-    g = E_saved_f(PTT, t, alpha0, beta, baseline_power_system) - E_smart(Erm, Eem, Er, Pop, Pm, t)
+    g = E_saved_f(PTT, t, alpha0, beta, baseline_power_system, profile, elec_factor) - E_smart(Erm, Eem, Er, Pop, Pm, t, elec_factor)
 
     return g
 
 ###############################################################################
 
-def E_saved_f(PTT, time, alpha0, beta, baseline_power_system): 
-    "This function returns ONLY the energy saved by the introduction of the smart layer. \
-      - units output = Joules, Primary Energy" 
-      
-    if (type(time) == int): 
-        time = [time]
-    
-    time = np.asarray(time)
-    
-    E_s = []
-    PTT_array = np.asarray(PTT)
+def is_persistence_model(PTT):
+    "A PTT is either a list of [coefficient, duration] steps or a persistence model (TSP_SMARTX_PERSISTENCE)"
     
+    return hasattr(PTT, 'cumulative')
+
+def is_factor_series(elec_factor):
+    "An electricity factor is either a number (or an array) or a time series (TSP_SMARTX_FACTORS)"
+
+    return hasattr(elec_factor, 'weighted_integral')
+
+###############################################################################
+
+def get_PTT_segments(PTT):
+    "This function returns the boundaries of the PTT segments and the lookup tables used to integrate alpha(t). \
+      - limit = [0, end of segment 1, ..., TIME_HORIZON] \
+      - lookup tables are indexed by np.searchsorted(limit, t) : index 0 is before the first segment, \
+        index len(PTT)+1 is after TIME_HORIZON (the last segment then only counts |PTT[-1][1]| years) \
+      - units output = [years, /, years, years]"
+
+    PTT_array = np.asarray(PTT, dtype=float)
+
     limit = np.cumsum(PTT_array[:,1][0:-1])
     limit = np.append(0, limit)
     limit = np.append(limit, TIME_HORIZON)
-    
-    weight = []
 
-    for t in time:
-        for ind in range(len(limit)-1):
-            if ((t - limit[ind]) >= 0) and ((t - limit[ind+1]) <= 0):
-                weight.append((t - limit[ind]))
-            elif ((t - limit[ind]) >= 0) and ((t - limit[ind+1]) >= 0):
-                weight.append(1*abs(PTT_array[ind,1]))
-            elif ((t - limit[ind]) <= 0) and ((t - limit[ind+1]) <= 0):
-                weight.append(0)
-        
-        coef = weight*PTT_array[:, 0]
-        weight = []
+    # weighted duration of each fully elapsed segment, accumulated in front of every segment
+    full_weight = np.cumsum(PTT_array[:,0]*np.abs(PTT_array[:,1]))
+
+    coef_lookup = np.concatenate(([0], PTT_array[:,0], [0]))
+    start_lookup = np.concatenate(([0], limit[0:-1], [0]))
+    cumul_lookup = np.concatenate(([0, 0], full_weight))
+
+    return limit, coef_lookup, start_lookup, cumul_lookup
+
+###############################################################################
+
+def E_saved_f(PTT, time, alpha0, beta, baseline_power_system, profile=None, elec_factor=None):
+    "This function returns ONLY the energy saved by the introduction of the smart layer. \
+      - time can be a scalar or an array of any shape, alpha0, beta and baseline_power_system broadcast with it \
+      - profile = LoadProfile : the savings follow the measured profile, beta and baseline_power_system are not used \
+      - elec_factor = conversion of the saved electricity, None = ELEC_TO_PRIMARY_ENERGY, \
+        or a FactorSeries (TSP_SMARTX_FACTORS) : integral of the factor times alpha(t), O(log n) \
+      - units output = Joules, Primary Energy"
+
+    if (elec_factor is None): elec_factor = ELEC_TO_PRIMARY_ENERGY
+
+    time = np.asarray(time, dtype=float)
+
+    if is_factor_series(elec_factor):
+        if (profile is not None): raise TypeError('a factor series cannot be combined with a load profile')
+
+        return np.asarray(CONVERSION_YEAR_to_SEC*beta*baseline_power_system*alpha0*elec_factor.weighted_integral(time, PTT))
+
+    if (profile is not None):
+        return np.asarray(elec_factor*alpha0*profile.weighted_energy(time, PTT))
+
+    if is_persistence_model(PTT):
+        coef = PTT.cumulative(time)
+
+    else:
+        limit, coef_lookup, start_lookup, cumul_lookup = get_PTT_segments(PTT)
+
+        # index of the PTT segment containing each time sample, then cumulated weighted duration
+        ind = np.searchsorted(limit, time, side='left')
+        coef = cumul_lookup[ind] + coef_lookup[ind]*(time - start_lookup[ind])
+
+    E_s = elec_factor*CONVERSION_YEAR_to_SEC*beta*baseline_power_system*alpha0*coef
+
+    if (np.size(E_s) == 1):
+        E_s = np.reshape(E_s, ())
 
-        E_s.append(np.sum(ELEC_TO_PRIMARY_ENERGY*CONVERSION_YEAR_to_SEC*beta*baseline_power_system*alpha0*coef))
-        
-    if (len(time)==1):
-        E_s = E_s[0]
-        
     return np.asarray(E_s)
 
 ###############################################################################
 
-def E_smart(Erm, Eem, Er, Pop, Pm, t):
+def E_smart(Erm, Eem, Er, Pop, Pm, t, elec_factor=None):
     "This function returns ONLY the energy of the smart layer at a time t. \
       - units input = t [years] \
+      - elec_factor = conversion of the electricity consumed, None = ELEC_TO_PRIMARY_ENERGY, \
+        or a FactorSeries (TSP_SMARTX_FACTORS) : integral of the factor up to t, O(log n) \
       - units output = Joules, Primary Energy" 
     
-    E_smart = (Erm + Er + Eem) + (ELEC_TO_PRIMARY_ENERGY*Pop + Pm)*CONVERSION_YEAR_to_SEC*t
+    if (elec_factor is None): elec_factor = ELEC_TO_PRIMARY_ENERGY
+
+    if is_factor_series(elec_factor):
+        return (Erm + Er + Eem) + Pm*CONVERSION_YEAR_to_SEC*t + Pop*CONVERSION_YEAR_to_SEC*elec_factor.integral(t)
+
+    E_smart = (Erm + Er + Eem) + (elec_factor*Pop + Pm)*CONVERSION_YEAR_to_SEC*t
     
     return E_smart
 
@@ -371,38 +525,37 @@ def alpha_t(time, alpha0, PTT):
       - units output = / " 
     # Time and tau have to be given with the same units
     
-    time = np.asarray(time)
+    time = np.asarray(time, dtype=float)
     
-    alpha = []
-    PTT_array = np.asarray(PTT)
+    if is_persistence_model(PTT):
+        return alpha0*PTT.alpha(time)
+    
+    PTT_array = np.asarray(PTT, dtype=float)
     
     limit = np.cumsum(PTT_array[:,1][0:-1])
-    limit = np.append(limit, TIME_HORIZON)
     
-    for t in time:
-        if (len(PTT) == 1):
-            alpha.append(alpha0*PTT_array[0, 0])
-        elif (t < limit[0]):
-            alpha.append(alpha0*PTT_array[0, 0])
-        elif(t > limit[0]):
-            alpha.append(alpha0*PTT_array[np.where(t > limit)[-1][-1]+1, 0])
+    # index of the PTT segment containing each time sample, the last segment never ends
+    ind = np.searchsorted(limit, time, side='left')
     
-    return np.asarray(alpha)
+    return alpha0*PTT_array[ind, 0]
 
 ###############################################################################
     
-def plot_EC(axes, title, days, E_em, E_op, E_saved, t_pb, lifetime_system, savings, alpha0, PTT, beta, baseline_power_system):
+def plot_EC(axes, title, days, E_em, E_op, E_saved, t_pb, lifetime_system, savings, alpha0, PTT, beta, baseline_power_system, profile=None):
     "Plot energy curves for given parameters"
     
-    axes.plot(days, np.asarray(E_em)/1e6, 'r', alpha=0.2, linewidth= 1, label='Embodied energy')
-    axes.plot(days, np.asarray(E_op)/1e6, 'b', alpha=0.2, linewidth= 1, label='Use-phase energy')
-    axes.plot(days, np.asarray(E_op + E_em)/1e6, 'k', linewidth= 1, label='Energy for the smart layer')
-    axes.plot(days, np.asarray(E_saved)/1e6, 'g-', linewidth= 1, label='Energy saved thanks to the smartness\n\u03B1 constant')
+    # one sample per day is more than the pixels of the figure
+    curve = lambda E: decimate_minmax(days, np.asarray(E)/1e6)
+    
+    axes.plot(*curve(E_em), 'r', alpha=0.2, linewidth= 1, label='Embodied energy')
+    axes.plot(*curve(E_op), 'b', alpha=0.2, linewidth= 1, label='Use-phase energy')
+    axes.plot(*curve(E_op + E_em), 'k', linewidth= 1, label='Energy for the smart layer')
+    axes.plot(*curve(E_saved), 'g-', linewidth= 1, label='Energy saved thanks to the smartness\n\u03B1 constant')
     
     axes.vlines(t_pb, 0, max(E_saved)/1e6, colors='olive', linestyles='dashed', label='T_PB', alpha=0.4)
     axes.vlines(lifetime_system, 0, max(E_saved)/1e6, colors='magenta', linestyles='dashed', label='T_lifetime (= {} years)\nb-savings = {}% | w-savings = {}%)'.format(lifetime_system, savings[0], savings[1]), alpha=0.4)
 
-    axes.plot(days, E_saved_f(PTT, days, alpha0, beta, baseline_power_system)/1e6, label='Energy saved thanks to the smartness\n\u03B1 changes with time')
+    axes.plot(*curve(E_saved_f(PTT, days, alpha0, beta, baseline_power_system, profile)), label='Energy saved thanks to the smartness\n\u03B1 changes with time')
 
     axes.set_ylim([0, max(E_saved)/1e6])
     axes.set_ylabel('Energy [MJ]')
@@ -421,8 +574,134 @@ def plot_EC(axes, title, days, E_em, E_op, E_saved, t_pb, lifetime_system, savin
 
 ###############################################################################
 
-def get_TPB(System_sel, alpha0, plot_energy_curves):
+def decimate_minmax(x, y, n_bins=PLOT_DECIMATION_BINS):
+    "This function downsamples a curve for plotting : the samples are split in n_bins bins of consecutive points \
+     and only the min and the max of each bin are kept, in their order, with the first and last points. \
+      - the drawn envelope is the same as with all the points as long as a bin is narrower than a pixel \
+      - n_bins = 0 keeps every point \
+      - output = x, y"
+
+    x, y = np.asarray(x), np.asarray(y)
+    n = len(y)
+
+    if (n_bins <= 0 or n <= 2*n_bins + 2): return x, y
+
+    size = -(-n//n_bins)
+    n_bins = -(-n//size)
+    pad = n_bins*size - n
+
+    ind_min = np.argmin(np.append(y, np.full(pad, np.inf)).reshape(n_bins, size), axis=1)
+    ind_max = np.argmax(np.append(y, np.full(pad, -np.inf)).reshape(n_bins, size), axis=1)
+
+    base = np.arange(n_bins)*size
+    ind = np.unique(np.concatenate(([0], base + ind_min, base + ind_max, [n - 1])))
+
+    return x[ind], y[ind]
+
+###############################################################################
+
+class EnergyCurves:
+    "Energy curves of the smart layer over TIME_HORIZON for one scenario. \
+     Nothing is allocated before an attribute is read : \
+      - days, E_em, E_op, E_saved, alpha : one sample per day \
+      - time_gains, gains_tau : G(t) on 1000 samples \
+      - savings : [b-savings, w-savings, E_smart at lifetime] \
+      - units = [years, J, J, J, /, years, J, [%, %, J]]"
+
+    def __init__(self, System_sel, alpha0, Erm, Eem, Er, Pm, Pop):
+        self.PTT = System_sel.PTT
+        self.beta = System_sel.beta
+        self.baseline_power_system = System_sel.baseline_power_system
+        self.lifetime_system = System_sel.lifetime_system
+        self.profile = System_sel.profile
+
+        self.alpha0 = alpha0
+        self.energies = [Erm, Eem, Er, Pm, Pop]
+
+    @cached_property
+    def days(self):
+        number_of_days = int(CONVERSION_YEAR_to_DAYS*TIME_HORIZON)
+        return np.linspace(0, TIME_HORIZON, number_of_days)
+
+    @cached_property
+    def E_em(self):
+        Erm, Eem, Er, Pm, Pop = self.energies
+        return Eem + Erm + Er + Pm*CONVERSION_YEAR_to_SEC*self.days
+
+    @cached_property
+    def E_op(self):
+        Erm, Eem, Er, Pm, Pop = self.energies
+        return ELEC_TO_PRIMARY_ENERGY*Pop*CONVERSION_YEAR_to_SEC*self.days
+
+    @cached_property
+    def E_saved(self):
+        if (self.profile is not None):
+            return E_saved_f([[1, -1]], self.days, self.alpha0, self.beta, self.baseline_power_system, self.profile)
+
+        P_saved = self.baseline_power_system*self.alpha0*self.beta # W = J/s
+        return ELEC_TO_PRIMARY_ENERGY*P_saved*CONVERSION_YEAR_to_SEC*self.days
+
+    @cached_property
+    def alpha(self):
+        return alpha_t(self.days, self.alpha0, self.PTT)
+
+    @cached_property
+    def time_gains(self):
+        return np.linspace(0, TIME_HORIZON, 1000)
+
+    @cached_property
+    def gains_tau(self):
+        Erm, Eem, Er, Pm, Pop = self.energies
+        return G(self.time_gains, Erm, Eem, Er, self.beta, self.alpha0, self.baseline_power_system, Pm, Pop, self.PTT, self.profile)
+
+    @cached_property
+    def savings(self):
+        Erm, Eem, Er, Pm, Pop = self.energies
+        return get_savings(Erm, Eem, Er, self.beta, self.alpha0, self.baseline_power_system, Pm, Pop, self.PTT, self.lifetime_system, self.profile)
+
+###############################################################################
+
+def get_scenario_energies(System_sel, alpha0, beta=None, ARGS=None):
+    "This function returns the energies of the smart layer for the LOW, BENCHMARK and HIGH scenarios. \
+      - alpha0 and beta can be scalars or arrays, ARGS an array of shape (..., number of components) \
+      - beta = None and ARGS = None use the values of System_sel \
+      - output = {scenario : [Erm, Eem, Er, Pm, Pop]}, T_replacement \
+      - the energies come from the SystemModel registered by the system file \
+      - Exxx units = Joules whereas Pxxx units = Watts"
+
+    if (beta is None): beta = System_sel.beta
+    if (ARGS is None): ARGS = System_sel.args
+
+    model = registry.get_system_model(System_sel.system_ID)
+
+    E, T_replacement = model.get_energies(ARGS, alpha0, beta)
+
+    energies = {}
+
+    for ind, scenario in enumerate(SCENARIOS):
+        energies[scenario] = [E[..., ind, term] for term in range(len(COST_TERMS))]
+
+    return energies, T_replacement
+
+###############################################################################
+
+def get_savings(Erm, Eem, Er, beta, alpha0, baseline_power_system, Pm, Pop, PTT, lifetime_system, profile=None, elec_factor=None):
+    "This function returns the savings at the end of the system's lifetime. \
+      - b-savings : alpha constant, w-savings : alpha follows the PTT \
+      - units output = [%, %, Joules]"
+
+    E_smart_atLT = E_smart(Erm, Eem, Er, Pop, Pm, lifetime_system, elec_factor)
+
+    bsavings = np.around(G(lifetime_system, Erm, Eem, Er, beta, alpha0, baseline_power_system, Pm, Pop, [[1, -1]], profile, elec_factor)/E_smart_atLT*100, 2)
+    wsavings = np.around(G(lifetime_system, Erm, Eem, Er, beta, alpha0, baseline_power_system, Pm, Pop, PTT, profile, elec_factor)/E_smart_atLT*100, 2)
+
+    return [bsavings, wsavings, E_smart_atLT]
+
+###############################################################################
+
+def get_TPB(System_sel, alpha0, plot_energy_curves, return_curves=False):
     "This is the main function. It returns the payback time for the given parameters. \
+      - return_curves = True appends {scenario : EnergyCurves} to the output, the curves are built when read \
       - units output = [years, years, years, %]. "
     
     ### Params
@@ -431,172 +710,76 @@ def get_TPB(System_sel, alpha0, plot_energy_curves):
     beta = System_sel.beta
     baseline_power_system = System_sel.baseline_power_system
     lifetime_system = System_sel.lifetime_system
-    ARGS = System_sel.args
+    profile = System_sel.profile
     
     P_saved = baseline_power_system*alpha0*beta # W = J/s
     
     #TIME_HORIZON = lifetime_system*1.2
 
-    if (system_ID == 'PHILIPS-HUE-LED' or system_ID == 'PHILIPS-HUE-CFL' or system_ID == 'PHILIPS-HUE-INC'):
-        
-        G_start_fsolve = HUE.G_START_FSOLVE
-                
-        Erm = HUE.get_E_RawMaterials('BENCHMARK')
-        Erm_DN = HUE.get_E_RawMaterials('LOW')
-        Erm_UP = HUE.get_E_RawMaterials('HIGH')
-        
-        Eem =  HUE.get_E_Embodied(ARGS, 'BENCHMARK')
-        Eem_DN = HUE.get_E_Embodied(ARGS, 'LOW')
-        Eem_UP =  HUE.get_E_Embodied(ARGS, 'HIGH')
-        
-        Pop = HUE.get_E_Operation(ARGS, 'BENCHMARK')/CONVERSION_YEAR_to_SEC
-        Pop_DN = HUE.get_E_Operation(ARGS, 'LOW')/CONVERSION_YEAR_to_SEC
-        Pop_UP = HUE.get_E_Operation(ARGS, 'HIGH')/CONVERSION_YEAR_to_SEC
-        
-        if (system_ID == 'PHILIPS-HUE-LED'):
-            T_replacement = HUE.LIFETIME_LED/(beta*CONVERSION_YEAR_to_HOURS*(1-alpha0))
-        elif (system_ID == 'PHILIPS-HUE-CFL'):
-            T_replacement = HUE.LIFETIME_CFL/(beta*CONVERSION_YEAR_to_HOURS*(1-alpha0))
-        elif (system_ID == 'PHILIPS-HUE-INC'):
-            T_replacement = HUE.LIFETIME_INC/(beta*CONVERSION_YEAR_to_HOURS*(1-alpha0))
-        else:
-            raise NameError
-            
-        T_replacement = -1
-            
-        Pm = HUE.get_E_Maintenance(T_replacement, ARGS, 'BENCHMARK')/CONVERSION_YEAR_to_SEC
-        Pm_DN = HUE.get_E_Maintenance(T_replacement, ARGS, 'LOW')/CONVERSION_YEAR_to_SEC
-        Pm_UP = HUE.get_E_Maintenance(T_replacement, ARGS, 'HIGH')/CONVERSION_YEAR_to_SEC
-                
-        Er = HUE.get_E_EoL('BENCHMARK')
-        Er_DN = HUE.get_E_EoL('LOW')
-        Er_UP = HUE.get_E_EoL('HIGH')
-        
-        
-    elif(system_ID == 'SMART-METER'):
-        
-        if (ARGS != None): raise TypeError
-        
-        G_start_fsolve = SMTR.G_START_FSOLVE
-        
-        Erm = SMTR.get_E_RawMaterials('BENCHMARK')
-        Erm_DN = SMTR.get_E_RawMaterials('LOW')
-        Erm_UP = SMTR.get_E_RawMaterials('HIGH')
-    
-        Eem =  SMTR.get_E_Embodied('BENCHMARK')
-        Eem_DN = SMTR.get_E_Embodied('LOW')
-        Eem_UP = SMTR.get_E_Embodied('HIGH')
-        
-        Pop = SMTR.get_E_Operation('BENCHMARK')/CONVERSION_YEAR_to_SEC
-        Pop_DN = SMTR.get_E_Operation('LOW')/CONVERSION_YEAR_to_SEC
-        Pop_UP = SMTR.get_E_Operation('HIGH')/CONVERSION_YEAR_to_SEC
-            
-        T_replacement = 1e6 # years
-        
-        Pm = SMTR.get_E_Maintenance(T_replacement, ARGS, 'BENCHMARK')/CONVERSION_YEAR_to_SEC
-        Pm_DN = SMTR.get_E_Maintenance(T_replacement, ARGS, 'LOW')/CONVERSION_YEAR_to_SEC
-        Pm_UP = SMTR.get_E_Maintenance(T_replacement, ARGS, 'HIGH')/CONVERSION_YEAR_to_SEC
-        
-        Er = SMTR.get_E_EoL('BENCHMARK')
-        Er_DN = SMTR.get_E_EoL('LOW')
-        Er_UP = SMTR.get_E_EoL('HIGH')
-    
-    elif(system_ID == 'OFFICE-LIGHTNING'):
-        
-        G_start_fsolve = OFFICE.G_START_FSOLVE
-        
-        Erm = OFFICE.get_E_RawMaterials('BENCHMARK')
-        Erm_DN = OFFICE.get_E_RawMaterials('LOW')
-        Erm_UP = OFFICE.get_E_RawMaterials('HIGH')
-    
-        Eem =  OFFICE.get_E_Embodied(ARGS, 'BENCHMARK')
-        Eem_DN = OFFICE.get_E_Embodied(ARGS, 'LOW')
-        Eem_UP = OFFICE.get_E_Embodied(ARGS, 'HIGH')
-        
-        Pop = OFFICE.get_E_Operation(ARGS, 'BENCHMARK')/CONVERSION_YEAR_to_SEC
-        Pop_DN = OFFICE.get_E_Operation(ARGS, 'LOW')/CONVERSION_YEAR_to_SEC
-        Pop_UP = OFFICE.get_E_Operation(ARGS, 'HIGH')/CONVERSION_YEAR_to_SEC
-        
-        T_replacement = OFFICE.LIFETIME_LIGHT/(beta*CONVERSION_YEAR_to_HOURS*(1-alpha0))
-        
-        Pm = OFFICE.get_E_Maintenance(T_replacement, ARGS, 'BENCHMARK')/CONVERSION_YEAR_to_SEC
-        Pm_DN = OFFICE.get_E_Maintenance(T_replacement, ARGS, 'LOW')/CONVERSION_YEAR_to_SEC
-        Pm_UP = OFFICE.get_E_Maintenance(T_replacement, ARGS, 'HIGH')/CONVERSION_YEAR_to_SEC
-        
-        Er = OFFICE.get_E_EoL('BENCHMARK')
-        Er_DN = OFFICE.get_E_EoL('LOW')
-        Er_UP = OFFICE.get_E_EoL('HIGH')
-    
-    elif(system_ID == 'other'):
-        
-        # other systems can be added here
-        print('\n Please add another system CONFIG or select another existing system CONFIG ! \n')
-        sys.exit(2)
+    energies, T_replacement = get_scenario_energies(System_sel, alpha0)
+
+    Erm, Eem, Er, Pm, Pop = energies['BENCHMARK']
+    Erm_DN, Eem_DN, Er_DN, Pm_DN, Pop_DN = energies['LOW']
+    Erm_UP, Eem_UP, Er_UP, Pm_UP, Pop_UP = energies['HIGH']
         
+    if (profile is None):
+        t_pb = TPB(Erm, Eem, Er, P_saved, Pm, Pop) # units : years
     else:
-        raise NameError
-        
-    t_pb = TPB(Erm, Eem, Er, P_saved, Pm, Pop) # units : years
+        t_pb = TPB_PTT(Erm, Eem, Er, beta, alpha0, baseline_power_system, Pm, Pop, [[1, -1]], profile)
             
     # uncertainty
     uncert = []
     
-    t_pb_DN = TPB(Erm_DN, Eem_DN, Er_DN, P_saved, Pm_DN, Pop_DN)
-
-    t_pb_UP = TPB(Erm_UP, Eem_UP, Er_UP, P_saved, Pm_UP, Pop_UP)
+    if (profile is None):
+        t_pb_DN = TPB(Erm_DN, Eem_DN, Er_DN, P_saved, Pm_DN, Pop_DN)
+        t_pb_UP = TPB(Erm_UP, Eem_UP, Er_UP, P_saved, Pm_UP, Pop_UP)
+    else:
+        t_pb_DN = TPB_PTT(Erm_DN, Eem_DN, Er_DN, beta, alpha0, baseline_power_system, Pm_DN, Pop_DN, [[1, -1]], profile)
+        t_pb_UP = TPB_PTT(Erm_UP, Eem_UP, Er_UP, beta, alpha0, baseline_power_system, Pm_UP, Pop_UP, [[1, -1]], profile)
     
     uncert.append(t_pb_DN)
     uncert.append(t_pb_UP)
 
-    time_gains = np.linspace(0, TIME_HORIZON, 1000)
-    gains_tau = G(time_gains, Erm, Eem, Er, beta, alpha0, baseline_power_system, Pm, Pop, PTT)
+    t_pb_solved = TPB_PTT(Erm, Eem, Er, beta, alpha0, baseline_power_system, Pm, Pop, PTT, profile) # units : years
 
-    t_pb_solved = opt.fsolve(G, G_start_fsolve, args=(Erm, Eem, Er, beta, alpha0, baseline_power_system, Pm, Pop, PTT))
-    t_pb_solved = T_PB_INFINITY if (max(gains_tau) < 0) else t_pb_solved[0]
+    savings = get_savings(Erm, Eem, Er, beta, alpha0, baseline_power_system, Pm, Pop, PTT, lifetime_system, profile)
 
-    number_of_days = int(CONVERSION_YEAR_to_DAYS*TIME_HORIZON)
-#    days =  np.asarray(range(0, number_of_days))/CONVERSION_YEAR_to_DAYS
-    days = np.linspace(0, TIME_HORIZON, number_of_days)
-    
-    def list_E(Erm, Eem, Er, Pm, Pop): 
-            
-        E_em = np.linspace(Eem + Erm + Er, Eem + Erm + Er + Pm*CONVERSION_YEAR_to_SEC*TIME_HORIZON, number_of_days)
-        E_op = np.linspace(0, ELEC_TO_PRIMARY_ENERGY*Pop*CONVERSION_YEAR_to_SEC*TIME_HORIZON, number_of_days)
-        E_saved = np.linspace(0, ELEC_TO_PRIMARY_ENERGY*P_saved*CONVERSION_YEAR_to_SEC*TIME_HORIZON, number_of_days)
-        
-        E_smart_atLT = E_smart(Erm, Eem, Er, Pop, Pm, lifetime_system)
-        
-        bsavings = np.around(G(lifetime_system, Erm, Eem, Er, beta, alpha0, baseline_power_system, Pm, Pop, [[1, -1]])/E_smart_atLT*100, 2)
-        wsavings = np.around(G(lifetime_system, Erm, Eem, Er, beta, alpha0, baseline_power_system, Pm, Pop, PTT)/E_smart_atLT*100, 2)
+    # curves are only built when they are read
+    curves = {'LOW': EnergyCurves(System_sel, alpha0, Erm_DN, Eem_DN, Er_DN, Pm_DN, Pop_DN),
+              'BENCHMARK': EnergyCurves(System_sel, alpha0, Erm, Eem, Er, Pm, Pop),
+              'HIGH': EnergyCurves(System_sel, alpha0, Erm_UP, Eem_UP, Er_UP, Pm_UP, Pop_UP)}
+
+    if (plot_energy_curves):
         
-        return E_em, E_op, E_saved, [bsavings, wsavings, E_smart_atLT]
+        # matplotlib is only needed, and imported, when plotting
+        import matplotlib.pyplot as plt
         
-    E_em, E_op, E_saved, savings = list_E(Erm, Eem, Er, Pm, Pop)
-    E_em_DN, E_op_DN, E_saved_DN, savings_DN = list_E(Erm_DN, Eem_DN, Er_DN, Pm_DN, Pop_DN)
-    E_em_UP, E_op_UP, E_saved_UP, savings_UP = list_E(Erm_UP, Eem_UP, Er_UP, Pm_UP, Pop_UP)
-        
-    if (plot_energy_curves):
+        days = curves['BENCHMARK'].days
+        E_em, E_op, E_saved = curves['BENCHMARK'].E_em, curves['BENCHMARK'].E_op, curves['BENCHMARK'].E_saved
         
         ########### Energy curves
         if(0):
+            E_em_DN, E_op_DN, E_saved_DN, savings_DN = curves['LOW'].E_em, curves['LOW'].E_op, curves['LOW'].E_saved, curves['LOW'].savings
+            E_em_UP, E_op_UP, E_saved_UP, savings_UP = curves['HIGH'].E_em, curves['HIGH'].E_op, curves['HIGH'].E_saved, curves['HIGH'].savings
+            
             fig, (ax1, ax2, ax3) = plt.subplots(3, 1, sharex=True)
             fig.suptitle('Energy curves for {}\n$\u03B1_0$ = {}% - \u03B2 = {}\n'.format(system_ID, alpha0*100, round(beta, 2)))
             
-            plot_EC(ax1, 'Lower boundary', days, E_em_DN, E_op_DN, E_saved_DN, t_pb_DN, lifetime_system, savings_DN, alpha0, PTT, beta, baseline_power_system)
+            plot_EC(ax1, 'Lower boundary', days, E_em_DN, E_op_DN, E_saved_DN, t_pb_DN, lifetime_system, savings_DN, alpha0, PTT, beta, baseline_power_system, profile)
             ax1.set_xlim([0, TIME_HORIZON])
     
             #ax1.legend(loc='center left', bbox_to_anchor=(1, 0.5))
     
-            plot_EC(ax2, 'Typical', days, E_em, E_op, E_saved, t_pb, lifetime_system, savings, alpha0, PTT, beta, baseline_power_system)
+            plot_EC(ax2, 'Typical', days, E_em, E_op, E_saved, t_pb, lifetime_system, savings, alpha0, PTT, beta, baseline_power_system, profile)
             #if (system_ID == 'PHILIPS-HUE-LED'): plt.vlines(T_life_bulb*CONVERSION_YEAR_to_DAYS, 0, max(E_saved)/1e6, colors='orange', linestyles='dashed', label='T_life_bulbFF (= {} years)'.format(round(T_life_bulb, 2)), alpha=0.4)
             
-            plot_EC(ax3, 'Upper boundary', days, E_em_UP, E_op_UP, E_saved_UP, t_pb_UP, lifetime_system, savings_UP, alpha0, PTT, beta, baseline_power_system)
+            plot_EC(ax3, 'Upper boundary', days, E_em_UP, E_op_UP, E_saved_UP, t_pb_UP, lifetime_system, savings_UP, alpha0, PTT, beta, baseline_power_system, profile)
             ax3.set_xlabel('Time [years]')
 
         ########### plot energy curves only for typical scenario
         fig, ax1 = plt.subplots()
         title = 'Energy curves for {}\n$\u03B1_0$ = {}% - \u03B2 = {}\nTypical'.format(system_ID, alpha0*100, round(beta, 2))
-        plot_EC(ax1, title, days, E_em, E_op, E_saved, t_pb, lifetime_system, savings, alpha0, PTT, beta, baseline_power_system)
+        plot_EC(ax1, title, days, E_em, E_op, E_saved, t_pb, lifetime_system, savings, alpha0, PTT, beta, baseline_power_system, profile)
         
         ax1.set_xlabel('Time [years]')
         #ax2 = ax1.twinx()
@@ -605,6 +788,9 @@ def get_TPB(System_sel, alpha0, plot_energy_curves):
         
         
         ########### Evolution of G(t) and alpha(t)
+        time_gains = curves['BENCHMARK'].time_gains
+        gains_tau = curves['BENCHMARK'].gains_tau
+
         fig, (ax1, ax2) = plt.subplots(2, 1, sharex=True)
         fig.suptitle('Influence of a varying \u03B1\n$\u03B1_0$ = {}%\n'.format(alpha0*100)) #fontsize=16
         
@@ -621,7 +807,7 @@ def get_TPB(System_sel, alpha0, plot_energy_curves):
         ax1.legend()
         
         # alpha(t)
-        ax2.plot(days, alpha_t(days, alpha0, PTT), label='Discontinuous $\u03B1$')
+        ax2.plot(*decimate_minmax(days, curves['BENCHMARK'].alpha), label='Discontinuous $\u03B1$')
         ax2.hlines(alpha0, min(time_gains), max(time_gains), colors='grey', linestyles='dashed', label='$\u03B1_0$', alpha=0.5)
 
         ax2.set_ylabel('$\u03B1$ [/]')
@@ -631,6 +817,187 @@ def get_TPB(System_sel, alpha0, plot_energy_curves):
         ax2.grid(alpha=0.2)
         ax2.legend()
 
-    return t_pb, uncert, t_pb_solved, savings, G(lifetime_system, Erm, Eem, Er, beta, alpha0, baseline_power_system, Pm, Pop, PTT)
+    results = t_pb, uncert, t_pb_solved, savings, G(lifetime_system, Erm, Eem, Er, beta, alpha0, baseline_power_system, Pm, Pop, PTT, profile)
+
+    if (return_curves):
+        return results + (curves,)
+
+    return results
+
+###############################################################################
+
+def get_TPB_batch(System_sel, alpha0, beta=None, ARGS=None, scenario='BENCHMARK', elec_factor=None):
+    "This function returns the results of get_TPB for an array of alpha0, computed in one pass. \
+      - beta (array) and ARGS (array of shape (..., number of components)) can also be swept, \
+        they are broadcast with alpha0 ; None = value of System_sel \
+      - when ARGS is given, the baseline power of the system follows the rule of its SystemModel \
+      - scenario = scenario of the typical case (t_pb, t_pb_solved, savings, G), the bounds are always LOW and HIGH \
+      - with a load profile (System_sel.profile) the savings follow the profile, beta only acts on the maintenance \
+      - elec_factor = conversion of the electricity, None = ELEC_TO_PRIMARY_ENERGY, or a FactorSeries (TSP_SMARTX_FACTORS) \
+      - output = structured array of TPB_BATCH_DTYPE, with the broadcast shape of the inputs \
+      - units output = [years, years, years, years, %, %, J, J]"
+
+    ### Params
+    PTT = System_sel.PTT
+    lifetime_system = System_sel.lifetime_system
+    profile = System_sel.profile
+
+    alpha0 = np.asarray(alpha0, dtype=float)
+    beta = System_sel.beta if (beta is None) else np.asarray(beta, dtype=float)
+
+    if (ARGS is None):
+        baseline_power_system = System_sel.baseline_power_system
+    else:
+        ARGS = np.asarray(ARGS, dtype=float)
+        baseline_power_system = registry.get_system_model(System_sel.system_ID).get_baseline_power_system(System_sel.baseline_power, ARGS)
+
+    P_saved = baseline_power_system*alpha0*beta # W = J/s
+
+    energies, _ = get_scenario_energies(System_sel, alpha0, beta, ARGS)
+
+    Erm, Eem, Er, Pm, Pop = energies[scenario]
+    Erm_DN, Eem_DN, Er_DN, Pm_DN, Pop_DN = energies['LOW']
+    Erm_UP, Eem_UP, Er_UP, Pm_UP, Pop_UP = energies['HIGH']
+
+    shape = np.broadcast_shapes(np.shape(P_saved), *[np.shape(E) for scenario in SCENARIOS for E in energies[scenario]])
+    results = np.empty(shape, dtype=TPB_BATCH_DTYPE)
+
+    if (profile is None):
+        results['t_pb'] = TPB(Erm, Eem, Er, P_saved, Pm, Pop, elec_factor)
+        results['t_pb_DN'] = TPB(Erm_DN, Eem_DN, Er_DN, P_saved, Pm_DN, Pop_DN, elec_factor)
+        results['t_pb_UP'] = TPB(Erm_UP, Eem_UP, Er_UP, P_saved, Pm_UP, Pop_UP, elec_factor)
+    else:
+        results['t_pb'] = TPB_PTT(Erm, Eem, Er, beta, alpha0, baseline_power_system, Pm, Pop, [[1, -1]], profile, elec_factor)
+        results['t_pb_DN'] = TPB_PTT(Erm_DN, Eem_DN, Er_DN, beta, alpha0, baseline_power_system, Pm_DN, Pop_DN, [[1, -1]], profile, elec_factor)
+        results['t_pb_UP'] = TPB_PTT(Erm_UP, Eem_UP, Er_UP, beta, alpha0, baseline_power_system, Pm_UP, Pop_UP, [[1, -1]], profile, elec_factor)
+
+    results['t_pb_solved'] = TPB_PTT(Erm, Eem, Er, beta, alpha0, baseline_power_system, Pm, Pop, PTT, profile, elec_factor)
+
+    results['bsavings'], results['wsavings'], results['E_smart_atLT'] = get_savings(Erm, Eem, Er, beta, alpha0, baseline_power_system, Pm, Pop, PTT, lifetime_system, profile, elec_factor)
+
+    results['G'] = G(lifetime_system, Erm, Eem, Er, beta, alpha0, baseline_power_system, Pm, Pop, PTT, profile, elec_factor)
+
+    return results
+
+###############################################################################
+
+def get_TPB_components(System_sel, component, counts, alpha0, scenario='BENCHMARK', hubless=True):
+    "This function returns the results of get_TPB_batch for every number of one component, computed at once. \
+      - component = name in the ARGS_names of the SystemModel, counts = array of numbers of this component \
+      - the hubs are added automatically when a hub exceeds its capacity (SystemModel.hub_capacity), \
+        a system with 0 hubs stays without hub unless hubless = False (see SystemModel.get_component_ARGS) \
+      - System_sel is not modified \
+      - output = ARGS of shape (..., number of components), structured array of TPB_BATCH_DTYPE"
+
+    model = registry.get_system_model(System_sel.system_ID)
+
+    ARGS = model.get_component_ARGS(System_sel.args, component, counts, hubless)
+
+    return ARGS, get_TPB_batch(System_sel, alpha0, ARGS=ARGS, scenario=scenario)
+
+###############################################################################
+
+def get_metric_factors(metrics):
+    "Output = names, electricity factors (n_metrics,), embodied intensities (n_metrics, 4) of [Erm, Eem, Er, Pm] \
+      - metrics = list of names of METRICS or {name : (electricity factor, embodied intensity(ies))}"
+
+    if (not isinstance(metrics, dict)):
+        unknown = [name for name in metrics if name not in METRICS]
+        if unknown: raise NameError('\n Unknown metrics {} : select among {} ! \n'.format(unknown, list(METRICS)))
+
+        metrics = {name: METRICS[name] for name in metrics}
+
+    elec_factors = np.array([factors[0] for factors in metrics.values()], dtype=float)
+    embodied = np.array([np.broadcast_to(np.asarray(factors[1], dtype=float), (4,)) for factors in metrics.values()])
+
+    return list(metrics), elec_factors, embodied
+
+def get_TPB_metrics(System_sel, alpha0, metrics=('PRIMARY_ENERGY', 'CO2', 'COST'), beta=None, ARGS=None, scenario='BENCHMARK', chunk_size=METRICS_CHUNK_SIZE):
+    "This function returns the results of get_TPB_batch for several metrics (primary energy, CO2, cost ...) in one pass. \
+      - metrics : see get_metric_factors ; a metric converts the electricity with its electricity factor, \
+        the embodied energies and the maintenance with its embodied intensities \
+      - the energies of the smart layer are computed once per element, the metrics are a leading axis of every kernel \
+      - the elements are evaluated by chunks of about chunk_size along the first axis of the broadcast shape, \
+        the arrays of all the metrics of a chunk stay in cache (one chunk with a load profile, its samples are scanned once) \
+      - the other inputs are the ones of get_TPB_batch, PRIMARY_ENERGY gives the results of get_TPB_batch \
+      - output = structured array of TPB_BATCH_DTYPE of shape (n_metrics,) + broadcast shape of the inputs, \
+        results[k] = results of the k-th metric \
+      - units output = [years, years, years, years, %, %, unit of the metric, unit of the metric]"
+
+    _, elec_factor, embodied = get_metric_factors(metrics)
+
+    alpha0 = np.asarray(alpha0, dtype=float)
+    beta = np.asarray(System_sel.beta if (beta is None) else beta, dtype=float)
+    if (ARGS is not None): ARGS = np.asarray(ARGS, dtype=float)
+
+    shape = np.broadcast_shapes(alpha0.shape, beta.shape, ARGS.shape[:-1] if (ARGS is not None) else ())
+    results = np.empty((len(elec_factor),) + shape, dtype=TPB_BATCH_DTYPE)
+
+    if (len(shape) == 0 or System_sel.profile is not None):
+        results[...] = get_metrics_chunk(System_sel, alpha0, beta, ARGS, elec_factor, embodied, scenario, shape)
+        return results
+
+    # chunks along the first axis, the inputs keep their broadcast (e.g. the energies of ARGS shared by every alpha0)
+    pad = lambda x, tail=0: x.reshape((1,)*(len(shape) + tail - x.ndim) + x.shape)
+    alpha0, beta = pad(alpha0), pad(beta)
+    if (ARGS is not None): ARGS = pad(ARGS, 1)
+
+    rows_per_chunk = max(chunk_size//max(int(np.prod(shape[1:])), 1), 1)
+    take = lambda x, rows: x if (x is None or x.shape[0] == 1) else x[rows]
+
+    for first in range(0, shape[0], rows_per_chunk):
+        rows = slice(first, first + rows_per_chunk)
+        results[:, rows] = get_metrics_chunk(System_sel, take(alpha0, rows), take(beta, rows), take(ARGS, rows), elec_factor, embodied, scenario,
+                                             results[0, rows].shape)
+
+    return results
+
+def get_metrics_chunk(System_sel, alpha0, beta, ARGS, elec_factor, embodied, scenario, shape):
+    "Output = results of get_TPB_metrics for alpha0, beta and ARGS broadcast to shape, of shape (n_metrics,) + shape"
+
+    ### Params
+    PTT = System_sel.PTT
+    lifetime_system = System_sel.lifetime_system
+    profile = System_sel.profile
+
+    if (ARGS is None):
+        baseline_power_system = System_sel.baseline_power_system
+    else:
+        baseline_power_system = registry.get_system_model(System_sel.system_ID).get_baseline_power_system(System_sel.baseline_power, ARGS)
+
+    P_saved = baseline_power_system*alpha0*beta # W = J/s
+
+    energies, _ = get_scenario_energies(System_sel, alpha0, beta, ARGS)
+
+    # leading metric axis
+    elec_factor = elec_factor.reshape((-1,) + (1,)*len(shape))
+    embodied = embodied.reshape((-1,) + (1,)*len(shape) + (4,))
+
+    def convert(scenario):
+        Erm, Eem, Er, Pm, Pop = energies[scenario]
+        return embodied[..., 0]*Erm, embodied[..., 1]*Eem, embodied[..., 2]*Er, embodied[..., 3]*Pm, Pop
+
+    Erm, Eem, Er, Pm, Pop = convert(scenario)
+    Erm_DN, Eem_DN, Er_DN, Pm_DN, Pop_DN = convert('LOW')
+    Erm_UP, Eem_UP, Er_UP, Pm_UP, Pop_UP = convert('HIGH')
+
+    results = np.empty((len(elec_factor),) + shape, dtype=TPB_BATCH_DTYPE)
+
+    if (profile is None):
+        results['t_pb'] = TPB(Erm, Eem, Er, P_saved, Pm, Pop, elec_factor)
+        results['t_pb_DN'] = TPB(Erm_DN, Eem_DN, Er_DN, P_saved, Pm_DN, Pop_DN, elec_factor)
+        results['t_pb_UP'] = TPB(Erm_UP, Eem_UP, Er_UP, P_saved, Pm_UP, Pop_UP, elec_factor)
+    else:
+        results['t_pb'] = TPB_PTT(Erm, Eem, Er, beta, alpha0, baseline_power_system, Pm, Pop, [[1, -1]], profile, elec_factor)
+        results['t_pb_DN'] = TPB_PTT(Erm_DN, Eem_DN, Er_DN, beta, alpha0, baseline_power_system, Pm_DN, Pop_DN, [[1, -1]], profile, elec_factor)
+        results['t_pb_UP'] = TPB_PTT(Erm_UP, Eem_UP, Er_UP, beta, alpha0, baseline_power_system, Pm_UP, Pop_UP, [[1, -1]], profile, elec_factor)
+
+    results['t_pb_solved'] = TPB_PTT(Erm, Eem, Er, beta, alpha0, baseline_power_system, Pm, Pop, PTT, profile, elec_factor)
+
+    results['bsavings'], results['wsavings'], results['E_smart_atLT'] = get_savings(Erm, Eem, Er, beta, alpha0, baseline_power_system, Pm, Pop, PTT, lifetime_system, profile, elec_factor)
+
+    results['G'] = G(lifetime_system, Erm, Eem, Er, beta, alpha0, baseline_power_system, Pm, Pop, PTT, profile, elec_factor)
+
+    return results
 
 # end of script
\ No newline at end of file
@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+@author: TSP
+
+Design optimizer : searches the integer component counts (ARGS) of a system under constraints
+(coverage, hub capacity, budget) and returns the Pareto front of payback and lifetime savings.
+
+    design = optimize_design(System_sel, {'os': (0, 20), 'bulbs': (1, 5000), 'hubs': (1, 200)},
+                             unit_costs={'os': 40, 'bulbs': 15, 'hubs': 60}, budget=50000)
+    design['front']                                         # structured array : counts and objectives
+
+    # coverage : one sensor per 10 nodes at least
+    optimize_design(System_sel, {'sensors': (1, 100), 'nodes': (1, 1000), 'hubs': (1, 50)},
+                    constraint=lambda ARGS: ARGS[..., 0]*10 >= ARGS[..., 1])
+"""
+###############################################################################
+#                                      IMPORT                                 #
+###############################################################################
+
+import numpy as np
+
+import TSP_SMARTX_CONFIG_simple as config
+import TSP_SMARTX_REGISTRY as registry
+
+###############################################################################
+#                                    CONSTANTS                                #
+###############################################################################
+
+DESIGN_CHUNK_SIZE =                 2**18                                             # units : candidates evaluated at once
+
+# objective : +1 minimized, -1 maximized
+DESIGN_OBJECTIVES =                 {'t_pb': 1, 't_pb_solved': 1, 'G': -1, 'bsavings': -1, 'wsavings': -1, 'cost': 1}
+
+###############################################################################
+#                                    FUNCTIONS                                #
+###############################################################################
+
+def get_pareto_mask(costs):
+    "Output = mask of the non-dominated rows of costs (rows = candidates, columns = objectives, all minimized). \
+     Equal candidates are kept once."
+
+    costs = np.asarray(costs, dtype=float)
+    order = np.lexsort(costs.T[::-1])
+
+    remaining = order
+    front = []
+
+    # the lexicographic minimum of the remaining candidates is not dominated, it removes every candidate it dominates
+    while len(remaining) > 0:
+        best = remaining[0]
+        front.append(best)
+        remaining = remaining[~np.all(costs[remaining] >= costs[best], axis=1)]
+
+    mask = np.zeros(len(costs), dtype=bool)
+    mask[front] = True
+
+    return mask
+
+###############################################################################
+
+def get_pure_cost_components(System_sel, bounds, alpha0):
+    "Output = components that only add costs : the baseline power (and alpha0 when it is a function of ARGS) does not \
+     change when they go from their lower to their upper bound. The energies of the models grow with every count."
+
+    model = registry.get_system_model(System_sel.system_ID)
+
+    lower = np.array([bounds[name][0] for name in model.ARGS_names], dtype=float)
+    pure_cost = []
+
+    for ind, name in enumerate(model.ARGS_names):
+        upper = lower.copy()
+        upper[ind] = bounds[name][1]
+
+        same_power = np.allclose(model.get_baseline_power_system(System_sel.baseline_power, lower), model.get_baseline_power_system(System_sel.baseline_power, upper))
+        same_alpha0 = (not callable(alpha0)) or np.allclose(alpha0(lower), alpha0(upper))
+
+        if (same_power and same_alpha0): pure_cost.append(name)
+
+    return pure_cost
+
+def is_feasible(model, ARGS, constraint=None, hubless=True):
+    "Output = mask of the ARGS respecting the hub capacity of the model and constraint(ARGS), \
+     the capacity only applies to the designs with hubs : 0 hubs is a system without hub (see SystemModel.get_component_ARGS), \
+     hubless = False : the designs without hub are infeasible when they have components to attach"
+
+    feasible = np.ones(ARGS.shape[:-1], dtype=bool)
+
+    for attached, (hub, capacity) in model.hub_capacity.items():
+        hubs = ARGS[..., model.ARGS_names.index(hub)]
+        feasible &= (hubs*capacity >= ARGS[..., model.ARGS_names.index(attached)]) | (hubless & (hubs == 0))
+
+    if (constraint is not None): feasible &= constraint(ARGS)
+
+    return feasible
+
+def set_pure_cost_hubs(model, ARGS, bounds, pure_cost, hubless=True):
+    "Output = ARGS (modified in place) where the pure-cost hubs take the number the hub capacity needs, within their bounds. \
+     With a lower bound of 0 the hubs stay at 0 (system without hub), unless hubless = False."
+
+    for attached, (hub, capacity) in model.hub_capacity.items():
+        if (hub not in pure_cost or (hubless and bounds[hub][0] == 0)): continue
+
+        needed = np.ceil(ARGS[..., model.ARGS_names.index(attached)]/capacity)
+        ARGS[..., model.ARGS_names.index(hub)] = np.clip(needed, bounds[hub][0], bounds[hub][1])
+
+    return ARGS
+
+###############################################################################
+
+def optimize_design(System_sel, bounds, objectives=('t_pb_solved', 'G'), alpha0=None, beta=None, unit_costs=None, budget=None,
+                    constraint=None, pure_cost=None, scenario='BENCHMARK', hubless=True, chunk_size=DESIGN_CHUNK_SIZE):
+    "This function searches the integer ARGS of System_sel and returns the non-dominated designs. \
+      - bounds = {component : (min, max)} inclusive, e.g. coverage minimums ; missing components keep the value of System_sel.args \
+      - objectives = names of DESIGN_OBJECTIVES ; 'cost' = sum of unit_costs*counts \
+      - alpha0 = number or function of ARGS (array of shape (..., number of components)), None = System_sel.alpha0[1] \
+      - constraint = function of ARGS returning a mask of the feasible designs, the hub capacity of the model applies \
+        to the designs with hubs (0 hubs = system without hub, hubless = False rejects them) \
+      - budget = maximum cost (needs unit_costs) \
+      - dominance pruning : a pure-cost component (see get_pure_cost_components, or the list pure_cost) is set to \
+        the smallest value satisfying the constraints, any larger value gives a dominated design ; \
+        the other components are enumerated and evaluated by chunks with get_TPB_batch \
+      - output = {front : structured array (components, objectives) of the Pareto front, \
+                  best : {objective : best design}, n_candidates, n_evaluated}"
+
+    model = registry.get_system_model(System_sel.system_ID)
+    if (model.ARGS_names is None): raise TypeError('{} has no component to optimize'.format(System_sel.system_ID))
+
+    unknown = [name for name in list(bounds) + list(objectives) + list(unit_costs or []) if name not in model.ARGS_names + list(DESIGN_OBJECTIVES)]
+    if unknown: raise NameError('\n Unknown components or objectives {} : select among {} and {} ! \n'.format(unknown, model.ARGS_names, list(DESIGN_OBJECTIVES)))
+
+    if ((budget is not None or 'cost' in objectives) and unit_costs is None): raise ValueError('a budget or a cost objective needs unit_costs')
+
+    bounds = {name: tuple(bounds.get(name, (value, value))) for name, value in zip(model.ARGS_names, System_sel.args)}
+    alpha0 = System_sel.alpha0[1] if (alpha0 is None) else alpha0
+    costs = np.array([(unit_costs or {}).get(name, 0) for name in model.ARGS_names], dtype=float)
+
+    if (pure_cost is None): pure_cost = get_pure_cost_components(System_sel, bounds, alpha0)
+    free = [name for name in model.ARGS_names if name not in pure_cost]
+
+    sizes = [int(bounds[name][1] - bounds[name][0] + 1) for name in free]
+    n_free = int(np.prod(sizes))
+
+    dtype = np.dtype([(name, float) for name in model.ARGS_names] + [(name, float) for name in objectives])
+    sign = np.array([DESIGN_OBJECTIVES[name] for name in objectives], dtype=float)
+
+    front = np.empty(0, dtype=dtype)
+    n_evaluated = 0
+
+    for first in range(0, n_free, chunk_size):
+        ind = np.unravel_index(np.arange(first, min(first + chunk_size, n_free)), sizes) if free else (np.zeros(1, dtype=int),)
+
+        ARGS = np.empty((len(ind[0]), len(model.ARGS_names)))
+        for name in model.ARGS_names:
+            ARGS[:, model.ARGS_names.index(name)] = bounds[name][0]
+        for k, name in enumerate(free):
+            ARGS[:, model.ARGS_names.index(name)] += ind[k]
+
+        # pure-cost components : smallest feasible value, one component after the other ; the hubs follow the capacity
+        set_pure_cost_hubs(model, ARGS, bounds, pure_cost, hubless)
+        feasible = is_feasible(model, ARGS, constraint, hubless)
+        for name in [name for name in pure_cost if name not in [hub for hub, _ in model.hub_capacity.values()]]:
+            column = model.ARGS_names.index(name)
+            for value in range(int(bounds[name][0]) + 1, int(bounds[name][1]) + 1):
+                if np.all(feasible): break
+                infeasible = np.flatnonzero(~feasible)
+                ARGS[infeasible, column] = value
+                ARGS[infeasible] = set_pure_cost_hubs(model, ARGS[infeasible], bounds, pure_cost, hubless)
+                feasible[infeasible] = is_feasible(model, ARGS[infeasible], constraint, hubless)
+
+        cost = ARGS @ costs
+        if (budget is not None): feasible &= cost <= budget
+
+        ARGS, cost = ARGS[feasible], cost[feasible]
+        if (len(ARGS) == 0): continue
+
+        results = config.get_TPB_batch(System_sel, alpha0(ARGS) if callable(alpha0) else alpha0, beta, ARGS, scenario)
+
+        candidates = np.empty(len(ARGS), dtype=dtype)
+        for k, name in enumerate(model.ARGS_names):
+            candidates[name] = ARGS[:, k]
+        for name in objectives:
+            candidates[name] = cost if (name == 'cost') else results[name]
+
+        n_evaluated += len(ARGS)
+
+        # front of the chunk merged with the front so far
+        front = np.concatenate((front, candidates))
+        values = np.stack([front[name] for name in objectives], axis=-1)*sign
+        front = front[get_pareto_mask(values)]
+
+    front = np.sort(front, order=list(objectives))
+
+    best = {}
+    for name in objectives:
+        if len(front): best[name] = front[np.argmin(front[name]*DESIGN_OBJECTIVES[name])]
+
+    n_candidates = int(np.prod([bounds[name][1] - bounds[name][0] + 1 for name in model.ARGS_names]))
+
+    return {'front': front, 'best': best, 'n_candidates': n_candidates, 'n_evaluated': n_evaluated}
@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+@author: TSP
+
+Time-varying electricity conversion factor : the primary energy (or carbon) of a kWh follows the trajectory of the grid
+instead of the constant ELEC_TO_PRIMARY_ENERGY. Accepted as elec_factor by E_saved_f, E_smart, G, TPB, TPB_PTT and get_TPB_batch.
+
+    factors = FactorSeries(np.linspace(3, 2, 30))                                    # one value per year, 2 after 30 years
+    factors = FactorSeries.from_csv('grid.csv', step=1/config.CONVERSION_YEAR_to_HOURS)  # hour by hour
+    config.get_TPB_batch(System_sel, alpha0, elec_factor=factors)
+"""
+###############################################################################
+#                                      IMPORT                                 #
+###############################################################################
+
+import numpy as np
+
+import TSP_SMARTX_CONFIG_simple as config
+
+###############################################################################
+#                                    CONSTANTS                                #
+###############################################################################
+
+FACTORS_CHUNK_SIZE =                2**14                                             # units : knots scanned at once by first_crossing, the first chunks are smaller
+FACTORS_FIRST_CHUNK_SIZE =          2**6                                              # units : knots of the first chunk, doubled from chunk to chunk
+FACTORS_SOLVER_POINTS =             2**22                                             # units : (parameter set, knot) points of G evaluated at once
+FACTORS_MEMO_SIZE =                 16                                                # units : PTT whose knots are kept by a series
+
+###############################################################################
+#                                    FUNCTIONS                                #
+###############################################################################
+
+class FactorSeries:
+    "Electricity conversion factor as a step function of time : values[k] from times[k] to times[k+1], \
+     the last value persists after times[-1]. \
+      - times = start of each value, from 0, default = k*step \
+      - the integral of the factor (and of the factor times alpha(t) for a PTT) is kept as prefix sums at the knots : \
+        a query at any t is a binary search, O(log n) \
+      - units = unit of the metric per J of electricity (3 for the primary energy), times and step in years"
+
+    def __init__(self, values, step=1, times=None):
+        self.values = np.asarray(values, dtype=float)
+        self.times = step*np.arange(len(self.values), dtype=float) if (times is None) else np.asarray(times, dtype=float)
+
+        if (self.times.shape != self.values.shape): raise ValueError('one time per value is needed')
+        if (self.times[0] != 0 or np.any(np.diff(self.times) <= 0)): raise ValueError('times must start at 0 and increase')
+        if np.any(self.values < 0): raise ValueError('the factors must be positive')
+
+        self.cumul = np.append(0, np.cumsum(self.values[0:-1]*np.diff(self.times)))
+        self.memo = {}
+
+    def __repr__(self):
+        return 'FactorSeries(n={}, from {} to {} years, {} -> {})'.format(len(self.values), self.times[0], self.times[-1], self.values[0], self.values[-1])
+
+    def __getstate__(self):
+        return dict(vars(self), memo={})
+
+    @classmethod
+    def from_csv(cls, path, step, column=-1, header=False):
+        "Output = series of the values of a CSV file, one per line (column = index of the factor column), step in years"
+
+        return cls(np.loadtxt(path, delimiter=',', skiprows=int(header), usecols=column, ndmin=1), step)
+
+    ###########################################################################
+
+    def factor(self, time):
+        "Output = factor at time, units : /"
+
+        ind = np.maximum(np.searchsorted(self.times, time, side='right') - 1, 0)
+        return self.values[ind][()]
+
+    def integral(self, time):
+        "Output = integral of the factor from 0 to time, units : years"
+
+        time = np.maximum(np.asarray(time, dtype=float), 0)
+        ind = np.searchsorted(self.times, time, side='right') - 1
+
+        return (self.cumul[ind] + self.values[ind]*(time - self.times[ind]))[()]
+
+    def get_knots(self, PTT):
+        "This function returns the knots where the factor or the PTT changes, and the prefix sums at the knots : \
+          - knots, F = integral of the factor, H = integral of the factor times the PTT coefficient \
+          - factor, coef = factor and PTT coefficient after each knot (coef = None for a persistence model) \
+          - PTT made of steps : the last step never ends ; persistence model : the knots are the times of the series \
+          - kept in memo per PTT"
+
+        key = repr(PTT) if config.is_persistence_model(PTT) else tuple(map(tuple, np.asarray(PTT, dtype=float).tolist()))
+
+        if key not in self.memo:
+            if (len(self.memo) >= FACTORS_MEMO_SIZE): self.memo.clear()
+
+            if config.is_persistence_model(PTT):
+                knots = self.times
+                values = self.values
+
+                # the factor is constant between the knots : integral of alpha weighted by the factor of each interval
+                C = PTT.cumulative(knots)
+                H = np.append(0, np.cumsum(values[0:-1]*np.diff(C)))
+                coef = None
+
+            else:
+                PTT_array = np.asarray(PTT, dtype=float)
+                PTT_start = np.append(0, np.cumsum(PTT_array[:,1][0:-1]))
+                PTT_start = PTT_start[np.isfinite(PTT_start) & (PTT_start >= 0)]
+
+                knots = np.union1d(self.times, PTT_start)
+                values = self.values[np.searchsorted(self.times, knots, side='right') - 1]
+                coef = PTT_array[np.searchsorted(PTT_start, knots, side='right') - 1, 0]
+
+                H = np.append(0, np.cumsum((values*coef)[0:-1]*np.diff(knots)))
+
+            self.memo[key] = {'knots': knots, 'factor': values, 'coef': coef, 'F': self.integral(knots), 'H': H}
+
+        return self.memo[key]
+
+    def weighted_integral(self, time, PTT):
+        "Output = integral of the factor times the PTT coefficient of alpha from 0 to time, O(log n), units : years"
+
+        time = np.maximum(np.asarray(time, dtype=float), 0)
+        knots = self.get_knots(PTT)
+        ind = np.searchsorted(knots['knots'], time, side='right') - 1
+
+        if config.is_persistence_model(PTT):
+            return (knots['H'][ind] + knots['factor'][ind]*(PTT.cumulative(time) - PTT.cumulative(knots['knots'][ind])))[()]
+
+        return (knots['H'][ind] + knots['factor'][ind]*knots['coef'][ind]*(time - knots['knots'][ind]))[()]
+
+    ###########################################################################
+
+    def first_crossing(self, gain_rate, E_init, loss_rate, elec_rate, PTT, horizon=None):
+        "This function returns the first t at which gain_rate*H(t) - E_init - loss_rate*t - elec_rate*F(t) >= 0, \
+         F = integral of the factor, H = integral of the factor times the PTT coefficient. \
+          - G is linear between two knots (changes of the factor or of the PTT) : the crossing is exact \
+          - the knots are scanned in chunks from t = 0 ; F and H increase, so G is bounded on a chunk (and on each block of \
+            a chunk) by its ends : only the first blocks where G may cross are evaluated knot by knot, \
+            about O(sqrt(n)) per chunk and parameter set ; the scan stops once every set has crossed \
+          - gain_rate, E_init, loss_rate and elec_rate (>= 0) can be arrays, they are broadcast together \
+          - horizon = None : TIME_HORIZON ; np.inf : G is linear after the last knot, a later crossing is solved there \
+          - returns T_PB_INFINITY if there is no crossing within the horizon \
+          - units : gain_rate, loss_rate and elec_rate [J/year], E_init [J], output [years]"
+
+        if config.is_persistence_model(PTT): raise TypeError('a factor series needs a PTT made of steps to solve the payback')
+
+        gain_rate, E_init, loss_rate, elec_rate = np.broadcast_arrays(*[np.asarray(x, dtype=float) for x in (gain_rate, E_init, loss_rate, elec_rate)])
+        shape = gain_rate.shape
+        gain_rate, E_init, loss_rate, elec_rate = gain_rate.ravel(), E_init.ravel(), loss_rate.ravel(), elec_rate.ravel()
+
+        knots = self.get_knots(PTT)
+
+        # knots within the horizon, the horizon is the last one (the last knot when there is none)
+        horizon = config.TIME_HORIZON if (horizon is None) else horizon
+        end = horizon if np.isfinite(horizon) else knots['knots'][-1]
+
+        n = np.searchsorted(knots['knots'], end, side='left')
+        t = np.append(knots['knots'][0:n], end)
+        H = np.append(knots['H'][0:n], self.weighted_integral(end, PTT))
+        F = np.append(knots['F'][0:n], self.integral(end))
+
+        t_cross = np.full(gain_rate.shape, float(config.T_PB_INFINITY))
+        t_cross[E_init <= 0] = 0
+
+        G_at = lambda i, k: gain_rate[i]*H[k] - E_init[i] - loss_rate[i]*t[k] - elec_rate[i]*F[k]
+
+        # chunks of knots, the last knot of a chunk starts the next one : the early crossings are found in the first, small, chunks
+        first, chunk_size = 0, FACTORS_FIRST_CHUNK_SIZE
+        while (first < len(t) - 1):
+            last = min(first + chunk_size, len(t) - 1)
+            chunk_size = min(2*chunk_size, FACTORS_CHUNK_SIZE)
+
+            unresolved = np.flatnonzero(t_cross == config.T_PB_INFINITY)
+            if (len(unresolved) == 0): break
+
+            # upper bound of G on the chunk, then on each block of the chunk
+            G_max = gain_rate[unresolved]*H[last] - E_init[unresolved] - loss_rate[unresolved]*t[first] - elec_rate[unresolved]*F[first]
+            unresolved = unresolved[G_max >= 0]
+
+            # blocks of about sqrt(chunk) knots : as many block bounds as knots evaluated in a block
+            block_size = max(int(np.sqrt(last - first)), 1)
+            block_start = np.arange(first, last, block_size)
+            block_end = np.minimum(block_start + block_size, last)
+
+            rows_per_pass = max(FACTORS_SOLVER_POINTS//len(block_start), 1)
+            for ind in range(0, len(unresolved), rows_per_pass):
+                i = unresolved[ind:ind + rows_per_pass, np.newaxis]
+                candidate = G_at(i, block_end) + (loss_rate[i]*(t[block_end] - t[block_start]) + elec_rate[i]*(F[block_end] - F[block_start])) >= 0
+
+                # the first candidate block of each set is evaluated knot by knot, until the block where G crosses
+                while True:
+                    rows = np.flatnonzero(np.any(candidate, axis=-1))
+                    if (len(rows) == 0): break
+
+                    b = np.argmax(candidate[rows], axis=-1)
+                    k = np.minimum(block_start[b, np.newaxis] + np.arange(block_size + 1), block_end[b, np.newaxis])
+
+                    G = G_at(i[rows], k)
+                    crossed = G >= 0
+
+                    found = np.any(crossed[:, 1:], axis=-1)
+                    j = np.argmax(crossed[:, 1:], axis=-1)[found] + 1
+                    cross = np.flatnonzero(found)
+
+                    G0, G1 = G[cross, j - 1], G[cross, j]
+                    t0, t1 = t[k[cross, j - 1]], t[k[cross, j]]
+
+                    t_cross[i[rows[found], 0]] = t0 - G0*(t1 - t0)/(G1 - G0)
+
+                    candidate[rows[found]] = False
+                    candidate[rows[~found], b[~found]] = False
+
+            first = last
+
+        # after the last knot : the factor and the PTT coefficient are constant, G is linear
+        if (not np.isfinite(horizon)):
+            i = np.flatnonzero(t_cross == config.T_PB_INFINITY)
+
+            G_end = gain_rate[i]*H[-1] - E_init[i] - loss_rate[i]*t[-1] - elec_rate[i]*F[-1]
+            slope = gain_rate[i]*knots['factor'][-1]*knots['coef'][-1] - loss_rate[i] - elec_rate[i]*knots['factor'][-1]
+
+            with np.errstate(divide='ignore', invalid='ignore'):
+                t_cross[i] = np.where(slope > 0, t[-1] - G_end/slope, config.T_PB_INFINITY)
+
+        return t_cross.reshape(shape)[()]
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+@author: TSP
+
+Fleet mode : payback of a fleet of units (e.g. millions of smart meters), each with its own parameters,
+read chunk by chunk from a columnar file.
+
+    CSV with a header line, or .npy structured array (memory-mapped) with the columns :
+      - P_operation [W]        measured power of the unit
+      - baseline_power [W]     baseline power of the household
+      - alpha0 [/]             savings fraction
+      - install_year [years]   date of installation, e.g. 2017.5
+      - optional : beta [/], lifetime [years], E_embodied [J], default = system definition
+"""
+###############################################################################
+#                                      IMPORT                                 #
+###############################################################################
+
+import itertools
+
+import numpy as np
+
+import TSP_SMARTX_CONFIG_simple as config
+import TSP_SMARTX_MONTECARLO as montecarlo
+import TSP_SMARTX_REGISTRY as registry
+
+###############################################################################
+#                                    CONSTANTS                                #
+###############################################################################
+
+FLEET_CHUNK_SIZE =                  2**14                                             # units : units read and evaluated at once
+FLEET_CURVE_POINTS =                2**20                                             # units : (unit, year) points of the net gain curve evaluated at once
+FLEET_COLUMNS =                     ['P_operation', 'baseline_power', 'alpha0', 'install_year']
+
+###############################################################################
+#                                    FUNCTIONS                                #
+###############################################################################
+
+def read_fleet_chunks(path, chunk_size=FLEET_CHUNK_SIZE):
+    "This function reads a fleet file chunk by chunk. \
+      - path = .npy structured array (memory-mapped) or CSV with a header line \
+      - output = generator of {column : array}"
+
+    if path.endswith('.npy'):
+        data = np.load(path, mmap_mode='r')
+
+        for start in range(0, len(data), chunk_size):
+            chunk = data[start:start + chunk_size]
+            yield {name: np.asarray(chunk[name], dtype=float) for name in data.dtype.names}
+
+    else:
+        with open(path) as file:
+            names = [name.strip() for name in file.readline().split(',')]
+
+            while True:
+                lines = list(itertools.islice(file, chunk_size))
+                if not lines: break
+
+                values = np.loadtxt(lines, delimiter=',', ndmin=2)
+                yield dict(zip(names, values.T))
+
+###############################################################################
+
+def get_fleet_TPB(System_sel, units, scenario='BENCHMARK'):
+    "This function returns the payback and the savings of every unit of a chunk, in one vectorized pass. \
+      - units = {column : array}, see FLEET_COLUMNS \
+      - the measured P_operation replaces the one of the system model in every scenario \
+      - output = structured array of config.TPB_BATCH_DTYPE, savings at the end of the lifetime of each unit"
+
+    missing = [name for name in FLEET_COLUMNS if name not in units]
+    if missing: raise NameError('\n Missing fleet columns {} ! \n'.format(missing))
+
+    model = registry.get_system_model(System_sel.system_ID)
+
+    alpha0 = units['alpha0']
+    beta = units.get('beta', System_sel.beta)
+    lifetime = units.get('lifetime', System_sel.lifetime_system)
+    Pop = units['P_operation']
+
+    baseline_power_system = model.get_baseline_power_system(units['baseline_power'], System_sel.args)
+    P_saved = baseline_power_system*alpha0*beta # W = J/s
+
+    E, _ = model.get_energies(System_sel.args, alpha0, beta)
+    E_embodied = E[..., 0] + E[..., 1] + E[..., 2]
+    Pm = E[..., 3]
+
+    if ('E_embodied' in units):
+        E_embodied = np.repeat(units['E_embodied'][..., np.newaxis], len(config.SCENARIOS), axis=-1)
+
+    s, s_DN, s_UP = [config.SCENARIOS.index(name) for name in [scenario, 'LOW', 'HIGH']]
+
+    results = np.empty(len(alpha0), dtype=config.TPB_BATCH_DTYPE)
+
+    results['t_pb'] = config.TPB(E_embodied[..., s], 0, 0, P_saved, Pm[..., s], Pop)
+    results['t_pb_DN'] = config.TPB(E_embodied[..., s_DN], 0, 0, P_saved, Pm[..., s_DN], Pop)
+    results['t_pb_UP'] = config.TPB(E_embodied[..., s_UP], 0, 0, P_saved, Pm[..., s_UP], Pop)
+
+    results['t_pb_solved'] = config.TPB_PTT(E_embodied[..., s], 0, 0, beta, alpha0, baseline_power_system, Pm[..., s], Pop, System_sel.PTT)
+
+    results['bsavings'], results['wsavings'], results['E_smart_atLT'] = config.get_savings(E_embodied[..., s], 0, 0, beta, alpha0, baseline_power_system, Pm[..., s], Pop, System_sel.PTT, lifetime)
+
+    results['G'] = config.G(lifetime, E_embodied[..., s], 0, 0, beta, alpha0, baseline_power_system, Pm[..., s], Pop, System_sel.PTT)
+
+    return results
+
+###############################################################################
+
+def get_fleet_net_gain(System_sel, units, years, scenario='BENCHMARK'):
+    "This function returns the net gain of a chunk of units summed over the units, at every calendar year of years. \
+      - a unit counts from its install_year, its net gain is frozen at the end of its lifetime \
+      - units output = Joules, Primary Energy"
+
+    model = registry.get_system_model(System_sel.system_ID)
+    s = config.SCENARIOS.index(scenario)
+
+    alpha0 = units['alpha0'][:, np.newaxis]
+    beta = np.asarray(units.get('beta', System_sel.beta))[..., np.newaxis]
+    lifetime = np.asarray(units.get('lifetime', System_sel.lifetime_system))[..., np.newaxis]
+    Pop = units['P_operation'][:, np.newaxis]
+
+    baseline_power_system = model.get_baseline_power_system(units['baseline_power'], System_sel.args)[:, np.newaxis]
+
+    E, _ = model.get_energies(System_sel.args, alpha0, beta)
+    E_embodied = units['E_embodied'][:, np.newaxis] if ('E_embodied' in units) else E[..., s, 0] + E[..., s, 1] + E[..., s, 2]
+    Pm = E[..., s, 3]
+
+    years = np.asarray(years, dtype=float)
+    net_gain = np.zeros(len(years))
+
+    # the (unit, year) grid is evaluated by blocks of units to bound the memory
+    block = max(FLEET_CURVE_POINTS//max(len(years), 1), 1)
+
+    for start in range(0, len(alpha0), block):
+        units_block = slice(start, start + block)
+
+        age = np.minimum(years - units['install_year'][units_block, np.newaxis], np.broadcast_to(lifetime, alpha0.shape)[units_block])
+
+        gains = config.G(np.maximum(age, 0), np.broadcast_to(E_embodied, alpha0.shape)[units_block], 0, 0, np.broadcast_to(beta, alpha0.shape)[units_block],
+                         alpha0[units_block], baseline_power_system[units_block], np.broadcast_to(Pm, alpha0.shape)[units_block], Pop[units_block], System_sel.PTT)
+
+        net_gain += np.sum(np.where(age >= 0, gains, 0), axis=0)
+
+    return net_gain
+
+###############################################################################
+
+def iter_fleet_results(System_sel, path, scenario='BENCHMARK', chunk_size=FLEET_CHUNK_SIZE):
+    "Output = generator of (units, results of get_fleet_TPB), chunk by chunk, in the order of the fleet file"
+
+    for units in read_fleet_chunks(path, chunk_size):
+        yield units, get_fleet_TPB(System_sel, units, scenario)
+
+###############################################################################
+
+def run_fleet(System_sel, path, years, scenario='BENCHMARK', chunk_size=FLEET_CHUNK_SIZE, percentiles=montecarlo.MC_PERCENTILES):
+    "This function computes the payback of every unit of a fleet file and aggregates them on the fly. \
+      - years = calendar years of the fleet cumulative net gain curve \
+      - memory depends on chunk_size and len(years), not on the number of units \
+      - the results of every unit are available through iter_fleet_results \
+      - output = {n_units, P_payback, t_pb_solved, payback_year, wsavings, savings, years, net_gain} \
+      - units output = [/, /, years, years, %, J, years, J]"
+
+    years = np.asarray(years, dtype=float)
+    net_gain = np.zeros(len(years))
+
+    stats = {'t_pb_solved': montecarlo.StreamingStats(), 'payback_year': montecarlo.StreamingStats(),
+             'wsavings': montecarlo.StreamingStats(), 'savings': montecarlo.StreamingStats()}
+    n_units = 0
+    n_payback = 0
+
+    for units, results in iter_fleet_results(System_sel, path, scenario, chunk_size):
+
+        paid_back = results['t_pb_solved'] < units.get('lifetime', System_sel.lifetime_system)
+
+        stats['t_pb_solved'].update(results['t_pb_solved'])
+        stats['payback_year'].update((units['install_year'] + results['t_pb_solved'])[paid_back])
+        stats['wsavings'].update(results['wsavings'])
+        stats['savings'].update(results['G'])
+
+        n_units += len(results)
+        n_payback += np.count_nonzero(paid_back)
+
+        net_gain += get_fleet_net_gain(System_sel, units, years, scenario)
+
+    results = {name: stat.summary(percentiles) for name, stat in stats.items()}
+    results['n_units'] = n_units
+    results['P_payback'] = n_payback/n_units if n_units else np.nan
+    results['years'] = years
+    results['net_gain'] = net_gain
+
+    return results
@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+@author: TSP
+
+Incremental recomputation of a sweep : the results of get_TPB_batch are kept with the intermediate quantities
+they come from, and an edit of one input only recomputes the quantities, and the sweep elements, that depend on it.
+
+    study = IncrementalModel(System_sel, np.linspace(0, 1, 10**5))
+    study.get_results()
+    study.set_input('PTT', [[1, 2], [0.5, -1]])          # t_pb_solved, savings and G are recomputed, t_pb is kept
+    study.set_input('beta', 0.5, where=slice(0, 100))    # only the first 100 elements are recomputed
+    study.set_constant('E_EM_HUB_TYPICAL', 1e8)
+    study.get_results()
+"""
+###############################################################################
+#                                      IMPORT                                 #
+###############################################################################
+
+import contextlib
+import sys
+
+import numpy as np
+
+import TSP_SMARTX_CONFIG_simple as config
+import TSP_SMARTX_REGISTRY as registry
+
+###############################################################################
+#                                    CONSTANTS                                #
+###############################################################################
+
+# inputs of the model : per element of the sweep, or shared by the whole sweep
+INCREMENTAL_ELEMENT_INPUTS =        ['alpha0', 'beta', 'baseline_power', 'lifetime_system', 'ARGS']
+INCREMENTAL_SHARED_INPUTS =         ['PTT', 'profile', 'constants']
+
+# values shared by the whole sweep, not sliced per element
+INCREMENTAL_SHARED =                INCREMENTAL_SHARED_INPUTS + ['segments']
+
+# node : inputs and nodes it is computed from
+INCREMENTAL_NODES = {'T_replacement':           ['alpha0', 'beta', 'constants'],
+                     'energies':                ['ARGS', 'T_replacement', 'constants'],
+                     'baseline_power_system':   ['baseline_power', 'ARGS'],
+                     'P_saved':                 ['baseline_power_system', 'alpha0', 'beta'],
+                     'segments':                ['PTT'],
+                     't_pb':                    ['energies', 'P_saved', 'alpha0', 'beta', 'baseline_power_system', 'profile'],
+                     't_pb_solved':             ['energies', 'P_saved', 'alpha0', 'beta', 'baseline_power_system', 'segments', 'PTT', 'profile'],
+                     'savings':                 ['energies', 'alpha0', 'beta', 'baseline_power_system', 'PTT', 'lifetime_system', 'profile'],
+                     'G':                       ['energies', 'alpha0', 'beta', 'baseline_power_system', 'PTT', 'lifetime_system', 'profile']}
+
+###############################################################################
+#                                    FUNCTIONS                                #
+###############################################################################
+
+class IncrementalModel:
+    "Sweep of get_TPB_batch over the elements of alpha0 (and of beta, ARGS ... when they are arrays), \
+     with the dependency graph INCREMENTAL_NODES between the inputs and the derived quantities : \
+      - each node keeps its values and a mask of the elements to recompute, set by the edits of its inputs \
+      - the nodes are recomputed when read, on the masked elements only \
+      - the constants of the system file are overridden for this model only, the module is restored after each use \
+      - scenario = scenario of the typical case, the bounds are always LOW and HIGH"
+
+    def __init__(self, System_sel, alpha0, beta=None, ARGS=None, scenario='BENCHMARK'):
+        self.system_ID = System_sel.system_ID
+        self.scenario = scenario
+
+        self.model = registry.get_system_model(self.system_ID)
+        self.module = sys.modules[self.model.coeff_table.__module__]
+
+        alpha0 = np.asarray(alpha0, dtype=float)
+        beta = np.asarray(System_sel.beta if (beta is None) else beta, dtype=float)
+        ARGS = System_sel.args if (ARGS is None) else ARGS
+
+        self.n = int(np.prod(np.broadcast_shapes(alpha0.shape, beta.shape, np.shape(ARGS)[:-1] if (ARGS is not None) else ())))
+
+        self.inputs = {'alpha0': self.broadcast(alpha0),
+                       'beta': self.broadcast(beta),
+                       'baseline_power': self.broadcast(System_sel.baseline_power),
+                       'lifetime_system': self.broadcast(System_sel.lifetime_system),
+                       'ARGS': None if (ARGS is None) else self.broadcast(ARGS, (len(self.model.ARGS_names),)),
+                       'PTT': System_sel.PTT,
+                       'profile': System_sel.profile,
+                       'constants': {}}
+
+        self.values = {}
+        self.dirty = {name: np.ones(self.n, dtype=bool) for name in INCREMENTAL_NODES}
+
+        # direct dependents of every input and node
+        self.dependents = {}
+        for name, dependencies in INCREMENTAL_NODES.items():
+            for dependency in dependencies:
+                self.dependents.setdefault(dependency, []).append(name)
+
+    def broadcast(self, value, tail=()):
+        value = np.asarray(value, dtype=float)
+        return np.array(np.broadcast_to(value, (self.n,) + tail))
+
+    ###########################################################################
+
+    def set_input(self, name, value, where=None):
+        "Edit an input. where = index, slice or mask of the elements edited (inputs per element only), None = all"
+
+        if name in INCREMENTAL_ELEMENT_INPUTS:
+            if (self.inputs[name] is None): raise TypeError('{} has no {}'.format(self.system_ID, name))
+
+            mask = np.zeros(self.n, dtype=bool)
+            mask[slice(None) if (where is None) else where] = True
+            self.inputs[name][mask] = value
+
+        elif name in INCREMENTAL_SHARED_INPUTS:
+            if (where is not None): raise TypeError('{} is shared by the whole sweep'.format(name))
+
+            mask = np.ones(self.n, dtype=bool)
+            self.inputs[name] = value
+
+        else:
+            raise NameError('\n Unknown input {} : select one of {} ! \n'.format(name, INCREMENTAL_ELEMENT_INPUTS + INCREMENTAL_SHARED_INPUTS))
+
+        self.invalidate(name, mask)
+
+    def set_constant(self, name, value):
+        "Override a constant of the system file (e.g. E_EM_HUB_TYPICAL) for this model"
+
+        if (name not in dict(config.get_module_constants(self.module))):
+            raise NameError('\n Unknown constant {} in {} ! \n'.format(name, self.module.__name__))
+
+        self.set_input('constants', dict(self.inputs['constants'], **{name: value}))
+
+    def invalidate(self, name, mask):
+        "Mark the elements of mask dirty in every node depending on name, directly or not"
+
+        stack = list(self.dependents.get(name, []))
+        while stack:
+            node = stack.pop()
+            if np.all(self.dirty[node][mask]): continue
+
+            self.dirty[node] |= mask
+            stack += self.dependents.get(node, [])
+
+    ###########################################################################
+
+    @contextlib.contextmanager
+    def constants_applied(self):
+        "Set the overridden constants in the system file, restore the module when leaving"
+
+        saved = registry.set_constants(self.module, self.inputs['constants'])
+        try:
+            yield
+        finally:
+            registry.set_constants(self.module, saved)
+
+    def get(self, name):
+        "Output = values of an input or of a node, recomputed where dirty"
+
+        if (name not in INCREMENTAL_NODES): return self.inputs[name]
+
+        dirty = self.dirty[name]
+        if (not np.any(dirty)): return self.values[name]
+
+        values = {dependency: self.get(dependency) for dependency in INCREMENTAL_NODES[name]}
+
+        if (name == 'segments'):
+            self.values[name] = self.compute(name, values)
+
+        else:
+            ind = np.flatnonzero(dirty) if (name in self.values) else slice(None)
+            values = {dependency: value if (dependency in INCREMENTAL_SHARED or value is None) else value[ind] for dependency, value in values.items()}
+
+            result = self.compute(name, values)
+
+            if (name in self.values): self.values[name][ind] = result
+            else: self.values[name] = result
+
+        dirty[:] = False
+        return self.values[name]
+
+    def compute(self, name, v):
+        "Output = values of the node name on the elements of its inputs v"
+
+        s, s_DN, s_UP = [config.SCENARIOS.index(scenario) for scenario in [self.scenario, 'LOW', 'HIGH']]
+
+        if (name == 'T_replacement'):
+            with self.constants_applied():
+                return np.broadcast_to(self.model.T_replacement(v['alpha0'], v['beta']), v['alpha0'].shape).copy()
+
+        if (name == 'energies'):
+            with self.constants_applied():
+                E = self.model.get_E_scenarios(v['ARGS'], v['T_replacement'])
+            return np.broadcast_to(E, v['T_replacement'].shape + np.shape(E)[-2:]).copy()
+
+        if (name == 'baseline_power_system'):
+            return self.broadcast_like(self.model.get_baseline_power_system(v['baseline_power'], v['ARGS']), v['baseline_power'])
+
+        if (name == 'P_saved'):
+            return v['baseline_power_system']*v['alpha0']*v['beta']
+
+        if (name == 'segments'):
+            if (v['PTT'] is None or config.is_persistence_model(v['PTT'])): return None
+
+            limit, coef_lookup, start_lookup, cumul_lookup = config.get_PTT_segments(v['PTT'])
+            return np.minimum(limit[0:-1], config.TIME_HORIZON), np.minimum(limit[1:], config.TIME_HORIZON), coef_lookup[1:-1], cumul_lookup[1:-1]
+
+        E = v['energies']
+        E_init = E[..., 0] + E[..., 1] + E[..., 2]
+        Pm, Pop = E[..., 3], E[..., 4]
+        profile = v['profile']
+
+        if (name == 't_pb'):
+            if (profile is None):
+                return np.stack([config.TPB(E_init[:, k], 0, 0, v['P_saved'], Pm[:, k], Pop[:, k]) for k in (s, s_DN, s_UP)], axis=-1)
+
+            return np.stack([config.TPB_PTT(E_init[:, k], 0, 0, v['beta'], v['alpha0'], v['baseline_power_system'], Pm[:, k], Pop[:, k], [[1, -1]], profile)
+                             for k in (s, s_DN, s_UP)], axis=-1)
+
+        if (name == 't_pb_solved'):
+            if (profile is None and v['segments'] is not None):
+                return config.first_crossing_steps(config.ELEC_TO_PRIMARY_ENERGY*config.CONVERSION_YEAR_to_SEC*v['P_saved'], E_init[:, s],
+                                                   (config.ELEC_TO_PRIMARY_ENERGY*Pop[:, s] + Pm[:, s])*config.CONVERSION_YEAR_to_SEC, *v['segments'])
+
+            return config.TPB_PTT(E_init[:, s], 0, 0, v['beta'], v['alpha0'], v['baseline_power_system'], Pm[:, s], Pop[:, s], v['PTT'], profile)
+
+        if (name == 'savings'):
+            return np.stack(config.get_savings(E_init[:, s], 0, 0, v['beta'], v['alpha0'], v['baseline_power_system'], Pm[:, s], Pop[:, s],
+                                               v['PTT'], v['lifetime_system'], profile), axis=-1)
+
+        if (name == 'G'):
+            return self.broadcast_like(config.G(v['lifetime_system'], E_init[:, s], 0, 0, v['beta'], v['alpha0'], v['baseline_power_system'],
+                                                Pm[:, s], Pop[:, s], v['PTT'], profile), v['alpha0'])
+
+    @staticmethod
+    def broadcast_like(value, like):
+        return np.broadcast_to(value, np.shape(like)).copy()
+
+    ###########################################################################
+
+    def get_results(self):
+        "Output = structured array of config.TPB_BATCH_DTYPE, as get_TPB_batch, recomputed where dirty"
+
+        results = np.empty(self.n, dtype=config.TPB_BATCH_DTYPE)
+
+        results['t_pb'], results['t_pb_DN'], results['t_pb_UP'] = np.moveaxis(self.get('t_pb'), -1, 0)
+        results['t_pb_solved'] = self.get('t_pb_solved')
+        results['bsavings'], results['wsavings'], results['E_smart_atLT'] = np.moveaxis(self.get('savings'), -1, 0)
+        results['G'] = self.get('G')
+
+        return results
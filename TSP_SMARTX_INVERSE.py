@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+@author: TSP
+
+Inverse problems : the alpha0, beta or component count at which a system breaks even,
+e.g. T_PB = lifetime_system or zero worst-case savings, for many configurations at once.
+
+    solve_break_even(System_sel, 'alpha0', 'wsavings')                          # alpha0 of zero w-savings
+    solve_break_even(System_sel, 'beta', 'payback', alpha0=np.linspace(0.1, 0.5, 1000))
+    solve_break_even(System_sel, 'bulbs', 'payback', target=5)                  # bulbs needed for T_PB = 5 years
+"""
+###############################################################################
+#                                      IMPORT                                 #
+###############################################################################
+
+import numpy as np
+
+import TSP_SMARTX_CONFIG_simple as config
+import TSP_SMARTX_REGISTRY as registry
+
+###############################################################################
+#                                    CONSTANTS                                #
+###############################################################################
+
+INVERSE_XTOL =                      1e-12                                             # units : / relative width of the final bracket
+INVERSE_MAX_ITER =                  200
+INVERSE_MAX_COUNT =                 1000                                              # units : / default upper bound of a component count
+
+# quantity : condition of the break-even
+#  - payback : t_pb = target (alpha constant)
+#  - payback_solved : t_pb_solved = target (alpha follows the PTT)
+#  - bsavings, wsavings : savings at target = 0 (alpha constant, alpha follows the PTT)
+INVERSE_QUANTITIES =                ['payback', 'payback_solved', 'bsavings', 'wsavings']
+
+###############################################################################
+#                                    FUNCTIONS                                #
+###############################################################################
+
+def get_margin(System_sel, quantity, alpha0, beta, ARGS, target, scenario='BENCHMARK'):
+    "This function returns the margin of a configuration w.r.t. the break-even, zero at the break-even : \
+      - payback quantities : 1/T_PB - 1/target, continuous when the payback goes to infinity \
+      - savings quantities : G(target) \
+      - inputs are broadcast together, ARGS = None uses the ARGS of System_sel"
+
+    model = registry.get_system_model(System_sel.system_ID)
+    profile = System_sel.profile
+
+    energies, _ = config.get_scenario_energies(System_sel, alpha0, beta, ARGS)
+    Erm, Eem, Er, Pm, Pop = energies[scenario]
+
+    if (ARGS is None):
+        baseline_power_system = System_sel.baseline_power_system
+    else:
+        baseline_power_system = model.get_baseline_power_system(System_sel.baseline_power, ARGS)
+
+    PTT = System_sel.PTT if quantity in ['payback_solved', 'wsavings'] else [[1, -1]]
+
+    if quantity in ['bsavings', 'wsavings']:
+        return config.G(target, Erm, Eem, Er, beta, alpha0, baseline_power_system, Pm, Pop, PTT, profile)
+
+    if (quantity == 'payback' and profile is None):
+        t_pb = config.TPB(Erm, Eem, Er, baseline_power_system*alpha0*beta, Pm, Pop)
+    else:
+        t_pb = config.TPB_PTT(Erm, Eem, Er, beta, alpha0, baseline_power_system, Pm, Pop, PTT, profile)
+
+    with np.errstate(divide='ignore'):
+        return np.where(t_pb > 0, 1/np.maximum(t_pb, 0), np.inf) - 1/np.asarray(target, dtype=float)
+
+###############################################################################
+
+def solve_bracketed(f, lo, hi, xtol=INVERSE_XTOL, max_iter=INVERSE_MAX_ITER):
+    "This function finds a root of f in [lo, hi] for every element, in one vectorized pass. \
+      - f(x, ind) = values of f at x for the elements ind, only the unconverged elements are evaluated \
+      - Illinois (modified regula falsi) steps, a bisection step when a step did not halve the bracket : \
+        superlinear on smooth margins, never slower than twice the bisection on steps or jumps \
+      - output = root, nan when f has the same sign at lo and hi"
+
+    lo, hi = np.array(lo, dtype=float), np.array(hi, dtype=float)
+    n = len(lo)
+
+    f_lo, f_hi = f(lo, np.arange(n)), f(hi, np.arange(n))
+
+    root = np.full(n, np.nan)
+    root[f_lo == 0] = lo[f_lo == 0]
+    root[(f_hi == 0) & (f_lo != 0)] = hi[(f_hi == 0) & (f_lo != 0)]
+
+    active = np.flatnonzero((np.sign(f_lo)*np.sign(f_hi) < 0))
+
+    kept = np.zeros(n)              # end kept by the last step : -1 = lo, +1 = hi
+    slow = np.zeros(n, dtype=bool)  # the last step did not halve the bracket
+
+    for _ in range(max_iter):
+        if (len(active) == 0): break
+
+        a, b, fa, fb = lo[active], hi[active], f_lo[active], f_hi[active]
+
+        with np.errstate(invalid='ignore', divide='ignore', over='ignore'):
+            x = b - fb*(b - a)/(fb - fa)
+
+        bisect = slow[active] | ~np.isfinite(x) | (x <= a) | (x >= b)
+        x = np.where(bisect, 0.5*(a + b), x)
+
+        fx = f(x, active)
+
+        # the new point replaces the end of the same sign, the other end is kept
+        replace_lo = np.sign(fx) == np.sign(fa)
+        keep = np.where(replace_lo, 1, -1)
+
+        # Illinois : the value of an end kept twice in a row is halved
+        halve = (keep == kept[active]) & ~bisect
+
+        lo[active] = np.where(replace_lo, x, a)
+        hi[active] = np.where(replace_lo, b, x)
+        f_lo[active] = np.where(replace_lo, fx, np.where(halve, 0.5*fa, fa))
+        f_hi[active] = np.where(replace_lo, np.where(halve, 0.5*fb, fb), fx)
+
+        kept[active] = keep
+        slow[active] = (hi[active] - lo[active]) > 0.5*(b - a)
+
+        converged = (fx == 0) | (hi[active] - lo[active] <= xtol*np.maximum(np.abs(x), 1))
+        root[active[converged]] = np.where(fx[converged] == 0, x[converged], 0.5*(lo[active[converged]] + hi[active[converged]]))
+
+        active = active[~converged]
+
+    root[active] = 0.5*(lo[active] + hi[active])
+
+    return root
+
+###############################################################################
+
+def solve_integer(f, lo, hi):
+    "This function finds, for every element, the smallest integer n in [lo, hi] where f(n) has the sign of f(hi), \
+     by vectorized bisection. Output = n ; lo when f(lo) already has the sign of f(hi) (or is 0), nan when f is nan at an end"
+
+    lo, hi = np.array(np.floor(lo), dtype=float), np.array(np.ceil(hi), dtype=float)
+    n = len(lo)
+
+    f_lo, f_hi = f(lo, np.arange(n)), f(hi, np.arange(n))
+    sign_hi = np.sign(f_hi)
+
+    root = np.full(n, np.nan)
+    at_lo = (f_lo == 0) | (np.sign(f_lo) == sign_hi)
+    root[at_lo] = lo[at_lo]
+
+    active = np.flatnonzero(~at_lo & ~np.isnan(f_lo) & ~np.isnan(f_hi))
+
+    while (len(active) > 0):
+        done = hi[active] - lo[active] <= 1
+        root[active[done]] = hi[active[done]]
+        active = active[~done]
+        if (len(active) == 0): break
+
+        mid = np.floor(0.5*(lo[active] + hi[active]))
+        side_hi = np.sign(f(mid, active)) == sign_hi[active]
+
+        hi[active] = np.where(side_hi, mid, hi[active])
+        lo[active] = np.where(side_hi, lo[active], mid)
+
+    return root
+
+###############################################################################
+
+def solve_break_even(System_sel, variable, quantity='payback', target=None, alpha0=None, beta=None, ARGS=None, bracket=None,
+                     scenario='BENCHMARK', hubless=True, xtol=INVERSE_XTOL, max_iter=INVERSE_MAX_ITER):
+    "This function returns the value of variable at which the break-even condition of quantity holds. \
+      - variable = 'alpha0', 'beta' or a component of the system (e.g. 'bulbs', 'nodes'), the hubs follow the hub capacity \
+        (a system with 0 hubs stays without hub unless hubless = False, see SystemModel.get_component_ARGS) \
+      - quantity in INVERSE_QUANTITIES, target = payback time to reach or time of zero savings, None = lifetime_system \
+      - the other parameters (alpha0, beta, target, ARGS of shape (..., number of components)) are broadcast together : \
+        one answer per configuration ; None = value of System_sel (alpha0 = System_sel.alpha0[1]) \
+      - bracket = (lo, hi) searched interval, default [0, 1] for alpha0 and beta, [1, INVERSE_MAX_COUNT] for components \
+      - a component count is an integer : the smallest count on the far side of the break-even, \
+        the lower end of bracket when the whole bracket is already on that side \
+      - where t_pb_solved jumps over target (PTT steps), the answer is the value at the jump \
+      - output = array with the broadcast shape, nan where the break-even of alpha0 or beta is not within bracket \
+      - the quantity must be monotone in variable over bracket, as it is for the systems defined so far"
+
+    if (quantity not in INVERSE_QUANTITIES):
+        raise NameError('\n Unknown quantity {} : select one of {} ! \n'.format(quantity, INVERSE_QUANTITIES))
+
+    model = registry.get_system_model(System_sel.system_ID)
+    components = model.ARGS_names if (model.ARGS_names is not None) else []
+
+    if (variable not in ['alpha0', 'beta'] + components):
+        raise NameError('\n Unknown variable {} for {} : select one of {} ! \n'.format(variable, System_sel.system_ID, ['alpha0', 'beta'] + components))
+
+    alpha0 = np.asarray(System_sel.alpha0[1] if (alpha0 is None) else alpha0, dtype=float)
+    beta = np.asarray(System_sel.beta if (beta is None) else beta, dtype=float)
+    target = np.asarray(System_sel.lifetime_system if (target is None) else target, dtype=float)
+
+    if (ARGS is None and (variable in components or model.ARGS_names is None)):
+        ARGS = System_sel.args
+    if (ARGS is not None):
+        ARGS = np.asarray(ARGS, dtype=float)
+
+    # flat configurations
+    shape = np.broadcast_shapes(alpha0.shape, beta.shape, target.shape, np.shape(ARGS)[:-1] if (ARGS is not None) else ())
+
+    alpha0, beta, target = [np.broadcast_to(x, shape).ravel() for x in (alpha0, beta, target)]
+    if (ARGS is not None): ARGS = np.broadcast_to(ARGS, shape + ARGS.shape[-1:]).reshape(-1, ARGS.shape[-1])
+
+    def f(x, ind):
+        parameters = {'alpha0': alpha0[ind], 'beta': beta[ind]}
+        ARGS_ind = ARGS[ind] if (ARGS is not None) else None
+
+        if (variable in components):
+            ARGS_ind = model.get_component_ARGS(ARGS_ind, variable, x, hubless)
+        else:
+            parameters[variable] = x
+
+        return get_margin(System_sel, quantity, parameters['alpha0'], parameters['beta'], ARGS_ind, target[ind], scenario)
+
+    size = int(np.prod(shape))
+
+    if (variable in components):
+        lo, hi = (1, INVERSE_MAX_COUNT) if (bracket is None) else bracket
+        root = solve_integer(f, np.full(size, lo), np.full(size, hi))
+    else:
+        lo, hi = (0, 1) if (bracket is None) else bracket
+        root = solve_bracketed(f, np.full(size, lo), np.full(size, hi), xtol, max_iter)
+
+    return root.reshape(shape)[()]
@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+@author: TSP
+"""
+###############################################################################
+#                                      IMPORT                                 #
+###############################################################################
+
+import numpy as np
+
+import TSP_SMARTX_CONFIG_simple as config
+import TSP_SMARTX_REGISTRY as registry
+
+import HUE_system as HUE
+import SMTR_system as SMTR
+import OFFICE_system as OFFICE
+
+###############################################################################
+#                                    CONSTANTS                                #
+###############################################################################
+
+MC_CHUNK_SIZE =                     2**18                                             # units : samples evaluated per pass
+MC_PERCENTILES =                    [5, 25, 50, 75, 95]                               # units : %
+
+MC_HISTOGRAM_BINS =                 20000                                             # units : bins of the percentile histogram, rounded to a multiple of 4
+MC_HISTOGRAM_RESOLUTION =           1e-2                                              # units : linear bin scale around the center, fraction of the first chunk spread
+
+# system_ID : (system file, duty cycle constants of the smart devices) | duty cycle = sleep time over active time
+MC_DUTY_CYCLES = {'PHILIPS-HUE-LED':  (HUE, ('DUTY_CYCLE_SA_LOW', 'DUTY_CYCLE_SA_MEAS')),
+                  'SMART-METER':      (SMTR, ('DUTY_CYCLE_SA_USUAL_SMTR',)),
+                  'OFFICE-LIGHTNING': (OFFICE, ('DUTY_CYCLE_SA',))}
+
+###############################################################################
+#                                    FUNCTIONS                                #
+###############################################################################
+
+class StreamingStats:
+    "Statistics of a sample that is seen chunk by chunk, in bounded memory. \
+      - count, mean, standard deviation, min and max are exact \
+      - percentiles come from a histogram on the axis asinh((x - center)/scale) : center and scale (median and spread) \
+        are taken from the first chunk, so the axis follows the magnitude of the data (years, %, J) ; \
+        linear near the center, logarithmic far from it \
+      - the axis covers [-limit, limit], the limit is doubled and the bins merged by pairs when a value falls outside : \
+        no value is clipped to the edge bins"
+
+    def __init__(self, bins=MC_HISTOGRAM_BINS, resolution=MC_HISTOGRAM_RESOLUTION):
+        self.bins = 4*max(bins//4, 1)
+        self.resolution = resolution
+        self.counts = np.zeros(self.bins, dtype=np.int64)
+
+        self.center = None
+        self.scale = None
+        self.limit = None
+
+        self.n = 0
+        self.mean = 0.0
+        self.M2 = 0.0
+        self.min = np.inf
+        self.max = -np.inf
+
+    def set_axis(self, values):
+        "This function sets the center and the scale of the histogram axis from the finite values of the first chunk"
+
+        finite = values[np.isfinite(values)]
+        if (len(finite) == 0): return
+
+        self.center = np.median(finite)
+        spread = np.subtract(*np.percentile(finite, [75, 25]))
+        if (spread <= 0): spread = np.max(np.abs(finite - self.center))
+        if (spread <= 0): spread = max(abs(self.center), 1.0)
+
+        self.scale = spread*self.resolution
+        self.limit = 1.0
+
+    def widen(self, limit):
+        "This function doubles the axis limit until it reaches limit, the bins are merged by pairs into the central half"
+
+        while (self.limit < limit):
+            merged = self.counts.reshape(-1, 2).sum(axis=1)
+
+            self.counts = np.zeros(self.bins, dtype=np.int64)
+            self.counts[self.bins//4:3*self.bins//4] = merged
+            self.limit *= 2
+
+    def update(self, values):
+        values = np.ravel(np.asarray(values, dtype=float))
+        n_chunk = len(values)
+
+        if (n_chunk == 0): return
+
+        # exact moments, merged with the previous chunks (Chan et al.)
+        mean_chunk = np.mean(values)
+        M2_chunk = np.sum((values - mean_chunk)**2)
+        n_total = self.n + n_chunk
+        delta = mean_chunk - self.mean
+
+        self.mean += delta*n_chunk/n_total
+        self.M2 += M2_chunk + delta**2*self.n*n_chunk/n_total
+        self.n = n_total
+
+        self.min = min(self.min, np.min(values))
+        self.max = max(self.max, np.max(values))
+
+        # histogram
+        if (self.center is None): self.set_axis(values)
+        if (self.center is None): return
+
+        z = np.arcsinh((values - self.center)/self.scale)
+        z_finite = np.abs(z[np.isfinite(z)])
+        self.widen(np.max(z_finite) if len(z_finite) else 0)
+
+        position = (np.nan_to_num(z, nan=0, posinf=self.limit, neginf=-self.limit) + self.limit)/(2*self.limit)*self.bins
+        ind = np.clip(position.astype(np.int64), 0, self.bins - 1)
+        self.counts += np.bincount(ind, minlength=self.bins)
+
+    def percentile(self, q):
+        "Output = q-th percentile(s), interpolated inside the histogram bins"
+
+        q = np.asarray(q, dtype=float)
+        if (self.center is None): return np.full(q.shape, np.nan)[()]
+
+        cumul = np.cumsum(self.counts)
+        rank = q/100*self.n
+
+        ind = np.minimum(np.searchsorted(cumul, rank, side='left'), self.bins - 1)
+        before = np.where(ind > 0, cumul[ind - 1], 0)
+        frac = np.clip((rank - before)/np.maximum(self.counts[ind], 1), 0, 1)
+
+        position = (ind + frac)/self.bins*2*self.limit - self.limit
+
+        return np.clip(self.center + self.scale*np.sinh(position), self.min, self.max)[()]
+
+    def summary(self, percentiles=MC_PERCENTILES):
+        return {'n': self.n,
+                'mean': self.mean,
+                'std': np.sqrt(self.M2/self.n) if self.n else np.nan,
+                'min': self.min,
+                'max': self.max,
+                'percentiles': dict(zip(percentiles, np.atleast_1d(self.percentile(percentiles)).tolist()))}
+
+###############################################################################
+
+def draw_samples(rng, distribution, size):
+    "This function draws size samples of one input. \
+      - distribution = number | ('fixed', value) | ('uniform', low, high) | ('triangular', low, mode, high) \
+                       | ('normal', mean, std) | ('lognormal', mean, sigma) | callable(rng, size)"
+
+    if callable(distribution):
+        return np.broadcast_to(np.asarray(distribution(rng, size), dtype=float), (size,))
+
+    if np.isscalar(distribution):
+        return np.full(size, float(distribution))
+
+    law, params = distribution[0], distribution[1:]
+
+    if (law == 'fixed'):
+        return np.full(size, float(params[0]))
+
+    elif (law == 'uniform'):
+        return rng.uniform(params[0], params[1], size)
+
+    elif (law == 'triangular'):
+        if (params[0] == params[2]): return np.full(size, float(params[0]))
+        return rng.triangular(params[0], params[1], params[2], size)
+
+    elif (law == 'normal'):
+        return rng.normal(params[0], params[1], size)
+
+    elif (law == 'lognormal'):
+        return rng.lognormal(params[0], params[1], size)
+
+    else:
+        raise NameError('unknown distribution {}'.format(law))
+
+###############################################################################
+
+def get_duty_cycle_powers(System_sel):
+    "Output = P_active, P_sleep, duty_cycle per scenario : operating power of the system with its smart devices always active \
+     and always asleep, and the duty cycle of the system file that gives its operating power. \
+     The operating power is linear in the duty cycle : Pop = (1 - duty_cycle)*P_active + duty_cycle*P_sleep. \
+     units = [W, W, /]"
+
+    model = registry.get_system_model(System_sel.system_ID)
+    P_operation = model.get_P_Operation(System_sel.args)
+
+    if (System_sel.system_ID not in MC_DUTY_CYCLES):
+        return P_operation, P_operation, np.zeros_like(P_operation)
+
+    module, names = MC_DUTY_CYCLES[System_sel.system_ID]
+
+    saved = registry.set_constants(module, dict.fromkeys(names, 0.0))
+    try:
+        P_active = model.get_P_Operation(System_sel.args)
+        registry.set_constants(module, dict.fromkeys(names, 1.0))
+        P_sleep = model.get_P_Operation(System_sel.args)
+    finally:
+        registry.set_constants(module, saved)
+
+    # devices with the same power asleep and active : the duty cycle has no effect, 0 by convention
+    with np.errstate(divide='ignore', invalid='ignore'):
+        duty_cycle = np.where(P_sleep != P_active, (P_operation - P_active)/(P_sleep - P_active), 0)
+
+    return P_active, P_sleep, duty_cycle
+
+def get_triangular(values):
+    "Output = triangular distribution (see draw_samples) over the values of the LOW, BENCHMARK and HIGH scenarios"
+
+    values = np.sort(values)
+    return ('triangular', values[0], values[1], values[2])
+
+def get_default_distributions(System_sel, alpha0):
+    "This function returns the default input distributions of a system : \
+      - Erm, Eem and Er : triangular over the LOW, BENCHMARK and HIGH scenarios, drawn independently \
+      - P_active and P_sleep : triangular over the scenarios, see get_duty_cycle_powers \
+      - P_operation : None = (1 - duty_cycle)*P_active + duty_cycle*P_sleep for each sample \
+      - P_maintenance : None = computed by the system model for each sample of alpha0 and beta (T_replacement) \
+      - duty_cycle (sleep time over active time of the smart devices), alpha0, beta (share of the time the lights are on) \
+        and lifetime : fixed, duty_cycle at the BENCHMARK scenario (the unmeasured sleep powers of the system files are 1e6 W) \
+      - units = [J, J, J, W, W, /, W, W, /, /, years]"
+
+    model = registry.get_system_model(System_sel.system_ID)
+
+    E, _ = model.get_energies(System_sel.args, 0, System_sel.beta)
+    P_active, P_sleep, duty_cycle = get_duty_cycle_powers(System_sel)
+
+    return {'Erm': get_triangular(E[..., 0]),
+            'Eem': get_triangular(E[..., 1]),
+            'Er': get_triangular(E[..., 2]),
+            'P_active': get_triangular(P_active),
+            'P_sleep': get_triangular(P_sleep),
+            'duty_cycle': duty_cycle[config.SCENARIOS.index('BENCHMARK')],
+            'P_operation': None,
+            'P_maintenance': None,
+            'alpha0': alpha0,
+            'beta': System_sel.beta,
+            'lifetime': System_sel.lifetime_system}
+
+###############################################################################
+
+def run_monte_carlo(System_sel, alpha0, n_samples, distributions=None, seed=None, chunk_size=MC_CHUNK_SIZE, percentiles=MC_PERCENTILES):
+    "This function propagates the input uncertainties to the payback time and to the savings at the end of the lifetime. \
+      - alpha0 = number or distribution (see draw_samples), distributions overrides get_default_distributions \
+      - the duty cycles drive the samples of P_operation, beta and alpha0 those of T_replacement (P_maintenance) \
+      - the samples are evaluated chunk by chunk and reduced on the fly : memory does not depend on n_samples \
+      - output = {P_payback, t_pb, t_pb_solved, wsavings, savings} with P_payback = P(t_pb_solved < lifetime) \
+      - units output = [/, years, years, %, J]"
+
+    model = registry.get_system_model(System_sel.system_ID)
+
+    inputs = get_default_distributions(System_sel, alpha0)
+    if (distributions is not None): inputs.update(distributions)
+
+    rng = np.random.default_rng(seed)
+
+    stats = {'t_pb': StreamingStats(), 't_pb_solved': StreamingStats(), 'wsavings': StreamingStats(), 'savings': StreamingStats()}
+    n_payback = 0
+
+    for start in range(0, n_samples, chunk_size):
+
+        size = min(chunk_size, n_samples - start)
+
+        Erm = draw_samples(rng, inputs['Erm'], size)
+        Eem = draw_samples(rng, inputs['Eem'], size)
+        Er = draw_samples(rng, inputs['Er'], size)
+        alpha0_s = draw_samples(rng, inputs['alpha0'], size)
+        beta = draw_samples(rng, inputs['beta'], size)
+        lifetime = draw_samples(rng, inputs['lifetime'], size)
+
+        if (inputs['P_operation'] is None):
+            duty_cycle = draw_samples(rng, inputs['duty_cycle'], size)
+            Pop = (1 - duty_cycle)*draw_samples(rng, inputs['P_active'], size) + duty_cycle*draw_samples(rng, inputs['P_sleep'], size)
+        else:
+            Pop = draw_samples(rng, inputs['P_operation'], size)
+
+        if (inputs['P_maintenance'] is None):
+            Pm = model.get_P_Maintenance(System_sel.args, alpha0_s, beta)[..., config.SCENARIOS.index('BENCHMARK')]
+        else:
+            Pm = draw_samples(rng, inputs['P_maintenance'], size)
+
+        P_saved = System_sel.baseline_power_system*alpha0_s*beta # W = J/s
+
+        t_pb = config.TPB(Erm, Eem, Er, P_saved, Pm, Pop)
+        t_pb_solved = config.TPB_PTT(Erm, Eem, Er, beta, alpha0_s, System_sel.baseline_power_system, Pm, Pop, System_sel.PTT)
+
+        savings = config.G(lifetime, Erm, Eem, Er, beta, alpha0_s, System_sel.baseline_power_system, Pm, Pop, System_sel.PTT)
+        wsavings = savings/config.E_smart(Erm, Eem, Er, Pop, Pm, lifetime)*100
+
+        stats['t_pb'].update(t_pb)
+        stats['t_pb_solved'].update(t_pb_solved)
+        stats['wsavings'].update(wsavings)
+        stats['savings'].update(savings)
+
+        n_payback += np.count_nonzero(t_pb_solved < lifetime)
+
+    results = {name: stat.summary(percentiles) for name, stat in stats.items()}
+    results['P_payback'] = n_payback/n_samples if n_samples else np.nan
+
+    return results
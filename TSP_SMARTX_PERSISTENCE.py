@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+@author: TSP
+
+Continuous persistence models of alpha(t) = alpha0*a(t), usable everywhere a PTT is expected :
+
+    System_sel.PTT = ExponentialDecay(phi=0.5, theta=0.5, tau=2)
+
+Each model gives a(t) and its closed-form integral W(t), so that E_saved_f stays O(1) per query.
+"""
+###############################################################################
+#                                      IMPORT                                 #
+###############################################################################
+
+import numpy as np
+
+import TSP_SMARTX_CONFIG_simple as config
+
+###############################################################################
+#                                    CONSTANTS                                #
+###############################################################################
+
+PERSISTENCE_BISECTION_STEPS =       64                                                # units : / iterations of the payback solver
+
+###############################################################################
+#                                    FUNCTIONS                                #
+###############################################################################
+
+class PersistenceModel:
+    "Base class of the persistence models. A model defines : \
+      - alpha(t) : multiplier of alpha0 at time t [/] \
+      - cumulative(t) : integral of alpha(t) from 0 to t [years] \
+      - alpha_knots : times where alpha(t) changes direction, alpha is monotone between them [years]"
+
+    alpha_knots = []
+
+    def __repr__(self):
+        return '{}({})'.format(type(self).__name__, ', '.join('{}={}'.format(name, value) for name, value in vars(self).items()))
+
+    def first_crossing(self, gain_rate, E_init, loss_rate):
+        "This function returns the first t at which gain_rate*cumulative(t) - E_init - loss_rate*t >= 0. \
+          - alpha is monotone between the alpha_knots : the slope of G changes sign at most once there, \
+            that time is found by bisection, then G is monotone between the knots and the crossing is found by bisection \
+          - a fixed number of vectorized steps : O(1) per parameter set \
+          - gain_rate, E_init and loss_rate can be arrays, they are broadcast together \
+          - returns T_PB_INFINITY if there is no crossing within TIME_HORIZON \
+          - units : gain_rate and loss_rate [J/year], E_init [J], output [years]"
+
+        gain_rate, E_init, loss_rate = np.broadcast_arrays(*[np.asarray(x, dtype=float)[..., np.newaxis] for x in (gain_rate, E_init, loss_rate)])
+
+        G = lambda t: gain_rate*self.cumulative(t) - E_init - loss_rate*t
+        slope = lambda t: gain_rate*self.alpha(t) - loss_rate
+
+        # 1. times where the slope of G changes sign
+        pieces = np.array([0] + [t for t in self.alpha_knots if 0 < t < config.TIME_HORIZON] + [config.TIME_HORIZON], dtype=float)
+
+        knots = [np.broadcast_to(pieces, gain_rate.shape[:-1] + pieces.shape)]
+        for lo, hi in zip(pieces[0:-1], pieces[1:]):
+            changes = (slope(lo) > 0) != (slope(hi) > 0)
+            root = bisection(slope, np.full(changes.shape, lo), np.full(changes.shape, hi), increasing=slope(hi) > 0)
+            knots.append(np.where(changes, root, config.TIME_HORIZON))
+
+        knots = np.sort(np.concatenate(knots, axis=-1), axis=-1)
+
+        # 2. first knot where G >= 0, the crossing is in the monotone piece that ends there
+        crossed = G(knots) >= 0
+        first = np.argmax(crossed, axis=-1)[..., np.newaxis]
+
+        hi = np.take_along_axis(knots, first, axis=-1)
+        lo = np.take_along_axis(knots, np.maximum(first - 1, 0), axis=-1)
+
+        t_cross = np.where(first == 0, hi, bisection(G, lo, hi, increasing=True))
+        t_cross = np.where(np.any(crossed, axis=-1, keepdims=True), t_cross, config.T_PB_INFINITY)
+
+        return t_cross[..., 0][()]
+
+###############################################################################
+
+class ExponentialDecay(PersistenceModel):
+    "alpha(t) = alpha0*(phi + theta*exp(-t/tau)) : the savings decay from phi + theta to phi \
+      - cumulative = phi*t + tau*theta*(1-exp(-t/tau)) \
+      - units = [/, /, years]"
+
+    def __init__(self, phi, theta, tau):
+        self.phi = phi
+        self.theta = theta
+        self.tau = tau
+
+    def alpha(self, t):
+        return self.phi + self.theta*np.exp(-np.asarray(t, dtype=float)/self.tau)
+
+    def cumulative(self, t):
+        t = np.asarray(t, dtype=float)
+        return self.phi*t + self.tau*self.theta*(1 - np.exp(-t/self.tau))
+
+###############################################################################
+
+class LinearFade(PersistenceModel):
+    "alpha(t) = alpha0*a(t), a going linearly from alpha_start to alpha_end in duration, then constant \
+      - units = [years, /, /]"
+
+    def __init__(self, duration, alpha_end=0, alpha_start=1):
+        self.duration = duration
+        self.alpha_end = alpha_end
+        self.alpha_start = alpha_start
+
+    @property
+    def alpha_knots(self):
+        return [self.duration]
+
+    def alpha(self, t):
+        t = np.minimum(np.asarray(t, dtype=float), self.duration)
+        return self.alpha_start + (self.alpha_end - self.alpha_start)*t/self.duration
+
+    def cumulative(self, t):
+        t = np.asarray(t, dtype=float)
+        t_fade = np.minimum(t, self.duration)
+
+        return self.alpha_start*t_fade + (self.alpha_end - self.alpha_start)*t_fade**2/(2*self.duration) + self.alpha_end*(t - t_fade)
+
+###############################################################################
+
+class Rebound(PersistenceModel):
+    "alpha(t) = alpha0*(1 - depth*(exp(-t/tau_recover) - exp(-t/tau_drop))/norm) : the savings drop by depth \
+     (rebound effect) and recover, norm sets the deepest point to 1 - depth \
+      - tau_drop < tau_recover \
+      - units = [/, years, years]"
+
+    def __init__(self, depth, tau_drop, tau_recover):
+        if (tau_drop >= tau_recover): raise ValueError('tau_drop must be smaller than tau_recover')
+
+        self.depth = depth
+        self.tau_drop = tau_drop
+        self.tau_recover = tau_recover
+
+    @property
+    def t_deepest(self):
+        return self.tau_drop*self.tau_recover*np.log(self.tau_recover/self.tau_drop)/(self.tau_recover - self.tau_drop)
+
+    @property
+    def alpha_knots(self):
+        return [self.t_deepest]
+
+    def dip(self, t):
+        return np.exp(-t/self.tau_recover) - np.exp(-t/self.tau_drop)
+
+    def alpha(self, t):
+        t = np.asarray(t, dtype=float)
+        return 1 - self.depth*self.dip(t)/self.dip(self.t_deepest)
+
+    def cumulative(self, t):
+        t = np.asarray(t, dtype=float)
+        integral_dip = self.tau_recover*(1 - np.exp(-t/self.tau_recover)) - self.tau_drop*(1 - np.exp(-t/self.tau_drop))
+
+        return t - self.depth*integral_dip/self.dip(self.t_deepest)
+
+###############################################################################
+
+PERSISTENCE_MODELS = {'exponential': ExponentialDecay, 'linear': LinearFade, 'rebound': Rebound}
+
+def get_persistence_model(description):
+    "Output = persistence model described by {'model': name in PERSISTENCE_MODELS, parameters...}"
+
+    parameters = dict(description)
+    name = parameters.pop('model')
+
+    if (name not in PERSISTENCE_MODELS):
+        raise NameError('\n Unknown persistence model {} : select one of {} ! \n'.format(name, sorted(PERSISTENCE_MODELS)))
+
+    return PERSISTENCE_MODELS[name](**parameters)
+
+###############################################################################
+
+def bisection(f, lo, hi, increasing, steps=PERSISTENCE_BISECTION_STEPS):
+    "Vectorized bisection of a function monotone on [lo, hi], increasing can be an array. Output = upper bound of the root"
+
+    lo, hi = np.array(lo, dtype=float), np.array(hi, dtype=float)
+
+    for _ in range(steps):
+        mid = 0.5*(lo + hi)
+        above = (f(mid) >= 0) == increasing
+        hi = np.where(above, mid, hi)
+        lo = np.where(above, lo, mid)
+
+    return hi
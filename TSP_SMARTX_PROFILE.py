@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+@author: TSP
+
+Measured load profile : the energy saved follows the measured consumption instead of baseline_power_system*beta.
+
+    profile = LoadProfile('site.csv', step=60)
+    System_sel.setLoadProfile(profile)
+    config.get_TPB(System_sel, alpha0, False)
+"""
+###############################################################################
+#                                      IMPORT                                 #
+###############################################################################
+
+import itertools
+import os
+
+import numpy as np
+
+import TSP_SMARTX_CONFIG_simple as config
+
+###############################################################################
+#                                    CONSTANTS                                #
+###############################################################################
+
+PROFILE_CHUNK_SIZE =                2**20                                             # units : samples read, summed or scanned at once
+PROFILE_SOLVER_POINTS =             2**22                                             # units : (parameter set, sample) points of G evaluated at once
+
+###############################################################################
+#                                    FUNCTIONS                                #
+###############################################################################
+
+class LoadProfile:
+    "Measured consumption of the baseline system, one average power per sample of step seconds. \
+      - path = .npy file, raw binary file of dtype or CSV file (one value per line, column = index of the power column) \
+      - the samples are memory-mapped and never loaded as a whole : a CSV is converted once to path.power.npy \
+      - the cumulative energy (prefix sums) is computed once in chunks and kept in path.cumul.npy \
+      - the profile is repeated when a time beyond its duration is queried (e.g. a one-year profile) \
+      - units = W, step in seconds"
+
+    def __init__(self, path, step, dtype=np.float64, column=-1, header=False):
+        self.path = path
+        self.step = float(step)
+        self.dtype = np.dtype(dtype)
+        self.column = column
+        self.header = header
+
+        self.open()
+
+    def open(self):
+        if self.path.endswith('.npy'):
+            self.power = np.load(self.path, mmap_mode='r')
+
+        elif self.path.endswith('.csv'):
+            power_path = self.path + '.power.npy'
+            if (not is_up_to_date(power_path, self.path)): convert_csv(self.path, power_path, self.column, self.header)
+            self.power = np.load(power_path, mmap_mode='r')
+
+        else:
+            self.power = np.memmap(self.path, dtype=self.dtype, mode='r')
+
+        cumul_path = self.path + '.cumul.npy'
+        if (not is_up_to_date(cumul_path, self.path)): build_prefix_sums(self.power, self.step, cumul_path)
+        self.cumul = np.load(cumul_path, mmap_mode='r')
+
+        self.n = len(self.power)
+        self.total = float(self.cumul[-1])
+        self.duration = self.n*self.step/config.CONVERSION_YEAR_to_SEC # units : years
+
+    # the memory maps are reopened, not copied, when the profile is sent to another process
+    def __getstate__(self):
+        return {'path': self.path, 'step': self.step, 'dtype': self.dtype, 'column': self.column, 'header': self.header}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.open()
+
+    def __repr__(self):
+        stat = os.stat(self.path)
+        return 'LoadProfile({!r}, step={}, size={}, mtime={})'.format(self.path, self.step, stat.st_size, stat.st_mtime_ns)
+
+    def mean_power(self):
+        "Output = mean power over the profile, units : W"
+
+        return self.total/(self.n*self.step)
+
+    def energy(self, time):
+        "Output = energy consumed from 0 to time, O(1) per query from the prefix sums, units : J"
+
+        time_sec = np.asarray(time, dtype=float)*config.CONVERSION_YEAR_to_SEC
+        period = self.n*self.step
+
+        cycles = np.floor(time_sec/period)
+        remainder = time_sec - cycles*period
+
+        ind = np.clip((remainder/self.step).astype(np.int64), 0, self.n - 1)
+
+        return (cycles*self.total + self.cumul[ind] + self.power[ind]*(remainder - ind*self.step))[()]
+
+    def weighted_energy(self, time, PTT):
+        "Output = energy consumed from 0 to time, weighted by the PTT coefficients of alpha, units : J \
+         (the last PTT segment is not limited to TIME_HORIZON)"
+
+        time = np.asarray(time, dtype=float)
+        start, end, coef = get_segments(PTT)
+
+        S = np.zeros(time.shape)
+        for start_k, end_k, coef_k in zip(start, end, coef):
+            S += coef_k*(self.energy(np.clip(time, start_k, end_k)) - self.energy(start_k))
+
+        return S[()]
+
+    def first_crossing(self, gain, E_init, loss_rate, PTT):
+        "This function returns the first t at which gain*weighted_energy(t) - E_init - loss_rate*t >= 0. \
+          - the function is linear between two samples (and PTT boundaries) : the crossing is exact \
+          - the samples are scanned in chunks from t = 0, the scan stops once every parameter set has crossed \
+          - gain, E_init and loss_rate can be arrays, they are broadcast together \
+          - returns T_PB_INFINITY if there is no crossing within TIME_HORIZON \
+          - units : gain [/], E_init [J], loss_rate [J/year], output [years]"
+
+        gain, E_init, loss_rate = np.broadcast_arrays(*[np.asarray(x, dtype=float) for x in (gain, E_init, loss_rate)])
+        shape = gain.shape
+        gain, E_init, loss_rate = gain.ravel(), E_init.ravel(), loss_rate.ravel()
+
+        t_cross = np.full(gain.shape, float(config.T_PB_INFINITY))
+        t_cross[E_init <= 0] = 0
+
+        step = self.step/config.CONVERSION_YEAR_to_SEC
+        S_start = 0.0
+
+        for start_k, end_k, coef_k in zip(*get_segments(PTT)):
+
+            end_k = min(end_k, config.TIME_HORIZON)
+            if (start_k >= end_k): break
+
+            E_start = self.energy(start_k)
+
+            # knots = sample boundaries within the segment, chunk by chunk, the last knot of a chunk starts the next one
+            knot_first = int(np.ceil(start_k/step))
+            knot_last = int(np.floor(end_k/step))
+
+            t_prev = start_k
+            for knot in range(knot_first, max(knot_last + 1, knot_first + 1), PROFILE_CHUNK_SIZE):
+
+                unresolved = np.flatnonzero(t_cross == config.T_PB_INFINITY)
+                if (len(unresolved) == 0): return t_cross.reshape(shape)[()]
+
+                knots = np.arange(knot, min(knot + PROFILE_CHUNK_SIZE, knot_last + 1))*step
+                knots = np.concatenate(([t_prev], knots[knots > t_prev]))
+                if (knot + PROFILE_CHUNK_SIZE > knot_last and knots[-1] < end_k): knots = np.append(knots, end_k)
+                t_prev = knots[-1]
+
+                S = S_start + coef_k*(self.energy(knots) - E_start)
+
+                # S monotone on the chunk : G is bounded by its values at the ends of the chunk, most sets are skipped
+                if np.all(np.diff(S) >= 0):
+                    G_max = (np.maximum(gain[unresolved]*S[0], gain[unresolved]*S[-1]) - E_init[unresolved]
+                             - np.minimum(loss_rate[unresolved]*knots[0], loss_rate[unresolved]*knots[-1]))
+                    unresolved = unresolved[G_max >= 0]
+
+                block = max(PROFILE_SOLVER_POINTS//len(knots), 1)
+                for ind in range(0, len(unresolved), block):
+                    i = unresolved[ind:ind + block]
+
+                    G = gain[i, np.newaxis]*S - E_init[i, np.newaxis] - loss_rate[i, np.newaxis]*knots
+                    crossed = G >= 0
+
+                    found = np.any(crossed[:, 1:], axis=-1)
+                    j = np.argmax(crossed[:, 1:], axis=-1)[found] + 1
+                    rows = np.flatnonzero(found)
+
+                    G0, G1 = G[rows, j - 1], G[rows, j]
+                    t0, t1 = knots[j - 1], knots[j]
+
+                    t_cross[i[found]] = t0 - G0*(t1 - t0)/(G1 - G0)
+
+            S_start += coef_k*(self.energy(end_k) - E_start)
+
+        return t_cross.reshape(shape)[()]
+
+###############################################################################
+
+def get_segments(PTT):
+    "Output = start, end (years) and coefficient of every PTT segment, the last one ends at infinity"
+
+    if config.is_persistence_model(PTT): raise TypeError('a load profile needs a PTT made of steps')
+
+    PTT_array = np.asarray(PTT, dtype=float)
+
+    limit = np.append(0, np.cumsum(PTT_array[:,1][0:-1]))
+    end = np.append(limit[1:], np.inf)
+
+    return limit, end, PTT_array[:,0]
+
+###############################################################################
+
+def is_up_to_date(path, source):
+    return os.path.exists(path) and os.path.getmtime(path) >= os.path.getmtime(source)
+
+###############################################################################
+
+def convert_csv(path, power_path, column=-1, header=False, chunk_size=PROFILE_CHUNK_SIZE):
+    "Convert a CSV profile to a .npy file, chunk by chunk."
+
+    with open(path) as file:
+        n = sum(1 for _ in file) - int(header)
+
+    power = np.lib.format.open_memmap(power_path + '.tmp', mode='w+', dtype=np.float64, shape=(n,))
+
+    with open(path) as file:
+        if header: file.readline()
+
+        for start in range(0, n, chunk_size):
+            lines = list(itertools.islice(file, chunk_size))
+            power[start:start + len(lines)] = np.loadtxt(lines, delimiter=',', ndmin=2)[:, column]
+
+    power.flush()
+    del power
+    os.replace(power_path + '.tmp', power_path)
+
+###############################################################################
+
+def build_prefix_sums(power, step, cumul_path, chunk_size=PROFILE_CHUNK_SIZE):
+    "Write the cumulative energy at every sample boundary, cumul[0] = 0, units : J"
+
+    cumul = np.lib.format.open_memmap(cumul_path + '.tmp', mode='w+', dtype=np.float64, shape=(len(power) + 1,))
+    cumul[0] = 0
+
+    for start in range(0, len(power), chunk_size):
+        chunk = np.asarray(power[start:start + chunk_size], dtype=np.float64)
+        cumul[start + 1:start + 1 + len(chunk)] = cumul[start] + np.cumsum(chunk*step)
+
+    cumul.flush()
+    del cumul
+    os.replace(cumul_path + '.tmp', cumul_path)
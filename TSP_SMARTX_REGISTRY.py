@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+@author: TSP
+"""
+###############################################################################
+#                                      IMPORT                                 #
+###############################################################################
+
+import numpy as np
+
+###############################################################################
+#                                    REGISTRY                                 #
+###############################################################################
+
+SYSTEM_MODELS = {}
+
+###############################################################################
+#                                    FUNCTIONS                                #
+###############################################################################
+
+class SystemModel:
+    "Model of a smart system, as registered by its system file. \
+     Every method is vectorized : ARGS can be an array of shape (..., number of components), \
+     alpha0 and beta can be arrays, they are broadcast together. \
+     The energies have the layout E[..., scenario, cost term] (config.SCENARIOS, config.COST_TERMS). \
+      - Exxx units = Joules whereas Pxxx units = Watts"
+
+    def __init__(self, system_ID, coeff_table, T_replacement, baseline_power_rule, setup_name, ARGS_names, hub_capacity=None):
+        self.system_ID = system_ID
+
+        self.coeff_table = coeff_table                  # () -> table[scenario, cost term, component], compiled from the constants of the system file
+        self.T_replacement = T_replacement              # (alpha0, beta) -> years, < 0 if there is no maintenance
+        self.baseline_power_rule = baseline_power_rule  # (baseline_power, ARGS) -> W
+        self.setup_name = setup_name                    # (ARGS) -> str
+
+        self.ARGS_names = ARGS_names                    # names of the components counted in ARGS, None if ARGS must be None
+        self.hub_capacity = hub_capacity or {}          # {component : (hub component, maximum number of components per hub)}
+
+        self.table = None                               # compiled coeff_table, None until the first evaluation or after invalidate_coeff_tables
+        self.matrix = None
+        self.constant = None
+
+    def check_ARGS(self, ARGS):
+        "Raise TypeError when ARGS is given to a system without components, or does not count every component of the system"
+
+        if (self.ARGS_names is None and ARGS is not None):
+            raise TypeError('{} has no components : ARGS must be None'.format(self.system_ID))
+
+        if (self.ARGS_names is not None and (ARGS is None or np.shape(ARGS)[-1:] != (len(self.ARGS_names),))):
+            raise TypeError('{} needs ARGS = {}'.format(self.system_ID, self.ARGS_names))
+
+    def get_coeff_table(self):
+        "Output = compiled coefficient table, built once : call invalidate_coeff_tables (or set_constants) after editing a constant. \
+         The table is also kept as matrix[component, scenario*cost term] and constant[scenario, cost term] for get_E_scenarios."
+
+        if (self.table is None):
+            table = np.asarray(self.coeff_table(), dtype=float)
+
+            self.matrix = np.ascontiguousarray(np.moveaxis(table[..., 0:-1], -1, 0).reshape(table.shape[-1] - 1, table[..., 0].size))
+            self.constant = table[..., -1].copy()
+            self.table = table
+
+        return self.table
+
+    def get_E_scenarios(self, ARGS, T_replacement):
+        "Output = [Erm, Eem, Er, Pm, Pop] for every scenario, evaluated with one matrix product \
+          - ARGS = None or an array of shape (..., number of components) \
+          - T_replacement can be an array, it is broadcast with ARGS \
+          - output shape = (..., scenario, cost term)"
+
+        self.get_coeff_table()
+
+        if (ARGS is None):
+            E = self.constant.copy()
+        else:
+            ARGS = np.asarray(ARGS, dtype=float)
+            E = (ARGS @ self.matrix).reshape(ARGS.shape[:-1] + self.constant.shape) + self.constant
+
+        # maintenance : energy per replacement -> power
+        T_replacement = np.asarray(T_replacement, dtype=float)[..., np.newaxis]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            Pm = np.where(T_replacement < 0, 0, E[..., 3]/T_replacement)
+
+        if (Pm.shape != E.shape[:-1]): E = np.array(np.broadcast_to(E, Pm.shape + E.shape[-1:]))
+        E[..., 3] = Pm
+
+        return E
+
+    def get_energies(self, ARGS, alpha0, beta):
+        "Output = E[..., scenario, cost term], T_replacement"
+
+        self.check_ARGS(ARGS)
+
+        T_replacement = self.T_replacement(alpha0, beta)
+
+        return self.get_E_scenarios(ARGS, T_replacement), T_replacement
+
+    def get_E_Embodied(self, ARGS):
+        "Output = Erm + Eem per scenario, units = J"
+
+        E, _ = self.get_energies(ARGS, 0, 1)
+        return E[..., 0] + E[..., 1]
+
+    def get_P_Operation(self, ARGS):
+        "Output = Pop per scenario, units = W"
+
+        E, _ = self.get_energies(ARGS, 0, 1)
+        return E[..., 4]
+
+    def get_P_Maintenance(self, ARGS, alpha0, beta):
+        "Output = Pm per scenario, units = W"
+
+        E, _ = self.get_energies(ARGS, alpha0, beta)
+        return E[..., 3]
+
+    def get_E_EoL(self, ARGS):
+        "Output = Er per scenario, units = J"
+
+        E, _ = self.get_energies(ARGS, 0, 1)
+        return E[..., 2]
+
+    def get_component_ARGS(self, ARGS, component, counts, hubless=True):
+        "Output = ARGS of shape (..., number of components) where component takes the values of counts. \
+         The hubs are added when the components attached to them exceed the hub capacity : \
+         ceil(attached components/capacity), never fewer than in ARGS (unless the hubs themselves are swept). \
+          - hubless = True : 0 hubs in ARGS means a system without hub (components connected directly), it stays without hub \
+          - hubless = False : a system with 0 hubs also gets the hubs its components need"
+
+        self.check_ARGS(ARGS)
+
+        if (self.ARGS_names is None or component not in self.ARGS_names):
+            raise NameError('\n Unknown component {} for {} : select one of {} ! \n'.format(component, self.system_ID, self.ARGS_names))
+
+        counts = np.asarray(counts, dtype=float)
+
+        ARGS_sweep = np.array(np.broadcast_to(np.asarray(ARGS, dtype=float), counts.shape + (len(self.ARGS_names),)))
+        ARGS_sweep[..., self.ARGS_names.index(component)] = counts
+
+        for attached, (hub, capacity) in self.hub_capacity.items():
+            if (component == hub): continue
+
+            hubs = ARGS_sweep[..., self.ARGS_names.index(hub)]
+            hubs_needed = np.maximum(hubs, np.ceil(ARGS_sweep[..., self.ARGS_names.index(attached)]/capacity))
+            ARGS_sweep[..., self.ARGS_names.index(hub)] = np.where(hubs > 0, hubs_needed, hubs) if hubless else hubs_needed
+
+        return ARGS_sweep
+
+    def get_baseline_power_system(self, baseline_power, ARGS):
+        return np.asarray(self.baseline_power_rule(baseline_power, ARGS))[()]
+
+    def get_setup_name(self, ARGS):
+        return self.setup_name(ARGS)
+
+###############################################################################
+
+def register_system(model):
+    "Register a SystemModel under its system_ID."
+
+    SYSTEM_MODELS[model.system_ID] = model
+
+    return model
+
+###############################################################################
+
+def invalidate_coeff_tables():
+    "The coefficient tables of every model are compiled again at their next evaluation. \
+     Call it after editing a constant of a system file or of config by hand."
+
+    for model in SYSTEM_MODELS.values():
+        model.table = None
+
+def set_constants(module, constants):
+    "This function sets constants {name : value} of a system file (or of config) and invalidates the coefficient tables. \
+     Output = previous values, to restore them with set_constants(module, output)"
+
+    saved = {name: getattr(module, name) for name in constants}
+
+    for name, value in constants.items():
+        setattr(module, name, value)
+    if constants: invalidate_coeff_tables()
+
+    return saved
+
+###############################################################################
+
+def get_system_model(system_ID):
+    "Return the SystemModel registered under system_ID."
+
+    try:
+        return SYSTEM_MODELS[system_ID]
+
+    except KeyError:
+        raise NameError('\n Unknown system {} : please add its system file or select one of {} ! \n'.format(system_ID, sorted(SYSTEM_MODELS))) from None
+
+# end of script
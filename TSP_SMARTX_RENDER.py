@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+@author: TSP
+
+Batch rendering of the figures to files : each job runs one plot function of TSP_SMARTX_CONFIG_simple
+in a worker process with the non-interactive Agg backend and saves every figure it opens.
+
+    python TSP_SMARTX_RENDER.py figures --format svg                 # report of the default systems
+    render_figures([('office', 'alpha_range', System_sel)], 'figures')
+"""
+###############################################################################
+#                                      IMPORT                                 #
+###############################################################################
+
+import argparse
+import multiprocessing as mp
+import os
+import sys
+
+import TSP_SMARTX_CONFIG_simple as config
+import TSP_SMARTX_REGISTRY as registry
+import TSP_SMARTX_SYSTEMS as systems
+
+###############################################################################
+#                                    CONSTANTS                                #
+###############################################################################
+
+RENDER_FORMATS =                    ['png', 'svg', 'pdf']
+RENDER_DPI =                        150                                               # units : dots per inch (png)
+
+# plot : function of config called with (System_sel, *args)
+RENDER_PLOTS = {'specific_alpha':   'plotSpecificAlpha',
+                'alpha_range':      'plotTPB_AlphaRange',
+                'bulbs':            'plotBulbsImpactHUE',
+                'energy_curves':    'get_TPB'}
+
+###############################################################################
+#                                    FUNCTIONS                                #
+###############################################################################
+
+def init_worker():
+    "Select the Agg backend : no window, no event loop, the figures only exist in memory until they are saved."
+
+    import matplotlib
+    matplotlib.use('Agg', force=True)
+
+###############################################################################
+
+def render_job(task):
+    "Run one job and save its figures as output_dir/name_<figure number>.fmt. Output = name, list of paths"
+
+    import matplotlib.pyplot as plt
+
+    output_dir, fmt, dpi, (name, plot, System_sel, *args) = task
+
+    if (plot not in RENDER_PLOTS):
+        raise NameError('\n Unknown plot {} : select one of {} ! \n'.format(plot, sorted(RENDER_PLOTS)))
+
+    plt.close('all')
+    getattr(config, RENDER_PLOTS[plot])(System_sel, *args)
+
+    paths = []
+    for ind, number in enumerate(plt.get_fignums()):
+        path = os.path.join(output_dir, '{}_{}.{}'.format(name, ind, fmt))
+        plt.figure(number).savefig(path, format=fmt, dpi=dpi, bbox_inches='tight')
+        paths.append(path)
+
+    plt.close('all')
+
+    return name, paths
+
+###############################################################################
+
+def render_figures(jobs, output_dir, fmt='png', processes=None, dpi=RENDER_DPI):
+    "This function renders plot jobs to image files. \
+      - jobs = list of (name, plot in RENDER_PLOTS, System_sel, extra arguments of the plot function...) \
+      - the jobs are shared by a pool of processes (None = all cores) ; \
+        processes = 1 renders in this process, whose matplotlib backend is then switched to Agg \
+      - output = {name : list of paths}, in the order of jobs"
+
+    if (fmt not in RENDER_FORMATS):
+        raise NameError('\n Unknown format {} : select one of {} ! \n'.format(fmt, RENDER_FORMATS))
+
+    os.makedirs(output_dir, exist_ok=True)
+    tasks = [(output_dir, fmt, dpi, tuple(job)) for job in jobs]
+
+    if (processes == 1):
+        init_worker()
+        return dict(render_job(task) for task in tasks)
+
+    with mp.Pool(processes, initializer=init_worker) as pool:
+        return dict(pool.imap(render_job, tasks))
+
+###############################################################################
+
+def get_report_jobs(systems_sel):
+    "Output = jobs of the figures drawn by TSP_SMARTX_MAIN for every system : \
+     specific alpha (with the energy curves of each alpha0, drawn by plotSpecificAlpha), bulbs (when the system has bulbs), alpha range"
+
+    jobs = []
+
+    for System_sel in systems_sel:
+        name = System_sel.system_ID
+        model = registry.get_system_model(System_sel.system_ID)
+
+        jobs.append((name + '_specific_alpha', 'specific_alpha', System_sel))
+
+        if (model.ARGS_names is not None and 'bulbs' in model.ARGS_names):
+            jobs.append((name + '_bulbs', 'bulbs', System_sel))
+
+        jobs.append((name + '_alpha_range', 'alpha_range', System_sel))
+
+    return jobs
+
+###############################################################################
+
+def parse_arguments(argv=None):
+
+    parser = argparse.ArgumentParser(description='Render the figures of the default systems to files.')
+
+    parser.add_argument('output_dir', help='directory receiving the figures')
+    parser.add_argument('--systems', nargs='+', default=sorted(systems.DEFAULT_SYSTEMS), help='system IDs')
+    parser.add_argument('--format', default='png', choices=RENDER_FORMATS)
+    parser.add_argument('--dpi', type=int, default=RENDER_DPI)
+    parser.add_argument('--processes', type=int, default=None, help='worker processes, default = all cores')
+
+    return parser.parse_args(argv)
+
+###############################################################################
+
+def main(argv=None):
+
+    arguments = parse_arguments(argv)
+
+    jobs = get_report_jobs([systems.get_default_system(system_ID) for system_ID in arguments.systems])
+    figures = render_figures(jobs, arguments.output_dir, arguments.format, arguments.processes, arguments.dpi)
+
+    for paths in figures.values():
+        for path in paths: print(path)
+
+    return 0
+
+###############################################################################
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,320 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+@author: TSP
+"""
+###############################################################################
+#                                      IMPORT                                 #
+###############################################################################
+
+import sys
+
+import numpy as np
+
+import TSP_SMARTX_CONFIG_simple as config
+import TSP_SMARTX_REGISTRY as registry
+
+###############################################################################
+#                                    CONSTANTS                                #
+###############################################################################
+
+SENSITIVITY_CHUNK_SIZE =            2**18                                             # units : model evaluations per pass
+SENSITIVITY_RELATIVE_STEP =         1e-6                                              # units : / step of the constants derivatives
+SENSITIVITY_RELATIVE_RANGE =        0.2                                               # units : / default range of beta and baseline_power_system
+
+MORRIS_LEVELS =                     4
+
+SENSITIVITY_OUTPUTS =               ['t_pb', 't_pb_solved', 'savings', 'wsavings']
+
+###############################################################################
+#                                    FUNCTIONS                                #
+###############################################################################
+
+def TPB_gradient(Erm, Eem, Er, P_saved, Pm, Pop):
+    "This function returns the partial derivatives of TPB(Erm, Eem, Er, P_saved, Pm, Pop). \
+      - output = {input name : derivative}, 0 where there is no payback (TPB = T_PB_INFINITY) \
+      - units output = years per unit of the input (J or W)"
+
+    denom = config.ELEC_TO_PRIMARY_ENERGY*config.CONVERSION_YEAR_to_SEC*(P_saved - Pop) - config.CONVERSION_YEAR_to_SEC*Pm
+    t_pb = config.TPB(Erm, Eem, Er, P_saved, Pm, Pop)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        d_E = np.where(denom <= 0, 0, 1/denom)
+
+    d_P = d_E*t_pb*config.CONVERSION_YEAR_to_SEC
+
+    return {'Erm': d_E[()],
+            'Eem': d_E[()],
+            'Er': d_E[()],
+            'P_saved': (-config.ELEC_TO_PRIMARY_ENERGY*d_P)[()],
+            'Pm': d_P[()],
+            'Pop': (config.ELEC_TO_PRIMARY_ENERGY*d_P)[()]}
+
+###############################################################################
+
+def TPB_PTT_gradient(Erm, Eem, Er, beta, alpha0, baseline_power_system, Pm, Pop, PTT):
+    "This function returns the partial derivatives of TPB_PTT, i.e. of the first zero t* of G(t). \
+     G(t*) = 0 gives dt*/dx = -(dG/dx)/(dG/dt) at t*, where dG/dt is the slope of the PTT segment ending at t*. \
+      - PTT_alpha and PTT_duration have a last axis of len(PTT) segments, the open last duration has no derivative \
+        (only for a PTT made of steps, not for a persistence model) \
+      - output = {input name : derivative}, 0 where there is no payback, nan where G does not cross zero (G(0) >= 0) \
+      - units output = years per unit of the input"
+
+    t_pb = np.asarray(config.TPB_PTT(Erm, Eem, Er, beta, alpha0, baseline_power_system, Pm, Pop, PTT), dtype=float)
+
+    if config.is_persistence_model(PTT):
+        coef = PTT.alpha(t_pb)
+        W = PTT.cumulative(t_pb)
+
+    else:
+        limit, coef_lookup, start_lookup, cumul_lookup = config.get_PTT_segments(PTT)
+        PTT_coef = coef_lookup[1:-1]
+
+        # weighted elapsed duration W(t*) and weight of the segment containing t*
+        ind = np.searchsorted(limit, t_pb, side='left')
+        coef = coef_lookup[ind]
+        W = cumul_lookup[ind] + coef*(t_pb - start_lookup[ind])
+
+    gain = config.ELEC_TO_PRIMARY_ENERGY*config.CONVERSION_YEAR_to_SEC*np.asarray(beta*baseline_power_system*alpha0, dtype=float)
+    slope = gain*coef - (config.ELEC_TO_PRIMARY_ENERGY*Pop + Pm)*config.CONVERSION_YEAR_to_SEC
+
+    finite = t_pb < config.T_PB_INFINITY
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        inv_slope = np.where(finite, np.where(slope > 0, 1/slope, np.nan), 0)
+
+    # dG/dx for every input
+    dG = {'Erm': -1,
+          'Eem': -1,
+          'Er': -1,
+          'beta': config.ELEC_TO_PRIMARY_ENERGY*config.CONVERSION_YEAR_to_SEC*baseline_power_system*alpha0*W,
+          'alpha0': config.ELEC_TO_PRIMARY_ENERGY*config.CONVERSION_YEAR_to_SEC*beta*baseline_power_system*W,
+          'baseline_power_system': config.ELEC_TO_PRIMARY_ENERGY*config.CONVERSION_YEAR_to_SEC*beta*alpha0*W,
+          'Pm': -config.CONVERSION_YEAR_to_SEC*t_pb,
+          'Pop': -config.ELEC_TO_PRIMARY_ENERGY*config.CONVERSION_YEAR_to_SEC*t_pb}
+
+    gradient = {name: (-np.asarray(value)*inv_slope)[()] for name, value in dG.items()}
+
+    if config.is_persistence_model(PTT): return gradient
+
+    # PTT : time elapsed in each segment before t*, and shift of the later segments when a duration changes
+    t = t_pb[..., np.newaxis]
+    elapsed = np.clip(t - limit[0:-1], 0, limit[1:] - limit[0:-1])
+    completed = t > limit[1:]
+    completed[..., -1] = False
+
+    gain_t = gain[..., np.newaxis]
+    gradient['PTT_alpha'] = (-gain_t*elapsed*inv_slope[..., np.newaxis])[()]
+    gradient['PTT_duration'] = (-gain_t*np.where(completed, PTT_coef - coef[..., np.newaxis], 0)*inv_slope[..., np.newaxis])[()]
+
+    return gradient
+
+###############################################################################
+
+def get_constant_sensitivities(System_sel, alpha0, scenario='BENCHMARK', relative_step=SENSITIVITY_RELATIVE_STEP):
+    "This function returns the derivatives of the payback times with respect to every constant of the system file \
+     (E_EM_HUB_TYPICAL, POWER_HUB_MEAN, ...). \
+     Each constant only moves the cost terms [Erm, Eem, Er, Pm, Pop] : their derivatives are taken on the \
+     coefficient tables (central difference) and chained with the analytic gradients of TPB and TPB_PTT. \
+      - alpha0 can be an array \
+      - the constants are restored after each step, System_sel is not modified \
+      - output = {constant name : {value, t_pb, t_pb_solved}}, units = years per unit of the constant"
+
+    model = registry.get_system_model(System_sel.system_ID)
+    module = sys.modules[model.coeff_table.__module__]
+    s = config.SCENARIOS.index(scenario)
+
+    alpha0 = np.asarray(alpha0, dtype=float)
+    beta = System_sel.beta
+    bps = System_sel.baseline_power_system
+
+    def get_terms():
+        E, _ = model.get_energies(System_sel.args, alpha0, beta)
+        return np.moveaxis(E[..., s, :], -1, 0)
+
+    Erm, Eem, Er, Pm, Pop = get_terms()
+
+    gradient_TPB = TPB_gradient(Erm, Eem, Er, bps*alpha0*beta, Pm, Pop)
+    gradient_TPB_PTT = TPB_PTT_gradient(Erm, Eem, Er, beta, alpha0, bps, Pm, Pop, System_sel.PTT)
+
+    sensitivities = {}
+
+    for name, value in config.get_module_constants(module):
+
+        h = relative_step*max(abs(value), 1)
+
+        try:
+            registry.set_constants(module, {name: value + h})
+            terms_UP = get_terms()
+            registry.set_constants(module, {name: value - h})
+            terms_DN = get_terms()
+        finally:
+            registry.set_constants(module, {name: value})
+
+        d_terms = dict(zip(['Erm', 'Eem', 'Er', 'Pm', 'Pop'], (terms_UP - terms_DN)/(2*h)))
+
+        sensitivities[name] = {'value': value,
+                               't_pb': sum(gradient_TPB[term]*d_terms[term] for term in d_terms)[()],
+                               't_pb_solved': sum(gradient_TPB_PTT[term]*d_terms[term] for term in d_terms)[()]}
+
+    return sensitivities
+
+###############################################################################
+
+def get_nominal_factors(System_sel, alpha0):
+    "Output = {factor : nominal value} of the factors of evaluate_factors (BENCHMARK scenario)"
+
+    model = registry.get_system_model(System_sel.system_ID)
+    E, _ = model.get_energies(System_sel.args, alpha0, System_sel.beta)
+    s = config.SCENARIOS.index('BENCHMARK')
+
+    return {'E_embodied': E[..., s, 0] + E[..., s, 1] + E[..., s, 2],
+            'P_operation': E[..., s, 4],
+            'alpha0': alpha0,
+            'beta': System_sel.beta,
+            'baseline_power_system': System_sel.baseline_power_system,
+            'lifetime': System_sel.lifetime_system}
+
+###############################################################################
+
+def get_default_bounds(System_sel):
+    "This function returns the default ranges of the factors of a system : \
+      - E_embodied and P_operation : LOW to HIGH scenario \
+      - alpha0 : range of the specific alpha0 of the system \
+      - beta and baseline_power_system : +/- SENSITIVITY_RELATIVE_RANGE \
+      - output = {factor : (low, high)}, units = [J, W, /, /, W]"
+
+    model = registry.get_system_model(System_sel.system_ID)
+    E, _ = model.get_energies(System_sel.args, 0, System_sel.beta)
+
+    E_embodied = np.sort(E[..., 0] + E[..., 1] + E[..., 2])
+    P_operation = np.sort(E[..., 4])
+
+    beta_range = [System_sel.beta*(1 - SENSITIVITY_RELATIVE_RANGE), min(System_sel.beta*(1 + SENSITIVITY_RELATIVE_RANGE), 1)]
+    bps_range = [System_sel.baseline_power_system*(1 - SENSITIVITY_RELATIVE_RANGE), System_sel.baseline_power_system*(1 + SENSITIVITY_RELATIVE_RANGE)]
+
+    return {'E_embodied': (E_embodied[0], E_embodied[-1]),
+            'P_operation': (P_operation[0], P_operation[-1]),
+            'alpha0': (min(System_sel.alpha0), max(System_sel.alpha0)),
+            'beta': tuple(beta_range),
+            'baseline_power_system': tuple(bps_range)}
+
+###############################################################################
+
+def evaluate_factors(System_sel, factors, output='t_pb_solved'):
+    "This function evaluates one output of the model for arrays of factors, in one vectorized pass. \
+      - factors = {factor : array}, the missing factors take their nominal value (get_nominal_factors) \
+      - P_maintenance follows the system model for each alpha0 and beta \
+      - output in SENSITIVITY_OUTPUTS, units = [years, years, J, %]"
+
+    model = registry.get_system_model(System_sel.system_ID)
+
+    alpha0 = np.asarray(factors.get('alpha0', System_sel.alpha0[1]), dtype=float)
+    values = get_nominal_factors(System_sel, alpha0)
+    values.update(factors)
+
+    E_embodied, Pop = values['E_embodied'], values['P_operation']
+    beta, bps, lifetime = values['beta'], values['baseline_power_system'], values['lifetime']
+
+    Pm = model.get_P_Maintenance(System_sel.args, alpha0, beta)[..., config.SCENARIOS.index('BENCHMARK')]
+
+    if (output == 't_pb'):
+        return config.TPB(E_embodied, 0, 0, bps*alpha0*beta, Pm, Pop)
+
+    elif (output == 't_pb_solved'):
+        return config.TPB_PTT(E_embodied, 0, 0, beta, alpha0, bps, Pm, Pop, System_sel.PTT)
+
+    savings = config.G(lifetime, E_embodied, 0, 0, beta, alpha0, bps, Pm, Pop, System_sel.PTT)
+
+    if (output == 'savings'):
+        return savings
+
+    elif (output == 'wsavings'):
+        return savings/config.E_smart(E_embodied, 0, 0, Pop, Pm, lifetime)*100
+
+    else:
+        raise NameError('unknown output {} : select one of {}'.format(output, SENSITIVITY_OUTPUTS))
+
+###############################################################################
+
+def evaluate_unit_samples(System_sel, bounds, samples, output, chunk_size=SENSITIVITY_CHUNK_SIZE):
+    "Evaluate samples of the unit hypercube (array of shape (n, number of factors)) scaled to bounds, chunk by chunk."
+
+    names = list(bounds)
+    low = np.array([bounds[name][0] for name in names], dtype=float)
+    high = np.array([bounds[name][1] for name in names], dtype=float)
+
+    results = np.empty(len(samples))
+
+    for start in range(0, len(samples), chunk_size):
+        x = low + samples[start:start + chunk_size]*(high - low)
+        results[start:start + chunk_size] = evaluate_factors(System_sel, dict(zip(names, x.T)), output)
+
+    return results
+
+###############################################################################
+
+def sobol_indices(System_sel, n_samples, bounds=None, output='t_pb_solved', seed=None, chunk_size=SENSITIVITY_CHUNK_SIZE):
+    "This function returns the first-order and total Sobol indices of the factors (Saltelli and Jansen estimators). \
+      - factors uniform within bounds (default get_default_bounds) \
+      - cost = n_samples*(number of factors + 2) evaluations, done in chunks of chunk_size \
+      - note : t_pb_solved saturates at T_PB_INFINITY when there is no payback, which weighs on its variance \
+      - output = {factor : {S1, ST}}, variance of the output"
+
+    if (bounds is None): bounds = get_default_bounds(System_sel)
+    k = len(bounds)
+
+    rng = np.random.default_rng(seed)
+    A = rng.random((n_samples, k))
+    B = rng.random((n_samples, k))
+
+    # A, B and the k matrices A with column i from B, evaluated in a single stack
+    AB = np.repeat(A[np.newaxis], k, axis=0)
+    AB[np.arange(k), :, np.arange(k)] = B.T
+
+    f = evaluate_unit_samples(System_sel, bounds, np.concatenate((A, B, AB.reshape(-1, k))), output, chunk_size)
+    f_A, f_B, f_AB = f[:n_samples], f[n_samples:2*n_samples], f[2*n_samples:].reshape(k, n_samples)
+
+    variance = np.var(np.concatenate((f_A, f_B)))
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        S1 = np.mean(f_B*(f_AB - f_A), axis=-1)/variance
+        ST = 0.5*np.mean((f_A - f_AB)**2, axis=-1)/variance
+
+    indices = {name: {'S1': S1[i], 'ST': ST[i]} for i, name in enumerate(bounds)}
+
+    return indices, variance
+
+###############################################################################
+
+def morris_screening(System_sel, n_trajectories, bounds=None, output='t_pb_solved', levels=MORRIS_LEVELS, seed=None, chunk_size=SENSITIVITY_CHUNK_SIZE):
+    "This function returns the Morris elementary effects statistics of the factors. \
+      - every trajectory moves the factors one at a time by +/- levels/(2*(levels-1)) of their range, in random order \
+      - cost = n_trajectories*(number of factors + 1) evaluations \
+      - the effects are given per unit range of the factors \
+      - output = {factor : {mu, mu_star, sigma}}"
+
+    if (bounds is None): bounds = get_default_bounds(System_sel)
+    k = len(bounds)
+
+    rng = np.random.default_rng(seed)
+    delta = levels/(2*(levels - 1))
+    rows = np.arange(n_trajectories)
+
+    base = rng.integers(0, levels, (n_trajectories, k))/(levels - 1)
+    step = np.where(base + delta <= 1, delta, -delta)
+    order = np.argsort(rng.random((n_trajectories, k)), axis=-1)
+
+    trajectories = np.repeat(base[:, np.newaxis], k + 1, axis=1)
+    for j in range(k):
+        trajectories[rows, j + 1:, order[:, j]] += step[rows, order[:, j]][:, np.newaxis]
+
+    f = evaluate_unit_samples(System_sel, bounds, trajectories.reshape(-1, k), output, chunk_size).reshape(n_trajectories, k + 1)
+
+    # elementary effect of the factor moved at each step
+    effects = np.empty((n_trajectories, k))
+    effects[rows[:, np.newaxis], order] = np.diff(f, axis=-1)/step[rows[:, np.newaxis], order]
+
+    return {name: {'mu': np.mean(effects[:, i]),
+                   'mu_star': np.mean(np.abs(effects[:, i])),
+                   'sigma': np.std(effects[:, i])} for i, name in enumerate(bounds)}
@@ -0,0 +1,357 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+@author: TSP
+
+Local query service : a long-lived asyncio HTTP/JSON server keeping the system models warm.
+Concurrent requests arriving within SERVICE_BATCH_WINDOW are merged into one get_TPB_batch evaluation.
+
+    python TSP_SMARTX_SERVICE.py --port 8765
+    curl -d '{"system": "SMART-METER", "alpha0": 0.08}' http://127.0.0.1:8765/tpb
+    curl -d '[{"system": "PHILIPS-HUE-LED", "alpha0": 0.7, "args": [2, 20, 1]}, ...]' http://127.0.0.1:8765/tpb
+
+    python TSP_SMARTX_SERVICE.py --port 8765 --benchmark 10000      # latency of a local client against a running server
+
+A query = {system, alpha0, optional : beta, args, scenario}, the answer = {field of config.TPB_BATCH_DTYPE : value}.
+"""
+###############################################################################
+#                                      IMPORT                                 #
+###############################################################################
+
+import argparse
+import asyncio
+import json
+import math
+import sys
+import time
+
+import numpy as np
+
+import TSP_SMARTX_CONFIG_simple as config
+import TSP_SMARTX_REGISTRY as registry
+import TSP_SMARTX_SYSTEMS as systems
+
+###############################################################################
+#                                    CONSTANTS                                #
+###############################################################################
+
+SERVICE_HOST =                      '127.0.0.1'
+SERVICE_PORT =                      8765
+SERVICE_BATCH_WINDOW =              0                                                 # units : seconds a batch waits for other queries, 0 = the queries read in the same loop iteration
+SERVICE_MAX_BATCH =                 4096                                              # units : queries, a full batch is evaluated at once
+
+SERVICE_REASONS =                   {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed', 500: 'Internal Server Error'}
+
+###############################################################################
+#                                    FUNCTIONS                                #
+###############################################################################
+
+def is_number(value):
+    "Output = True for a finite JSON number (not a boolean)"
+
+    if (isinstance(value, bool) or not isinstance(value, (int, float))): return False
+
+    try:
+        return math.isfinite(value)
+    except OverflowError:
+        return False
+
+###############################################################################
+
+class MicroBatcher:
+    "Queue of the queries per (system, scenario) : the first query of a batch schedules its evaluation after window, \
+     the queries arriving meanwhile join it. Output of submit = future of the result of one query. \
+      - when the evaluation of a batch raises, its queries are evaluated one by one : only the failing query gets the error \
+      - window = 0 evaluates the batch right after the current iteration of the event loop : no added latency, \
+        the queries of all the connections ready at once are merged (the timers of the loop have a 1 ms resolution)"
+
+    def __init__(self, evaluate, window=SERVICE_BATCH_WINDOW, max_batch=SERVICE_MAX_BATCH):
+        self.evaluate = evaluate
+        self.window = window
+        self.max_batch = max_batch
+        self.pending = {}
+
+    def submit(self, key, query):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        batch = self.pending.setdefault(key, [])
+        batch.append((query, future))
+
+        if (len(batch) >= self.max_batch): self.flush(key)
+        elif (len(batch) == 1 and self.window > 0): loop.call_later(self.window, self.flush, key)
+        elif (len(batch) == 1): loop.call_soon(self.flush, key)
+
+        return future
+
+    def flush(self, key):
+        batch = self.pending.pop(key, None)
+        if (not batch): return
+
+        try:
+            results = self.evaluate(key, [query for query, _ in batch])
+
+        except Exception as error:
+            if (len(batch) == 1):
+                if (not batch[0][1].done()): batch[0][1].set_exception(error)
+                return
+
+            # one invalid query must not fail the others
+            results = []
+            for query, future in batch:
+                try:
+                    results.extend(self.evaluate(key, [query]))
+                except Exception as error:
+                    results.append(None)
+                    if (not future.done()): future.set_exception(error)
+
+        for (_, future), result in zip(batch, results):
+            if (not future.done()): future.set_result(result)
+
+###############################################################################
+
+class PaybackService:
+    "Payback queries over HTTP/JSON : \
+      - POST /tpb : one query or a list of queries \
+      - GET /systems : system IDs and their default parameters \
+      - GET /health"
+
+    def __init__(self, window=SERVICE_BATCH_WINDOW, max_batch=SERVICE_MAX_BATCH):
+        self.systems = {system_ID: systems.get_default_system(system_ID) for system_ID in systems.DEFAULT_SYSTEMS}
+        self.batcher = MicroBatcher(self.evaluate, window, max_batch)
+
+        self.n_queries = 0
+        self.n_batches = 0
+
+        # the coefficient tables of the models are compiled once, before the first query
+        for system_ID in self.systems:
+            self.evaluate((system_ID, 'BENCHMARK'), [{'alpha0': 0.5}])
+
+    ###########################################################################
+
+    def evaluate(self, key, queries):
+        "Output = list of result dicts, one per query, computed in one get_TPB_batch call, a non-finite value is None (null)"
+
+        system_ID, scenario = key
+        System_sel = self.systems[system_ID]
+        model = registry.get_system_model(system_ID)
+
+        alpha0 = np.array([query['alpha0'] for query in queries], dtype=float)
+        beta = np.array([query.get('beta', System_sel.beta) for query in queries], dtype=float)
+        ARGS = None if (model.ARGS_names is None) else np.array([query.get('args', System_sel.args) for query in queries], dtype=float)
+
+        results = config.get_TPB_batch(System_sel, alpha0, beta, ARGS, scenario)
+
+        self.n_batches += 1
+        self.n_queries += len(queries)
+
+        return [{name: value if math.isfinite(value) else None for name, value in zip(results.dtype.names, row)} for row in results.tolist()]
+
+    def check_query(self, query):
+        "Output = batch key of a query, raise ValueError for an invalid query"
+
+        if (not isinstance(query, dict)): raise ValueError('a query is a JSON object')
+
+        system_ID = query.get('system')
+        scenario = query.get('scenario', 'BENCHMARK')
+
+        if (system_ID not in self.systems): raise ValueError('unknown system {} : select one of {}'.format(system_ID, sorted(self.systems)))
+        if (scenario not in config.SCENARIOS): raise ValueError('unknown scenario {} : select one of {}'.format(scenario, config.SCENARIOS))
+        if (not is_number(query.get('alpha0')) or not 0 <= query['alpha0'] <= 1): raise ValueError('alpha0 must be a number in [0, 1]')
+        if ('beta' in query and (not is_number(query['beta']) or query['beta'] <= 0)): raise ValueError('beta must be a finite number > 0')
+
+        ARGS_names = registry.get_system_model(system_ID).ARGS_names
+        if ('args' in query):
+            if (ARGS_names is None): raise ValueError('{} has no args'.format(system_ID))
+            if (not isinstance(query['args'], list) or len(query['args']) != len(ARGS_names)): raise ValueError('args = list {}'.format(ARGS_names))
+            if (not all(is_number(value) and value >= 0 and value == int(value) for value in query['args'])):
+                raise ValueError('args must be integers >= 0')
+
+        return system_ID, scenario
+
+    ###########################################################################
+
+    async def dispatch(self, method, path, body):
+        "Output = HTTP status, JSON payload ; an unexpected error is answered with 500"
+
+        try:
+            return await self.route(method, path, body)
+        except Exception as error:
+            return 500, {'error': '{}: {}'.format(type(error).__name__, error)}
+
+    async def route(self, method, path, body):
+        "Output = HTTP status, JSON payload, the errors of the evaluation of a query are answered with 400"
+
+        if (path == '/health'):
+            return 200, {'status': 'ok', 'queries': self.n_queries, 'batches': self.n_batches}
+
+        if (path == '/systems'):
+            return 200, {system_ID: {'alpha0': System_sel.alpha0, 'beta': System_sel.beta, 'args': System_sel.args,
+                                     'args_names': registry.get_system_model(system_ID).ARGS_names, 'lifetime_system': System_sel.lifetime_system}
+                         for system_ID, System_sel in self.systems.items()}
+
+        if (path != '/tpb'): return 404, {'error': 'unknown path {}'.format(path)}
+        if (method != 'POST'): return 405, {'error': 'POST a query or a list of queries'}
+
+        try:
+            queries = json.loads(body)
+            single = not isinstance(queries, list)
+            if single: queries = [queries]
+
+            keys = [self.check_query(query) for query in queries]
+
+        except ValueError as error:
+            return 400, {'error': str(error)}
+
+        try:
+            results = await asyncio.gather(*[self.batcher.submit(key, query) for key, query in zip(keys, queries)])
+        except (ValueError, TypeError, ArithmeticError) as error:
+            return 400, {'error': '{}: {}'.format(type(error).__name__, error)}
+
+        return 200, results[0] if single else results
+
+    async def handle_connection(self, reader, writer):
+        "HTTP/1.1 with keep-alive : the requests of a connection are answered in order"
+
+        try:
+            while True:
+                request_line = await reader.readline()
+                if (not request_line): break
+
+                method, path, version = request_line.decode('latin-1').split()
+
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if (line in (b'\r\n', b'\n', b'')): break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+
+                body = await reader.readexactly(int(headers.get('content-length', 0)))
+
+                status, payload = await self.dispatch(method, path, body)
+
+                data = json.dumps(payload).encode()
+                writer.write('HTTP/1.1 {} {}\r\nContent-Type: application/json\r\nContent-Length: {}\r\n\r\n'.format(status, SERVICE_REASONS[status], len(data)).encode() + data)
+                await writer.drain()
+
+                if (headers.get('connection', '').lower() == 'close' or version == 'HTTP/1.0'): break
+
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+
+        finally:
+            writer.close()
+
+    async def serve(self, host=SERVICE_HOST, port=SERVICE_PORT):
+        server = await asyncio.start_server(self.handle_connection, host, port)
+
+        print('Payback service on http://{}:{}'.format(host, port), file=sys.stderr)
+
+        async with server:
+            await server.serve_forever()
+
+###############################################################################
+
+class ServiceClient:
+    "Minimal keep-alive client of the service, e.g. for the tools that should not import the model"
+
+    def __init__(self, host=SERVICE_HOST, port=SERVICE_PORT):
+        self.host = host
+        self.port = port
+
+    async def __aenter__(self):
+        self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        return self
+
+    async def __aexit__(self, *exc):
+        self.writer.close()
+
+    async def post(self, path, payload):
+        "Output = decoded JSON answer, raise ValueError when the status is not 200"
+
+        data = json.dumps(payload).encode()
+        self.writer.write('POST {} HTTP/1.1\r\nHost: {}\r\nContent-Type: application/json\r\nContent-Length: {}\r\n\r\n'.format(path, self.host, len(data)).encode() + data)
+        await self.writer.drain()
+
+        status = int((await self.reader.readline()).split()[1])
+
+        length = 0
+        while True:
+            line = await self.reader.readline()
+            if (line in (b'\r\n', b'\n', b'')): break
+            name, _, value = line.decode('latin-1').partition(':')
+            if (name.strip().lower() == 'content-length'): length = int(value)
+
+        answer = json.loads(await self.reader.readexactly(length))
+
+        if (status != 200): raise ValueError(answer.get('error'))
+        return answer
+
+###############################################################################
+
+async def run_client_benchmark(n_requests, concurrency, host=SERVICE_HOST, port=SERVICE_PORT, rate=None):
+    "Send n_requests single queries from concurrency connections, at rate requests per second (None = as fast as possible). \
+     Output = {requests_per_sec, latency percentiles [ms]}"
+
+    rng = np.random.default_rng(0)
+    system_IDs = sorted(systems.DEFAULT_SYSTEMS)
+    latencies = []
+
+    async def worker(n, offset):
+        async with ServiceClient(host, port) as client:
+            for ind in range(n):
+                if (rate is not None):
+                    await asyncio.sleep(max(begin + (ind*concurrency + offset)/rate - time.perf_counter(), 0))
+
+                query = {'system': system_IDs[rng.integers(len(system_IDs))], 'alpha0': float(rng.random())}
+                start = time.perf_counter()
+                await client.post('/tpb', query)
+                latencies.append(time.perf_counter() - start)
+
+    begin = time.perf_counter()
+    await asyncio.gather(*[worker(n_requests//concurrency, offset) for offset in range(concurrency)])
+    seconds = time.perf_counter() - begin
+
+    latencies = np.array(latencies)*1e3
+
+    return {'requests_per_sec': len(latencies)/seconds,
+            'latency_ms': {'p50': np.percentile(latencies, 50), 'p90': np.percentile(latencies, 90), 'p99': np.percentile(latencies, 99)}}
+
+###############################################################################
+
+def parse_arguments(argv=None):
+
+    parser = argparse.ArgumentParser(description='Local payback query service.')
+
+    parser.add_argument('--host', default=SERVICE_HOST)
+    parser.add_argument('--port', type=int, default=SERVICE_PORT)
+    parser.add_argument('--window', type=float, default=SERVICE_BATCH_WINDOW, help='seconds a batch waits for other queries')
+    parser.add_argument('--max-batch', type=int, default=SERVICE_MAX_BATCH)
+    parser.add_argument('--benchmark', type=int, default=None, metavar='N', help='send N queries to a running service instead of serving')
+    parser.add_argument('--concurrency', type=int, default=16, help='connections of the benchmark client')
+    parser.add_argument('--rate', type=float, default=None, help='requests per second of the benchmark client, default = as fast as possible')
+
+    return parser.parse_args(argv)
+
+###############################################################################
+
+def main(argv=None):
+
+    arguments = parse_arguments(argv)
+
+    if (arguments.benchmark is not None):
+        print(json.dumps(asyncio.run(run_client_benchmark(arguments.benchmark, arguments.concurrency, arguments.host, arguments.port, arguments.rate)), indent=1))
+        return 0
+
+    try:
+        asyncio.run(PaybackService(arguments.window, arguments.max_batch).serve(arguments.host, arguments.port))
+    except KeyboardInterrupt:
+        pass
+
+    return 0
+
+###############################################################################
+
+if __name__ == '__main__':
+    sys.exit(main())
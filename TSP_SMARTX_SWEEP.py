@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+@author: TSP
+"""
+###############################################################################
+#                                      IMPORT                                 #
+###############################################################################
+
+import multiprocessing as mp
+import numpy as np
+from multiprocessing import shared_memory
+
+import TSP_SMARTX_CONFIG_simple as config
+import TSP_SMARTX_REGISTRY as registry
+
+###############################################################################
+#                                    CONSTANTS                                #
+###############################################################################
+
+SWEEP_CHUNK_SIZE =                  2**16                                             # units : grid points per task
+
+# state of a worker process, set by init_worker
+WORKER = {}
+
+###############################################################################
+#                                    FUNCTIONS                                #
+###############################################################################
+
+class SweepResults:
+    "Results of sweep_grid, stored in a shared-memory block. \
+      - array = structured array of shape (systems, ARGS, beta, alpha0) \
+      - the block is freed by release() or when leaving a with statement"
+
+    def __init__(self, shape, dtype):
+        size = max(int(np.prod(shape))*dtype.itemsize, 1)
+
+        self.shm = shared_memory.SharedMemory(create=True, size=size)
+        self.array = np.ndarray(shape, dtype=dtype, buffer=self.shm.buf)
+
+    def release(self):
+        self.array = None
+        self.shm.close()
+        self.shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+###############################################################################
+
+def init_worker(shm_name, shape, dtype, systems, alpha0, beta, ARGS):
+    "Attach a worker process to the shared result array."
+
+    WORKER['shm'] = shared_memory.SharedMemory(name=shm_name)
+    WORKER['array'] = np.ndarray(shape, dtype=dtype, buffer=WORKER['shm'].buf)
+
+    WORKER['systems'] = systems
+    WORKER['alpha0'] = alpha0
+    WORKER['beta'] = beta
+    WORKER['ARGS'] = ARGS
+
+###############################################################################
+
+def evaluate_chunk(task):
+    "Evaluate the grid points [start, stop[ of one system and write them in the shared result array."
+
+    sys_ind, start, stop = task
+
+    array = WORKER['array']
+    System_sel = WORKER['systems'][sys_ind]
+    alpha0 = WORKER['alpha0']
+    beta = WORKER['beta'][sys_ind]
+    ARGS = WORKER['ARGS'][sys_ind]
+
+    i_ARGS, i_beta, i_alpha = np.unravel_index(np.arange(start, stop), array.shape[1:])
+
+    results = config.get_TPB_batch(System_sel, alpha0[i_alpha], beta[i_beta], None if (ARGS is None) else ARGS[i_ARGS])
+
+    out = array[sys_ind].reshape(-1)
+    for field in array.dtype.names:
+        out[field][start:stop] = results[field]
+
+    return stop - start
+
+###############################################################################
+
+def sweep_grid(systems, alpha0, beta=None, ARGS=None, processes=None, chunk_size=SWEEP_CHUNK_SIZE, fields=None, dtype=float):
+    "This function evaluates get_TPB_batch on the Cartesian product systems x ARGS x beta x alpha0. \
+      - beta = None uses the beta of each system, ARGS = None the ARGS of each system \
+      - ARGS = array of shape (number of configurations, number of components), ignored by the systems without ARGS \
+      - the grid is split in chunks evaluated by a pool of processes (None = all cores, 1 = in this process) \
+        which write directly in a preallocated shared-memory array \
+      - fields = subset of config.TPB_BATCH_DTYPE names to keep, dtype = float type of the results \
+      - output = SweepResults, array of shape (systems, ARGS, beta, alpha0)"
+
+    alpha0 = np.atleast_1d(np.asarray(alpha0, dtype=float))
+
+    if (fields is None): fields = config.TPB_BATCH_DTYPE.names
+    result_dtype = np.dtype([(field, dtype) for field in fields])
+
+    # per-system grids
+    betas = [np.atleast_1d(np.asarray(System_sel.beta if (beta is None) else beta, dtype=float)) for System_sel in systems]
+
+    ARGS_all = []
+    for System_sel in systems:
+        if (registry.get_system_model(System_sel.system_ID).ARGS_names is None):
+            ARGS_all.append(None)
+        elif (ARGS is None):
+            ARGS_all.append(np.asarray([System_sel.args], dtype=float))
+        else:
+            ARGS_all.append(np.atleast_2d(np.asarray(ARGS, dtype=float)))
+
+    n_ARGS = max([1] + [len(A) for A in ARGS_all if A is not None])
+    n_beta = max(len(b) for b in betas)
+
+    if (any(len(b) != n_beta for b in betas)): raise ValueError('beta must have the same length for every system')
+    if (any(A is not None and len(A) != n_ARGS for A in ARGS_all)): raise ValueError('ARGS must have the same length for every system')
+
+    shape = (len(systems), n_ARGS, n_beta, len(alpha0))
+    sweep = SweepResults(shape, result_dtype)
+
+    # systems without ARGS are evaluated once and copied along the ARGS axis
+    block = n_ARGS*n_beta*len(alpha0)
+    tasks = []
+    for sys_ind, A in enumerate(ARGS_all):
+        size = block if (A is not None) else n_beta*len(alpha0)
+        tasks += [(sys_ind, start, min(start + chunk_size, size)) for start in range(0, size, chunk_size)]
+
+    init_args = (sweep.shm.name, shape, result_dtype, systems, alpha0, betas, ARGS_all)
+
+    # the block is released if a chunk fails, it is returned to the caller otherwise
+    try:
+        if (processes == 1):
+            init_worker(*init_args)
+            try:
+                for task in tasks: evaluate_chunk(task)
+            finally:
+                WORKER['shm'].close()
+                WORKER.clear()
+
+        else:
+            with mp.Pool(processes, initializer=init_worker, initargs=init_args) as pool:
+                for _ in pool.imap_unordered(evaluate_chunk, tasks): pass
+
+    except BaseException:
+        sweep.release()
+        raise
+
+    for sys_ind, A in enumerate(ARGS_all):
+        if (A is None): sweep.array[sys_ind, 1:] = sweep.array[sys_ind, 0]
+
+    return sweep
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+@author: TSP
+"""
+###############################################################################
+
+import copy
+
+import TSP_SMARTX_CONFIG_simple as config
+
+###############################################################################
+
+### Systems definition
+
+## PARAMS = (system_ID, 
+#            baseline_power, 
+#            specific alpha_0, 
+#            PTT, 
+#            beta, 
+#            lifetime_system, 
+#            color, 
+#            args)
+
+# PHILIPS HUE
+
+HUE_system_LED = config.SmartSystem('PHILIPS-HUE-LED',      \
+                                    9,                      \
+                                    [0.17, 0.70, 0.35],\
+                                    [[1, -1]],              \
+                                    (1000/365.25)/24,                  \
+                                    5,                      \
+                                    ['peachpuff'],          \
+                                    [2, 8, 1])
+
+# SMART METER
+SMTR_system = config.SmartSystem('SMART-METER',             \
+                                 524,                       \
+                                 [0.03, 0.08, 0.15], \
+                                 [[1, 0.5], [0, -1]],                 \
+                                 24/24,                         \
+                                 15,                        \
+                                 ['peachpuff'],             \
+                                 None)
+
+
+# OFFICE LIGHTNING
+OFFICE_LIGHT_system = config.SmartSystem('OFFICE-LIGHTNING',             \
+                                 100,                       \
+                                 [0.2, 0.35, 0.5], \
+                                 [[1, -1]],                 \
+                                 (2500*0.6/365.25)/24,                         \
+                                 15,                        \
+                                 ['peachpuff'],             \
+                                 [1, 4, 0])
+
+###############################################################################
+
+DEFAULT_SYSTEMS = {System.system_ID : System for System in [HUE_system_LED, SMTR_system, OFFICE_LIGHT_system]}
+
+###############################################################################
+
+def get_default_system(system_ID):
+    "This function returns a configured copy of the default definition of system_ID."
+    
+    if (system_ID not in DEFAULT_SYSTEMS):
+        raise NameError('\n No default definition for {} : select one of {} ! \n'.format(system_ID, sorted(DEFAULT_SYSTEMS)))
+    
+    return config.configure_system(copy.deepcopy(DEFAULT_SYSTEMS[system_ID]))
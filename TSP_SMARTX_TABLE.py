@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+@author: TSP
+
+Columnar storage of many configurations of one system : one contiguous array per parameter,
+the PTT of every row in a ragged layout (offsets + values), no Python object per row.
+
+    table = SystemTable('SMART-METER', alpha0=np.random.rand(10**6), beta=1, baseline_power=524, lifetime_system=15,
+                        PTT=[[1, 0.5], [0, -1]])
+    results = get_TPB_table(table)
+"""
+###############################################################################
+#                                      IMPORT                                 #
+###############################################################################
+
+import numpy as np
+
+import TSP_SMARTX_CONFIG_simple as config
+import TSP_SMARTX_REGISTRY as registry
+
+###############################################################################
+#                                    CONSTANTS                                #
+###############################################################################
+
+TABLE_CHUNK_SIZE =                  2**16                                             # units : rows evaluated at once
+
+###############################################################################
+#                                    FUNCTIONS                                #
+###############################################################################
+
+class SystemTable:
+    "Configurations of the system system_ID, one row per configuration : \
+      - alpha0, beta, baseline_power, lifetime_system : arrays of shape (n,) \
+      - ARGS : array of shape (n, number of components), None for a system without ARGS \
+      - PTT_offsets (n+1,) and PTT_values (total number of steps, 2) : the PTT of row i is PTT_values[PTT_offsets[i]:PTT_offsets[i+1]] \
+      - the constructor broadcasts scalars, one PTT (list of steps) or a list of n PTT \
+      - units = [/, /, W, years]"
+
+    def __init__(self, system_ID, alpha0, beta, baseline_power, lifetime_system, ARGS=None, PTT=None, PTT_offsets=None, PTT_values=None):
+        self.system_ID = system_ID
+        model = registry.get_system_model(system_ID)
+
+        n = np.broadcast_shapes(np.shape(alpha0), np.shape(beta), np.shape(baseline_power), np.shape(lifetime_system),
+                                np.shape(ARGS)[:-1] if (ARGS is not None) else ())
+        n = n[0] if n else 1
+
+        self.alpha0, self.beta, self.baseline_power, self.lifetime_system = [np.ascontiguousarray(np.broadcast_to(np.asarray(x, dtype=float), (n,)))
+                                                                              for x in (alpha0, beta, baseline_power, lifetime_system)]
+
+        self.ARGS = None if (ARGS is None) else np.ascontiguousarray(np.broadcast_to(np.asarray(ARGS, dtype=float), (n, len(model.ARGS_names))))
+        model.check_ARGS(self.ARGS)
+
+        if (PTT_offsets is None):
+            PTT_offsets, PTT_values = pack_PTT(PTT, n)
+
+        self.PTT_offsets = np.asarray(PTT_offsets, dtype=np.int64)
+        self.PTT_values = np.asarray(PTT_values, dtype=float)
+
+        if (len(self.PTT_offsets) != n + 1): raise ValueError('PTT_offsets must have one more element than the table')
+
+    def __len__(self):
+        return len(self.alpha0)
+
+    @classmethod
+    def from_systems(cls, systems):
+        "Output = table of a list of SmartSystem or SystemSpec of the same system_ID, with PTT made of steps, \
+         alpha0 = middle value of the specific alpha0 of each system"
+
+        system_IDs = set(System_sel.system_ID for System_sel in systems)
+        if (len(system_IDs) != 1): raise ValueError('a SystemTable holds one system_ID, got {}'.format(sorted(system_IDs)))
+
+        column = lambda name: np.array([getattr(System_sel, name) for System_sel in systems], dtype=float)
+        ARGS = None if (systems[0].args is None) else column('args')
+
+        alpha0 = [System_sel.alpha0[len(System_sel.alpha0)//2] for System_sel in systems]
+
+        return cls(system_IDs.pop(), alpha0, column('beta'), column('baseline_power'), column('lifetime_system'),
+                   ARGS, [System_sel.PTT for System_sel in systems])
+
+    def get_PTT(self, row):
+        return self.PTT_values[self.PTT_offsets[row]:self.PTT_offsets[row + 1]].tolist()
+
+    def get_rows(self, rows):
+        "Output = SystemTable of the rows of slice rows, sharing the arrays of self when possible"
+
+        offsets = self.PTT_offsets[rows.start:(rows.stop + 1 if (rows.stop is not None) else None)]
+
+        return SystemTable(self.system_ID, self.alpha0[rows], self.beta[rows], self.baseline_power[rows], self.lifetime_system[rows],
+                           None if (self.ARGS is None) else self.ARGS[rows], PTT_offsets=offsets - offsets[0],
+                           PTT_values=self.PTT_values[offsets[0]:offsets[-1]])
+
+    def get_spec(self, row):
+        "Output = SystemSpec of one row, alpha0 as the specific alpha0 (a single value)"
+
+        model = registry.get_system_model(self.system_ID)
+        # the counts are stored as floats in the table, the spec keeps them as int like get_system_spec
+        args = None if (self.ARGS is None) else tuple(int(count) for count in self.ARGS[row].tolist())
+
+        return config.SystemSpec(self.system_ID, float(self.baseline_power[row]), (float(self.alpha0[row]),), tuple(map(tuple, self.get_PTT(row))),
+                                 float(self.beta[row]), float(self.lifetime_system[row]), None, args,
+                                 float(model.get_baseline_power_system(self.baseline_power[row], args)), model.get_setup_name(args), None)
+
+###############################################################################
+
+def pack_PTT(PTT, n):
+    "Output = PTT_offsets, PTT_values of n rows, PTT = one PTT for every row or a list of n PTT"
+
+    if (PTT is None): PTT = [[1, -1]]
+
+    if any(config.is_persistence_model(x) for x in (PTT if isinstance(PTT, (list, tuple)) else [PTT])):
+        raise TypeError('a SystemTable needs PTT made of steps')
+
+    if (np.ndim(PTT[0]) == 1):
+        PTT = np.asarray(PTT, dtype=float)
+        return np.arange(n + 1, dtype=np.int64)*len(PTT), np.tile(PTT, (n, 1))
+
+    if (len(PTT) != n): raise ValueError('one PTT per row is needed, got {} for {} rows'.format(len(PTT), n))
+
+    lengths = np.array([len(x) for x in PTT], dtype=np.int64)
+
+    return np.append(0, np.cumsum(lengths)), np.concatenate([np.asarray(x, dtype=float).reshape(-1, 2) for x in PTT])
+
+###############################################################################
+
+def get_ragged_segments(PTT_offsets, PTT_values):
+    "This function returns the PTT steps of every row in padded arrays of shape (rows, longest PTT) : \
+      - start, duration, coef ; the last step of a row never ends (duration = inf) \
+      - the padding steps have a zero duration and start at the end of the PTT \
+      - units output = [years, years, /]"
+
+    lengths = np.diff(PTT_offsets)
+    n, n_steps = len(lengths), max(int(lengths.max()), 1) if len(lengths) else 1
+
+    row = np.repeat(np.arange(n), lengths)
+    step = np.arange(len(row)) - np.repeat(PTT_offsets[0:-1] - PTT_offsets[0], lengths)
+    values = PTT_values[PTT_offsets[0]:PTT_offsets[-1]]
+
+    coef = np.zeros((n, n_steps))
+    duration = np.zeros((n, n_steps))
+
+    coef[row, step] = values[:, 0]
+    duration[row, step] = values[:, 1]
+    duration[np.arange(n), lengths - 1] = np.inf
+
+    start = np.concatenate((np.zeros((n, 1)), np.cumsum(duration, axis=1)[:, 0:-1]), axis=1)
+    start = np.where(np.isnan(start), np.inf, start)
+
+    return start, duration, coef
+
+def weighted_duration(time, start, duration, coef):
+    "Output = integral of the PTT coefficients from 0 to time, per row, units : years"
+
+    time = np.asarray(time, dtype=float)[..., np.newaxis]
+    return np.sum(coef*np.clip(time - start, 0, duration), axis=-1)
+
+###############################################################################
+
+def get_TPB_table(table, scenario='BENCHMARK', chunk_size=TABLE_CHUNK_SIZE):
+    "This function returns the results of get_TPB for every row of a SystemTable. \
+      - the rows are evaluated chunk by chunk in vectorized passes, the PTT of each row is used for t_pb_solved, w-savings and G \
+      - scenario = scenario of the typical case, the bounds are always LOW and HIGH \
+      - output = structured array of config.TPB_BATCH_DTYPE, one element per row \
+      - units output = [years, years, years, years, %, %, J, J]"
+
+    model = registry.get_system_model(table.system_ID)
+    s, s_DN, s_UP = [config.SCENARIOS.index(name) for name in [scenario, 'LOW', 'HIGH']]
+
+    results = np.empty(len(table), dtype=config.TPB_BATCH_DTYPE)
+
+    for first in range(0, len(table), chunk_size):
+        rows = slice(first, first + chunk_size)
+
+        alpha0, beta, lifetime = table.alpha0[rows], table.beta[rows], table.lifetime_system[rows]
+        ARGS = None if (table.ARGS is None) else table.ARGS[rows]
+
+        baseline_power_system = model.get_baseline_power_system(table.baseline_power[rows], ARGS)
+        P_saved = baseline_power_system*alpha0*beta # W = J/s
+
+        E, _ = model.get_energies(ARGS, alpha0, beta)
+        E = np.broadcast_to(E, alpha0.shape + E.shape[-2:])
+        E_init = E[..., 0] + E[..., 1] + E[..., 2]
+        Pm, Pop = E[..., 3], E[..., 4]
+
+        result = results[rows]
+        result['t_pb'] = config.TPB(E_init[:, s], 0, 0, P_saved, Pm[:, s], Pop[:, s])
+        result['t_pb_DN'] = config.TPB(E_init[:, s_DN], 0, 0, P_saved, Pm[:, s_DN], Pop[:, s_DN])
+        result['t_pb_UP'] = config.TPB(E_init[:, s_UP], 0, 0, P_saved, Pm[:, s_UP], Pop[:, s_UP])
+
+        gain_rate = config.ELEC_TO_PRIMARY_ENERGY*config.CONVERSION_YEAR_to_SEC*P_saved
+        loss_rate = (config.ELEC_TO_PRIMARY_ENERGY*Pop[:, s] + Pm[:, s])*config.CONVERSION_YEAR_to_SEC
+
+        # PTT of the rows, steps within the time horizon
+        offsets = table.PTT_offsets[first:first + len(alpha0) + 1]
+        start, duration, coef = get_ragged_segments(offsets, table.PTT_values)
+
+        start_TH = np.minimum(start, config.TIME_HORIZON)
+        end_TH = np.minimum(start + duration, config.TIME_HORIZON)
+        cumul = weighted_duration(start_TH, start[:, np.newaxis], duration[:, np.newaxis], coef[:, np.newaxis])
+
+        result['t_pb_solved'] = config.first_crossing_steps(gain_rate, E_init[:, s], loss_rate, start_TH, end_TH, coef, cumul)
+
+        E_smart_atLT = config.E_smart(E_init[:, s], 0, 0, Pop[:, s], Pm[:, s], lifetime)
+        G_constant = gain_rate*lifetime - E_smart_atLT
+        G_PTT = gain_rate*weighted_duration(lifetime, start, duration, coef) - E_smart_atLT
+
+        result['bsavings'] = np.around(G_constant/E_smart_atLT*100, 2)
+        result['wsavings'] = np.around(G_PTT/E_smart_atLT*100, 2)
+        result['E_smart_atLT'] = E_smart_atLT
+        result['G'] = G_PTT
+
+    return results
@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+@author: TSP
+
+Opt-in instrumentation of the payback engine : wall time, calls, evaluations and allocations per phase,
+solver counters and throughput.
+
+    with timing.instrumented(memory=True) as recorder:
+        config.get_TPB(System_sel, 0.3, False)
+    print(timing.format_report(recorder.get_report()))
+
+or TSP_SMARTX_TIMING=1 python TSP_SMARTX_MAIN.py to print the report at exit.
+
+The functions of the phases are replaced by timed wrappers only while the instrumentation is enabled :
+nothing is added to the calls when it is disabled.
+"""
+###############################################################################
+#                                      IMPORT                                 #
+###############################################################################
+
+import atexit
+import contextlib
+import functools
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+import TSP_SMARTX_CONFIG_simple as config
+
+###############################################################################
+#                                    CONSTANTS                                #
+###############################################################################
+
+TIMING_ENVIRONMENT =                'TSP_SMARTX_TIMING'
+
+# phase : (module name, function name), the functions are looked up when the instrumentation is enabled
+TIMING_PHASES = {'get_TPB':                 ('TSP_SMARTX_CONFIG_simple', 'get_TPB'),
+                 'get_TPB_batch':           ('TSP_SMARTX_CONFIG_simple', 'get_TPB_batch'),
+                 'scenario dispatch':       ('TSP_SMARTX_CONFIG_simple', 'get_scenario_energies'),
+                 'TPB closed form':         ('TSP_SMARTX_CONFIG_simple', 'TPB'),
+                 'TPB_PTT solver':          ('TSP_SMARTX_CONFIG_simple', 'TPB_PTT'),
+                 'G':                       ('TSP_SMARTX_CONFIG_simple', 'G'),
+                 'savings':                 ('TSP_SMARTX_CONFIG_simple', 'get_savings'),
+                 'plot energy curves':      ('TSP_SMARTX_CONFIG_simple', 'plot_EC'),
+                 'plot alpha range':        ('TSP_SMARTX_CONFIG_simple', 'plotTPB_AlphaRange'),
+                 'plot specific alpha':     ('TSP_SMARTX_CONFIG_simple', 'plotSpecificAlpha'),
+                 'plot bulbs':              ('TSP_SMARTX_CONFIG_simple', 'plotBulbsImpactHUE'),
+                 'sweep grid':              ('TSP_SMARTX_SWEEP', 'sweep_grid'),
+                 'monte carlo':             ('TSP_SMARTX_MONTECARLO', 'run_monte_carlo'),
+                 'fleet':                   ('TSP_SMARTX_FLEET', 'run_fleet')}
+
+# EnergyCurves attributes timed when they are built
+TIMING_CURVES =                     ['days', 'E_em', 'E_op', 'E_saved', 'alpha', 'time_gains', 'gains_tau', 'savings']
+
+# active Recorder, None when the instrumentation is disabled
+RECORDER = None
+
+###############################################################################
+#                                    FUNCTIONS                                #
+###############################################################################
+
+class Recorder:
+    "Measurements of the instrumented phases. \
+      - phases = {phase : {calls, seconds, evaluations, allocated_bytes, peak_bytes}} \
+      - counters = {name : value}, e.g. solver evaluations and failures \
+      - memory = True traces the allocations (tracemalloc), at the cost of a slower run"
+
+    def __init__(self, memory=False):
+        self.memory = memory
+        self.phases = {}
+        self.counters = {}
+        self.stack = []
+        self.start = time.perf_counter()
+
+    def enter(self):
+        if self.memory:
+            current, peak = tracemalloc.get_traced_memory()
+            if self.stack: self.stack[-1][1] = max(self.stack[-1][1], peak)
+            tracemalloc.reset_peak()
+            self.stack.append([current, current])
+
+    def exit(self, phase, seconds, evaluations):
+        record = self.phases.setdefault(phase, {'calls': 0, 'seconds': 0.0, 'evaluations': 0, 'allocated_bytes': 0, 'peak_bytes': 0})
+
+        record['calls'] += 1
+        record['seconds'] += seconds
+        record['evaluations'] += evaluations
+
+        if self.memory:
+            current, peak = tracemalloc.get_traced_memory()
+            start, peak_inner = self.stack.pop()
+            peak = max(peak, peak_inner)
+
+            record['allocated_bytes'] += max(current - start, 0)
+            record['peak_bytes'] = max(record['peak_bytes'], peak - start)
+
+            if self.stack: self.stack[-1][1] = max(self.stack[-1][1], peak)
+            tracemalloc.reset_peak()
+
+    def count(self, name, value=1):
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def get_report(self):
+        "Output = {wall_seconds, phases, counters}, with the throughput (evaluations per second) of every phase"
+
+        phases = {}
+        for phase, record in self.phases.items():
+            phases[phase] = dict(record, evals_per_sec=record['evaluations']/record['seconds'] if record['seconds'] > 0 else np.nan)
+
+        return {'wall_seconds': time.perf_counter() - self.start, 'phases': phases, 'counters': dict(self.counters)}
+
+###############################################################################
+
+def count_evaluations(result):
+    "Number of evaluations behind a result : size of the first array found in it"
+
+    if isinstance(result, np.ndarray): return result.size
+    if hasattr(result, 'array'): return result.array.size
+    if isinstance(result, (tuple, list)) and result: return count_evaluations(result[0])
+
+    return 1
+
+def wrap(phase, function):
+    "Output = function timed as phase in the active Recorder"
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        recorder = RECORDER
+        if (recorder is None): return function(*args, **kwargs)
+
+        recorder.enter()
+        start = time.perf_counter()
+        result = None
+
+        try:
+            result = function(*args, **kwargs)
+            return result
+
+        finally:
+            recorder.exit(phase, time.perf_counter() - start, count_evaluations(result) if (result is not None) else 0)
+
+            if (phase == 'TPB_PTT solver' and result is not None):
+                recorder.count('solver evaluations', np.size(result))
+                recorder.count('solver no payback within TIME_HORIZON', int(np.count_nonzero(np.asarray(result) >= config.T_PB_INFINITY)))
+
+    wrapper.timing_original = function
+    return wrapper
+
+###############################################################################
+
+def enable(memory=False):
+    "Start the instrumentation. Output = the new active Recorder"
+
+    global RECORDER
+
+    if (RECORDER is not None): disable()
+
+    RECORDER = Recorder(memory)
+    if memory: tracemalloc.start()
+
+    for phase, (module_name, name) in TIMING_PHASES.items():
+        module = sys.modules.get(module_name)
+        if (module is not None and hasattr(module, name)):
+            setattr(module, name, wrap(phase, getattr(module, name)))
+
+    for name in TIMING_CURVES:
+        original = config.EnergyCurves.__dict__[name]
+        timed = type(original)(wrap('curves ' + name, original.func))
+        timed.__set_name__(config.EnergyCurves, name)
+        timed.timing_original = original
+        setattr(config.EnergyCurves, name, timed)
+
+    return RECORDER
+
+def disable():
+    "Stop the instrumentation and restore the original functions. Output = the Recorder that was active"
+
+    global RECORDER
+
+    recorder, RECORDER = RECORDER, None
+    if (recorder is None): return None
+
+    for module_name, name in TIMING_PHASES.values():
+        module = sys.modules.get(module_name)
+        function = getattr(module, name, None)
+        if hasattr(function, 'timing_original'): setattr(module, name, function.timing_original)
+
+    for name in TIMING_CURVES:
+        timed = config.EnergyCurves.__dict__[name]
+        if hasattr(timed, 'timing_original'): setattr(config.EnergyCurves, name, timed.timing_original)
+
+    if recorder.memory: tracemalloc.stop()
+
+    return recorder
+
+@contextlib.contextmanager
+def instrumented(memory=False):
+    "Context manager : instrumentation enabled inside the with block, yields the Recorder"
+
+    recorder = enable(memory)
+    try:
+        yield recorder
+    finally:
+        if (RECORDER is recorder): disable()
+
+###############################################################################
+
+def format_report(report):
+    "Output = text table of a report, phases sorted by time"
+
+    lines = ['{:<28} {:>8} {:>11} {:>14} {:>12} {:>11}'.format('phase', 'calls', 'seconds', 'evals/s', 'alloc [MB]', 'peak [MB]')]
+
+    for phase, record in sorted(report['phases'].items(), key=lambda item: -item[1]['seconds']):
+        lines.append('{:<28} {:>8} {:>11.4f} {:>14.4g} {:>12.1f} {:>11.1f}'.format(phase, record['calls'], record['seconds'], record['evals_per_sec'],
+                                                                               record['allocated_bytes']/1e6, record['peak_bytes']/1e6))
+
+    for name, value in sorted(report['counters'].items()):
+        lines.append('{:<50} {:>12}'.format(name, value))
+
+    lines.append('wall time = {:.3f} s'.format(report['wall_seconds']))
+
+    return '\n'.join(lines)
+
+def report_at_exit(stream=sys.stderr):
+    "Print the report of the active Recorder when the interpreter exits"
+
+    def report():
+        if (RECORDER is not None): print(format_report(RECORDER.get_report()), file=stream)
+
+    atexit.register(report)
+
+def enable_from_environment():
+    "Enable the instrumentation, with a report at exit, when the environment variable TSP_SMARTX_TIMING is set \
+     (TSP_SMARTX_TIMING=memory also traces the allocations)"
+
+    value = os.environ.get(TIMING_ENVIRONMENT, '')
+
+    if value and value != '0':
+        enable(memory=(value == 'memory'))
+        report_at_exit()
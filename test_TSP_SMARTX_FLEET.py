@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+@author: TSP
+
+Aggregates of run_fleet against the units computed one by one : python -m pytest test_TSP_SMARTX_FLEET.py
+"""
+###############################################################################
+#                                      IMPORT                                 #
+###############################################################################
+
+import copy
+
+import numpy as np
+
+import TSP_SMARTX_CONFIG_simple as config
+import TSP_SMARTX_FLEET as fleet
+import TSP_SMARTX_MONTECARLO as montecarlo
+import TSP_SMARTX_SYSTEMS as systems
+
+###############################################################################
+#                                    FUNCTIONS                                #
+###############################################################################
+
+def write_fleet(path, n_units, seed=0):
+    "CSV fleet file with a header line, see TSP_SMARTX_FLEET"
+
+    rng = np.random.default_rng(seed)
+
+    columns = {'P_operation': rng.uniform(0.5, 2, n_units),
+               'baseline_power': rng.uniform(300, 1500, n_units),
+               'alpha0': rng.uniform(0.05, 0.4, n_units),
+               'install_year': rng.uniform(2010, 2020, n_units)}
+
+    np.savetxt(path, np.column_stack([columns[name] for name in fleet.FLEET_COLUMNS]), delimiter=',',
+               header=','.join(fleet.FLEET_COLUMNS), comments='')
+
+def get_unit_results(System_sel, row, years):
+    "Reference of one unit, computed on its own : its SmartSystem, the BENCHMARK energies with its measured P_operation, \
+     output = t_pb_solved, savings at the end of the lifetime, net gain at every calendar year of years"
+
+    unit = copy.deepcopy(System_sel)
+    unit.baseline_power = row['baseline_power']
+    config.configure_system(unit)
+
+    alpha0 = row['alpha0']
+    energies, _ = config.get_scenario_energies(unit, alpha0)
+    Erm, Eem, Er, Pm, _ = energies['BENCHMARK']
+    params = (Erm, Eem, Er, unit.beta, alpha0, unit.baseline_power_system, Pm, row['P_operation'], unit.PTT)
+
+    t_pb_solved = config.TPB_PTT(*params)
+    savings = config.G(unit.lifetime_system, *params)
+    net_gain = [config.G(min(year - row['install_year'], unit.lifetime_system), *params) if (year >= row['install_year']) else 0
+                for year in years]
+
+    return t_pb_solved, savings, net_gain
+
+###############################################################################
+
+def test_fleet_percentiles(tmp_path):
+    path = str(tmp_path/'fleet.csv')
+    write_fleet(path, 10000)
+
+    System_sel = systems.get_default_system('SMART-METER')
+    years = [2005, 2012, 2016, 2020, 2040]
+    results = fleet.run_fleet(System_sel, path, years, chunk_size=2**12)
+
+    data = np.loadtxt(path, delimiter=',', skiprows=1)
+    rows = [dict(zip(fleet.FLEET_COLUMNS, values)) for values in data]
+    t_pb_solved, savings, net_gain = zip(*[get_unit_results(System_sel, row, years) for row in rows])
+
+    t_pb_solved = np.array(t_pb_solved)
+    paid_back = t_pb_solved < System_sel.lifetime_system
+    payback_year = (data[:, fleet.FLEET_COLUMNS.index('install_year')] + t_pb_solved)[paid_back]
+
+    assert results['n_units'] == len(rows)
+    assert results['P_payback'] == np.mean(paid_back)
+    assert np.allclose(results['net_gain'], np.sum(net_gain, axis=0), rtol=1e-9), (results['net_gain'], np.sum(net_gain, axis=0))
+
+    for name, values, tolerance in (('payback_year', payback_year, 1e-2), ('savings', np.array(savings), 1e-3)):
+        expected = np.percentile(values, montecarlo.MC_PERCENTILES)
+        computed = np.array(list(results[name]['percentiles'].values()))
+
+        assert np.all(np.abs(computed - expected) <= tolerance*np.std(values)), (name, computed, expected)
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+@author: TSP
+
+Percentiles of StreamingStats against np.percentile on the whole sample, and the sampled inputs of run_monte_carlo
+against the system files : python -m pytest test_TSP_SMARTX_MONTECARLO.py
+"""
+###############################################################################
+#                                      IMPORT                                 #
+###############################################################################
+
+import numpy as np
+
+import TSP_SMARTX_CONFIG_simple as config
+import TSP_SMARTX_MONTECARLO as montecarlo
+import TSP_SMARTX_REGISTRY as registry
+import TSP_SMARTX_SYSTEMS as systems
+
+###############################################################################
+#                                    FUNCTIONS                                #
+###############################################################################
+
+def get_streamed_percentiles(values, n_chunks=7):
+    stats = montecarlo.StreamingStats()
+    for chunk in np.array_split(values, n_chunks): stats.update(chunk)
+
+    return stats.percentile(montecarlo.MC_PERCENTILES)
+
+def check_percentiles(values, tolerance=1e-3):
+    "The error is measured relative to the spread of the sample"
+
+    error = np.abs(get_streamed_percentiles(values) - np.percentile(values, montecarlo.MC_PERCENTILES))
+    assert np.all(error <= tolerance*np.std(values)), error
+
+###############################################################################
+
+def test_percentiles_J_scale():
+    rng = np.random.default_rng(0)
+
+    check_percentiles(rng.normal(2e9, 1e9, 10**6))
+    check_percentiles(rng.uniform(-4.5e9, 8.7e9, 10**6))
+
+def test_percentiles_calendar_years():
+    rng = np.random.default_rng(1)
+
+    check_percentiles(2015 + rng.gamma(2, 2, 10**6))
+
+def test_percentiles_with_outliers():
+    "Payback times with a share of T_PB_INFINITY : the axis is widened, the central percentiles stay sharp"
+
+    rng = np.random.default_rng(2)
+    values = np.concatenate((rng.gamma(2, 2, 10**6), np.full(10**4, 1e3)))
+
+    check_percentiles(values, tolerance=1e-3*np.std(values[values < 1e3])/np.std(values))
+
+def test_range_found_after_the_first_chunk():
+    rng = np.random.default_rng(3)
+    values = np.concatenate((np.full(10, 5.0), rng.normal(-3e9, 1e9, 10**5)))
+
+    check_percentiles(values, tolerance=1e-2)
+
+def test_empty():
+    assert np.all(np.isnan(montecarlo.StreamingStats().percentile([5, 50])))
+
+def test_duty_cycle_sample():
+    "Fixed inputs at the BENCHMARK scenario : the sampled duty cycle gives the results of the system file at this duty cycle"
+
+    System_sel = systems.get_default_system('SMART-METER')
+    alpha0, duty_cycle = 0.3, 1e-7
+
+    E, _ = registry.get_system_model(System_sel.system_ID).get_energies(System_sel.args, alpha0, System_sel.beta)
+    P_active, P_sleep, _ = montecarlo.get_duty_cycle_powers(System_sel)
+    s = config.SCENARIOS.index('BENCHMARK')
+
+    fixed = {'Erm': E[s, 0], 'Eem': E[s, 1], 'Er': E[s, 2], 'P_active': P_active[s], 'P_sleep': P_sleep[s], 'duty_cycle': duty_cycle}
+    results = montecarlo.run_monte_carlo(System_sel, alpha0, 100, distributions=fixed, seed=0)
+
+    module, names = montecarlo.MC_DUTY_CYCLES[System_sel.system_ID]
+    saved = registry.set_constants(module, dict.fromkeys(names, duty_cycle))
+    try:
+        expected = config.get_TPB_batch(System_sel, alpha0)
+    finally:
+        registry.set_constants(module, saved)
+
+    assert np.isclose(results['t_pb_solved']['mean'], expected['t_pb_solved'], rtol=1e-9)
+    assert np.isclose(results['savings']['mean'], expected['G'], rtol=1e-9)
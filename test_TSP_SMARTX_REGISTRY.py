@@ -0,0 +1,34 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+@author: TSP
+
+Component sweeps of the SystemModel against the system itself : python -m pytest test_TSP_SMARTX_REGISTRY.py
+"""
+###############################################################################
+#                                      IMPORT                                 #
+###############################################################################
+
+import numpy as np
+
+import TSP_SMARTX_CONFIG_simple as config
+import TSP_SMARTX_REGISTRY as registry
+import TSP_SMARTX_SYSTEMS as systems
+
+###############################################################################
+#                                    FUNCTIONS                                #
+###############################################################################
+
+def test_component_sweep_at_own_count():
+    alpha0 = np.array([0.2, 0.35, 0.5])
+
+    for system_ID, component in (('OFFICE-LIGHTNING', 'nodes'), ('PHILIPS-HUE-LED', 'bulbs')):
+        System_sel = systems.get_default_system(system_ID)
+        index = list(registry.get_system_model(system_ID).ARGS_names).index(component)
+
+        ARGS, results = config.get_TPB_components(System_sel, component, [System_sel.args[index]], alpha0[:, None])
+        expected = config.get_TPB_batch(System_sel, alpha0)
+
+        assert np.array_equal(ARGS[0], np.asarray(System_sel.args, dtype=ARGS.dtype)), (system_ID, ARGS)
+        for name in expected.dtype.names:
+            assert np.allclose(results[name][:, 0], expected[name], equal_nan=True), (system_ID, name)